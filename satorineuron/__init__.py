@@ -1,7 +1,9 @@
+import time
+from satorineuron.init.timeline import timeline
+_importBegan = time.time()
 # from satorineuron import spoof
 from satorineuron import config
 from satorilib import logging
-from satorineuron.init import engine
 # from satorilib.api.wallet import RavencoinWallet
 from satorilib.api.disk import Cache  # Disk
 Cache.setConfig(config)
@@ -11,7 +13,22 @@ logging.setup(level={
     'warning': logging.WARNING,
     'error': logging.ERROR,
     'critical': logging.CRITICAL,
-}[config.get().get('logging level', 'warning').lower()])
+}[config.loggingLevel()])
 
 VERSION = '0.2.03'
 MOTTO = 'Let your workings remain a mystery, just show people the results.'
+timeline.version = VERSION
+timeline.record('import satorineuron', _importBegan, time.time())
+
+
+def __getattr__(name: str):
+    '''
+    heavy subsystems load on first use so the cli and ui only entry points
+    don't pay for the model stack: satorineuron.engine imports satoriengine.
+    '''
+    if name == 'engine':
+        global engine
+        with timeline.phase('import satorineuron.engine'):
+            from satorineuron.init import engine
+        return engine
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
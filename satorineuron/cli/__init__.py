@@ -1,8 +1,6 @@
 
 import click
 from satoriwallet import evrmore
-from satoriwallet.lib import connection
-from satorilib.api.wallet import EvrmoreWallet
 
 
 @click.group()
@@ -45,6 +43,8 @@ def verify_by_address(message: str, signature: str, address: str):
 @main.command()
 def create_wallet_auth_payload():
     '''uses existing saved wallet to sign a message for authentication'''
+    from satoriwallet.lib import connection
+    from satorilib.api.wallet import EvrmoreWallet
     w = EvrmoreWallet(temporary=True)
     w.init()
     print(connection.authPayload(w))
@@ -53,6 +53,8 @@ def create_wallet_auth_payload():
 @main.command()
 def create_test_wallet_auth_payload():
     '''generates a new wallet and signs a message for authentication'''
+    from satoriwallet.lib import connection
+    from satorilib.api.wallet import EvrmoreWallet
     w = EvrmoreWallet(temporary=True)
     w.generate()
     print(connection.authPayload(w))
@@ -1,6 +1,7 @@
 import os
+from typing import Union
 from functools import partial
-from .config import root, read, write, get, put, env, var, add
+from .config import root, read, write, get, put, env, var, add, value, invalidate, transaction
 
 
 # root = partial(root, os.path.abspath(__file__)) # no, put configs outside lib:
@@ -10,6 +11,7 @@ write = partial(write, root=root)
 get = partial(get, root=root)
 put = partial(put, root=root)
 add = partial(add, root=root)
+value = partial(value, root=root)
 env = partial(env, get=get, root=root)
 
 
@@ -51,11 +53,11 @@ def modify(data: dict):
 
 
 def flaskPort():
-    return get().get(verbose('flaskPort'), '24601')
+    return value(key=verbose('flaskPort'), default='24601')
 
 
 def nodejsPort():
-    return get().get(verbose('nodejsPort'), '24686')
+    return value(key=verbose('nodejsPort'), default='24686')
 
 
 def dataPath(filename=None):
@@ -80,11 +82,11 @@ def walletPath(filename=None):
 
 
 def defaultSource():
-    return get().get(verbose('defaultSource'), 'streamr')
+    return value(key=verbose('defaultSource'), default='streamr')
 
 
 def electrumxServers():
-    return get().get(verbose('electrumxServers'), [
+    return value(key=verbose('electrumxServers'), default=[
         'rvn4lyfe.com:50002', 'moontree.com:50002',
         'ravennode-01.beep.pw:50002', 'ravennode-02.beep.pw:50002',  # HyperPeek
         'electrum-rvn.dnsalias.net:50002'])
@@ -92,4 +94,58 @@ def electrumxServers():
 
 def path(of='data'):
     ''' used to get the data or model path '''
-    return get().get(verbose(f'{of}Path'), root(f'./{of}'))
+    return value(key=verbose(f'{of}Path'), default=root(f'./{of}'))
+
+
+def miningMode() -> bool:
+    return bool(value(key='mining mode', default=True))
+
+
+def loggingLevel() -> str:
+    return str(value(key='logging level', default='warning')).lower()
+
+
+def cacheMemoryBudget() -> Union[int, None]:
+    ''' bytes of stream history to keep in memory, None for no limit '''
+    megabytes = value(key='cache memory budget', default=512)
+    if megabytes in [None, '', 0]:
+        return None
+    return int(float(megabytes) * 1024 * 1024)
+
+
+def cpuBudget() -> int:
+    ''' cores the engine may train models on, at least one '''
+    cores = value(key='cpu budget', default=None)
+    if cores in [None, '', 0]:
+        return max((os.cpu_count() or 2) - 1, 1)
+    return max(int(cores), 1)
+
+
+def walletLock() -> bool:
+    return bool(value(key='wallet lock', default=False))
+
+
+def lockEnabled() -> Union[bool, None]:
+    ''' None if the neuron lock was never configured '''
+    return value(key='neuron lock enabled')
+
+
+def lockSecret() -> Union[str, int]:
+    ''' the lock password if one is set, otherwise the lock hash '''
+    return (
+        value(key='neuron lock password') or
+        value(key='neuron lock hash', default=''))
+
+
+def hasLockSecret() -> bool:
+    return (
+        value(key='neuron lock hash') is not None or
+        value(key='neuron lock password') is not None)
+
+
+def isLockable() -> bool:
+    return lockEnabled() is not None and hasLockSecret()
+
+
+def isLocked() -> bool:
+    return lockEnabled() == True and hasLockSecret()
@@ -1,6 +1,21 @@
+from typing import Union
+from contextlib import contextmanager
 import os
+import copy
+import tempfile
+import threading
 import yaml
 
+# parsed yaml files by path: {path: ((mtime_ns, size), data)}
+_cache: dict[str, tuple[tuple[int, int], dict]] = {}
+_cacheLock = threading.Lock()
+# per thread transaction state: staged contents by path, lines staged by
+# write by path, and nesting depth
+_transaction = threading.local()
+# new files get the mode open() would give them
+_umask = os.umask(0)
+os.umask(_umask)
+
 
 def args_to_config_path(*args, root: callable) -> str:
     ''' formats args so code isn't duplicated in every repository '''
@@ -21,6 +36,12 @@ def args_to_config_path(*args, root: callable) -> str:
 def read(*args, path: str = None, root: callable = None):
     ''' gets configuration out of the yaml file '''
     path = path or args_to_config_path(*args, root=root)
+    pending = staged()
+    if pending is not None and path in pending:
+        if path in _transaction.lines:
+            return list(_transaction.lines[path])
+        return yaml.dump(
+            pending[path], default_flow_style=False).splitlines(keepends=True)
     if os.path.exists(path):
         with open(path, mode='r') as f:
             return f.readlines()
@@ -35,13 +56,99 @@ def write(
 ):
     ''' writes lines to the file at path '''
     path = path or args_to_config_path(*args, root=root)
-    with open(path, mode='w') as f:
-        f.writelines(lines)
+    pending = staged()
+    if pending is not None:
+        pending[path] = yaml.load(''.join(lines), Loader=yaml.FullLoader) or {}
+        _transaction.lines[path] = list(lines)
+        return
+    atomicWrite(path, lambda f: f.writelines(lines))
 
 
-def get(*args, path: str = None, root: callable = None, decrypt: callable = None):
-    ''' gets configuration out of the yaml file '''
-    path = path or args_to_config_path(*args, root=root)
+def atomicWrite(path: str, writer: callable, mode: str = 'w'):
+    '''
+    writes to a temporary file beside path and renames it over path, so
+    readers see either the old file or the new one, never a torn one.
+    '''
+    folder = os.path.dirname(path) or '.'
+    fd, temporary = tempfile.mkstemp(
+        dir=folder, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode=mode) as f:
+            writer(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(
+            temporary,
+            os.stat(path).st_mode & 0o777 if os.path.exists(path)
+            else 0o666 & ~_umask)
+        os.replace(temporary, path)
+    except Exception as e:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise e
+    finally:
+        invalidate(path)
+
+
+def staged() -> Union[dict[str, dict], None]:
+    ''' contents staged by this thread's open transaction, if any '''
+    return getattr(_transaction, 'staged', None)
+
+
+@contextmanager
+def transaction():
+    '''
+    batches every put, add and write (so modify too) made by this thread into
+    one atomic write per file when the outermost transaction exits. gets inside the transaction see
+    the staged contents. if an exception escapes nothing is written. keep
+    network calls and other slow work outside, only stage the writes.
+        with config.transaction():
+            for stream in streams:
+                config.add('relay', data={...})
+    '''
+    if staged() is None:
+        _transaction.staged = {}
+        _transaction.lines = {}
+        _transaction.depth = 0
+    _transaction.depth += 1
+    completed = False
+    try:
+        yield
+        completed = True
+    finally:
+        _transaction.depth -= 1
+        if _transaction.depth == 0:
+            pending = _transaction.staged
+            lines = _transaction.lines
+            _transaction.staged = None
+            _transaction.lines = None
+            if completed:
+                for path, data in pending.items():
+                    if path in lines:
+                        atomicWrite(
+                            path, lambda f, path=path: f.writelines(lines[path]))
+                    else:
+                        dump(path, data)
+
+
+def dump(path: str, data: dict):
+    ''' writes data to the yaml file at path atomically '''
+    atomicWrite(
+        path,
+        lambda f: yaml.dump(data, f, default_flow_style=False))
+
+
+def stamp(path: str) -> Union[tuple[int, int], None]:
+    ''' identifies a version of the file, None if it does not exist '''
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def load(path: str) -> dict:
+    ''' parses the yaml file at path, bypassing the cache '''
     if os.path.exists(path):
         with open(path, mode='r') as f:
             try:
@@ -59,6 +166,57 @@ def get(*args, path: str = None, root: callable = None, decrypt: callable = None
     return {}
 
 
+def invalidate(path: str = None):
+    ''' forgets the parsed contents of path, or of every file '''
+    with _cacheLock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(path, None)
+
+
+def parsed(path: str) -> dict:
+    '''
+    returns the cached contents of the yaml file at path, parsing it again
+    only if its modification time or size changed. do not mutate the result.
+    '''
+    version = stamp(path)
+    if version is None:
+        invalidate(path)
+        return {}
+    with _cacheLock:
+        cached = _cache.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, load(path))
+        with _cacheLock:
+            _cache[path] = cached
+    return cached[1]
+
+
+def get(*args, path: str = None, root: callable = None, decrypt: callable = None):
+    ''' gets configuration out of the yaml file (a copy of the cached parse) '''
+    path = path or args_to_config_path(*args, root=root)
+    pending = staged()
+    if pending is not None and path in pending:
+        return copy.deepcopy(pending[path])
+    return copy.deepcopy(parsed(path))
+
+
+def value(
+    *args,
+    key: str,
+    default=None,
+    path: str = None,
+    root: callable = None,
+):
+    ''' gets a single configuration value without copying the whole file '''
+    path = path or args_to_config_path(*args, root=root)
+    pending = staged()
+    if pending is not None and path in pending:
+        return copy.deepcopy(pending[path].get(key, default))
+    return copy.deepcopy(parsed(path).get(key, default))
+
+
 def put(
     *args,
     data: dict = None,
@@ -68,8 +226,12 @@ def put(
     ''' makes a yaml fill somewhere in config folder '''
     if data is not None:
         path = path or args_to_config_path(*args, root=root)
-        with open(path, mode='w') as f:
-            yaml.dump(data, f, default_flow_style=False)
+        pending = staged()
+        if pending is not None:
+            pending[path] = copy.deepcopy(data)
+            _transaction.lines.pop(path, None)
+        else:
+            dump(path, data)
     return path
 
 
@@ -83,8 +245,12 @@ def add(
     if data is not None:
         existing = get(*args, path=path, root=root)
         path = path or args_to_config_path(*args, root=root)
-        with open(path, mode='w') as f:
-            yaml.dump({**existing, **data}, f, default_flow_style=False)
+        pending = staged()
+        if pending is not None:
+            pending[path] = {**existing, **copy.deepcopy(data)}
+            _transaction.lines.pop(path, None)
+        else:
+            dump(path, {**existing, **data})
     return path
 
 
@@ -0,0 +1,147 @@
+'''
+a lazy registry of stream caches. checkin only tells the registry which
+streams exist; a disk.Cache is opened the first time a stream is asked for and
+reused across re-checkins. there is only ever one handle per stream, the
+engine and relay hold on to the same one. once the dataframes loaded into open
+caches exceed the memory budget the least recently used are unloaded in place,
+the handle stays and rereads from disk when it next needs its data.
+'''
+from typing import Union, Iterable
+import threading
+from collections import OrderedDict
+from satorilib.concepts.structs import StreamId
+from satorilib.api import disk
+from satorilib import logging
+
+
+class CacheRegistry(object):
+    ''' behaves like the {StreamId: disk.Cache} dict it replaces '''
+
+    def __init__(
+        self,
+        streamIds: Iterable[StreamId] = None,
+        budget: Union[int, None] = None,
+        factory: callable = None,
+    ):
+        # bytes, None means unbounded
+        self.budget = budget
+        self.factory = factory or (lambda streamId: disk.Cache(id=streamId))
+        self.known: set[StreamId] = set(streamIds or [])
+        # open handles, least recently used first
+        self.opened: OrderedDict[StreamId, disk.Cache] = OrderedDict()
+        self.sizes: dict[StreamId, int] = {}
+        self.evictions = 0
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def sizeOf(cache: disk.Cache) -> int:
+        ''' bytes held by the dataframe loaded into the cache, if any '''
+        try:
+            df = getattr(cache, 'cache', None)
+            if df is None:
+                return 0
+            return int(df.memory_usage(index=True, deep=True).sum())
+        except Exception as _:
+            return 0
+
+    @property
+    def memory(self) -> int:
+        with self.lock:
+            return sum(self.sizes.values())
+
+    def register(self, streamIds: Iterable[StreamId]):
+        '''
+        sets the streams this node carries. handles of streams that remain are
+        kept, handles of streams that were dropped are closed.
+        '''
+        with self.lock:
+            self.known = set(streamIds)
+            for streamId in list(self.opened.keys()):
+                if streamId not in self.known:
+                    self.close(streamId)
+
+    def close(self, streamId: StreamId):
+        with self.lock:
+            self.opened.pop(streamId, None)
+            self.sizes.pop(streamId, None)
+
+    @staticmethod
+    def unload(cache: disk.Cache):
+        ''' drops the dataframe a cache has loaded, it reloads on demand '''
+        if getattr(cache, 'cache', None) is not None:
+            cache.cache = None
+
+    def get(self, streamId: StreamId, default=None) -> Union[disk.Cache, None]:
+        ''' opens the cache on first access, marks it recently used '''
+        with self.lock:
+            if streamId not in self.known:
+                return default
+            cache = self.opened.get(streamId)
+            if cache is None:
+                cache = self.factory(streamId)
+                self.opened[streamId] = cache
+            else:
+                self.opened.move_to_end(streamId)
+            self.sizes[streamId] = CacheRegistry.sizeOf(cache)
+            self.enforceBudget(keep=streamId)
+            return cache
+
+    def enforceBudget(self, keep: StreamId = None):
+        ''' unloads least recently used dataframes until under budget '''
+        if self.budget is None:
+            return
+        with self.lock:
+            memory = self.memory
+            for streamId, cache in self.opened.items():
+                if memory <= self.budget:
+                    break
+                if streamId == keep or not self.sizes.get(streamId):
+                    continue
+                memory -= self.sizes[streamId]
+                CacheRegistry.unload(cache)
+                self.sizes[streamId] = 0
+                self.evictions += 1
+                logging.debug('evicted cache of', streamId)
+
+    def measure(self) -> int:
+        ''' remeasures every open cache, enforces the budget '''
+        with self.lock:
+            for streamId, cache in self.opened.items():
+                self.sizes[streamId] = CacheRegistry.sizeOf(cache)
+            self.enforceBudget()
+            return self.memory
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'streams': len(self.known),
+                'open': len(self.opened),
+                'loaded': len([size for size in self.sizes.values() if size]),
+                'bytes': self.memory,
+                'budget': self.budget,
+                'evictions': self.evictions}
+
+    def __getitem__(self, streamId: StreamId) -> disk.Cache:
+        cache = self.get(streamId)
+        if cache is None:
+            raise KeyError(streamId)
+        return cache
+
+    def __contains__(self, streamId: StreamId) -> bool:
+        return streamId in self.known
+
+    def __len__(self) -> int:
+        return len(self.known)
+
+    def __iter__(self):
+        return iter(list(self.known))
+
+    def keys(self) -> list[StreamId]:
+        return list(self.known)
+
+    def values(self) -> list[disk.Cache]:
+        return [self.get(streamId) for streamId in self.keys()]
+
+    def items(self) -> list[tuple[StreamId, disk.Cache]]:
+        return [(streamId, self.get(streamId)) for streamId in self.keys()]
@@ -0,0 +1,210 @@
+'''
+a small dependency graph executor for startup tasks. each task runs on its own
+worker thread as soon as every task it depends on has succeeded, so tasks that
+do not depend on each other run concurrently. a task that fails (after its
+retries) or times out causes its dependents to be skipped, not the whole graph.
+
+python can't stop a thread, so a task that times out is abandoned, not
+stopped: its function keeps running until it returns, though it isn't retried
+after that. tasks run on daemon threads, so an abandoned one never holds up
+the interpreter's exit. only give timeouts to tasks that are safe to run again while an
+abandoned run of them may still be going, such as on the next daily start.
+'''
+from typing import Union
+import time
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from satorilib import logging
+
+
+class TaskStatus(object):
+    pending = 'pending'
+    running = 'running'
+    succeeded = 'succeeded'
+    failed = 'failed'
+    timedOut = 'timed out'
+    skipped = 'skipped'
+
+
+class Task(object):
+    ''' a node in the startup graph '''
+
+    def __init__(
+        self,
+        name: str,
+        function: callable,
+        dependsOn: list[str] = None,
+        timeout: Union[float, None] = None,
+        retries: int = 0,
+        retryDelay: float = 1,
+    ):
+        self.name = name
+        self.function = function
+        self.dependsOn: list[str] = dependsOn or []
+        self.timeout = timeout
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.status: str = TaskStatus.pending
+        self.error: Union[Exception, None] = None
+        self.began: Union[float, None] = None
+        self.ended: Union[float, None] = None
+
+    @property
+    def duration(self) -> Union[float, None]:
+        if self.began is None:
+            return None
+        return (self.ended or time.time()) - self.began
+
+    def __call__(self):
+        ''' runs the function, retrying on exceptions '''
+        attempt = 0
+        while True:
+            try:
+                return self.function()
+            except Exception as e:
+                attempt += 1
+                if attempt > self.retries or self.status == TaskStatus.timedOut:
+                    raise e
+                logging.warning(
+                    f'startup task {self.name} failed, retrying: {e}')
+                time.sleep(self.retryDelay * attempt)
+
+    def __repr__(self):
+        return f'Task({self.name}, {self.status})'
+
+
+class TaskGraph(object):
+    ''' runs tasks concurrently, respecting their dependencies '''
+
+    def __init__(
+        self,
+        tasks: list[Task],
+        maxWorkers: int = None,
+        onFinished: callable = None,
+    ):
+        self.tasks: dict[str, Task] = {task.name: task for task in tasks}
+        self.maxWorkers = maxWorkers or len(tasks) or 1
+        # called with each task once it has succeeded, failed or timed out
+        self.onFinished = onFinished
+        self.verify()
+
+    def verify(self):
+        ''' raises if a dependency is unknown or the graph has a cycle '''
+        for task in self.tasks.values():
+            for dependency in task.dependsOn:
+                if dependency not in self.tasks:
+                    raise ValueError(
+                        f'{task.name} depends on unknown task {dependency}')
+        visiting, visited = set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f'startup graph has a cycle at {name}')
+            visiting.add(name)
+            for dependency in self.tasks[name].dependsOn:
+                visit(dependency)
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name)
+
+    def ready(self) -> list[Task]:
+        ''' pending tasks whose dependencies have all succeeded '''
+        return [
+            task for task in self.tasks.values()
+            if task.status == TaskStatus.pending and all(
+                self.tasks[d].status == TaskStatus.succeeded
+                for d in task.dependsOn)]
+
+    def skipBlocked(self):
+        ''' skips pending tasks whose dependencies can no longer succeed '''
+        changed = True
+        while changed:
+            changed = False
+            for task in self.tasks.values():
+                if task.status == TaskStatus.pending and any(
+                    self.tasks[d].status in [
+                        TaskStatus.failed,
+                        TaskStatus.timedOut,
+                        TaskStatus.skipped]
+                    for d in task.dependsOn
+                ):
+                    task.status = TaskStatus.skipped
+                    changed = True
+
+    def finished(self, task: Task):
+        if self.onFinished is not None:
+            try:
+                self.onFinished(task)
+            except Exception as e:
+                logging.error(f'startup task callback failed: {e}')
+
+    def run(self) -> dict[str, str]:
+        ''' runs the graph to completion, returns the status of each task '''
+        # at most maxWorkers tasks run at once, the rest wait their turn
+        slots = threading.Semaphore(self.maxWorkers)
+        running: dict[Future, Task] = {}
+
+        def launch(task: Task):
+            task.began = time.time()
+            task.status = TaskStatus.running
+            future = Future()
+
+            def work():
+                with slots:
+                    if not future.set_running_or_notify_cancel():
+                        return
+                    try:
+                        future.set_result(task())
+                    except BaseException as e:
+                        future.set_exception(e)
+
+            # a timed out task is abandoned, its thread is never waited on
+            threading.Thread(
+                target=work, name=f'startup {task.name}', daemon=True).start()
+            running[future] = task
+
+        for task in self.ready():
+            launch(task)
+        while running:
+            deadlines = [
+                task.began + task.timeout
+                for task in running.values()
+                if task.timeout is not None]
+            done, _ = wait(
+                list(running.keys()),
+                timeout=(
+                    max(min(deadlines) - time.time(), 0)
+                    if deadlines else None),
+                return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                task.ended = time.time()
+                try:
+                    future.result()
+                    task.status = TaskStatus.succeeded
+                except Exception as e:
+                    task.status = TaskStatus.failed
+                    task.error = e
+                    logging.error(
+                        f'startup task {task.name} failed: {e}')
+                self.finished(task)
+            now = time.time()
+            for future, task in list(running.items()):
+                if task.timeout is None:
+                    continue
+                if now >= task.began + task.timeout:
+                    running.pop(future)
+                    task.ended = now
+                    task.status = TaskStatus.timedOut
+                    logging.error(
+                        f'startup task {task.name} timed out '
+                        f'after {task.timeout}s')
+                    self.finished(task)
+            self.skipBlocked()
+            for task in self.ready():
+                launch(task)
+        return {name: task.status for name, task in self.tasks.items()}
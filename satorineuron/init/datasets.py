@@ -0,0 +1,116 @@
+'''
+one dataset for all the models that build the same one. each ModelManager is
+handed a memory class (satorilib's memory.Memory) and builds its dataset with
+it, merging the histories of its inputs. models that depend on the same
+subscriptions make the same merge over the same frames, each keeping a copy.
+
+the store hands out a memory class whose calls over a list of DataFrames go
+through it: a call is made once per change of the frames it's given and every
+model asking for the same one gets the same result. with copy on write a model
+that modifies its dataset copies only what it changes, so nobody can change it
+underneath the others. only the latest result of each call is kept, and the
+store is cleared when the streams change at checkin.
+
+    memory=getStart().datasets.memory(memory.Memory)
+'''
+from typing import Union
+import threading
+from functools import wraps
+import pandas as pd
+
+
+def frameKeyOf(df: pd.DataFrame) -> tuple:
+    ''' the columns, rows and last row of a frame, changes when it does '''
+    if len(df) == 0:
+        return (tuple(df.columns), 0)
+    return (
+        tuple(df.columns),
+        len(df),
+        str(df.index[-1]),
+        str(df.iloc[-1].tolist()))
+
+
+def framesOf(args: tuple, kwargs: dict) -> Union[tuple[Union[int, str], list], None]:
+    ''' the argument that's a list of DataFrames, if there is one '''
+    for name, value in [*enumerate(args), *kwargs.items()]:
+        if (
+            isinstance(value, (list, tuple)) and len(value) > 0 and
+            all(isinstance(df, pd.DataFrame) for df in value)
+        ):
+            return name, value
+    return None
+
+
+class Dataset(object):
+    ''' the latest result of one call and the frames it was made over '''
+
+    def __init__(self, frames: tuple, df: pd.DataFrame):
+        self.frames = frames
+        self.df = df
+        self.hits = 0
+
+
+class DatasetStore(object):
+
+    def __init__(self):
+        # the call without its frames -> its latest result
+        self.datasets: dict[tuple, Dataset] = {}
+        self.made = 0
+        self.lock = threading.Lock()
+
+    def share(self, name: str, function: callable) -> callable:
+        ''' function, with its calls over a list of DataFrames made once '''
+
+        @wraps(function)
+        def shared(*args, **kwargs):
+            found = framesOf(args, kwargs)
+            if found is None:
+                return function(*args, **kwargs)
+            position, dfs = found
+            try:
+                key = (name, position, repr([
+                    value for at, value in [*enumerate(args), *kwargs.items()]
+                    if at != position]))
+            except Exception:
+                return function(*args, **kwargs)
+            frames = tuple(frameKeyOf(df) for df in dfs)
+            with self.lock:
+                dataset = self.datasets.get(key)
+                if dataset is not None and dataset.frames == frames:
+                    dataset.hits += 1
+                    return dataset.df.copy(deep=False)
+            df = function(*args, **kwargs)
+            if not isinstance(df, pd.DataFrame):
+                return df
+            with self.lock:
+                self.datasets[key] = Dataset(frames, df)
+                self.made += 1
+            return df.copy(deep=False)
+
+        return shared
+
+    def memory(self, base: type) -> type:
+        ''' a subclass of base, a memory class, whose static calls share '''
+        members = {}
+        for klass in reversed(base.__mro__):
+            for name, member in vars(klass).items():
+                if not name.startswith('_') and isinstance(member, staticmethod):
+                    members[name] = staticmethod(
+                        self.share(name, member.__func__))
+        return type(f'Shared{base.__name__}', (base,), members)
+
+    def clear(self):
+        with self.lock:
+            self.datasets = {}
+
+    @property
+    def stats(self) -> dict:
+        ''' made is how many calls were run, shared how many were answered '''
+        with self.lock:
+            return {
+                'datasets': len(self.datasets),
+                'made': self.made,
+                'shared': sum(d.hits for d in self.datasets.values()),
+                'bytesHeld': sum(
+                    int(d.df.memory_usage(deep=True).sum())
+                    for d in self.datasets.values())}
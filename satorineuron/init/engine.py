@@ -1,11 +1,10 @@
 from satorilib import logging
 from satorilib.api import memory
-from satorilib.concepts import Observation, Stream
+from satorilib.concepts import Stream
 from satorilib.pubsub import SatoriPubSubConn
-from satoriengine.concepts import HyperParameter
-from satoriengine.model import metrics
-from satoriengine import ModelManager, Engine, DataManager
 from satorineuron import config
+from satorineuron.init.routing import RoutingIndex
+from satorineuron.init.training import limitThreads
 import copy
 
 
@@ -21,10 +20,8 @@ def establishConnection(pubkey: str, key: str, url: str = None, onConnect: calla
 
         # response:
         # {"topic": "{\"source\": \"satori\", \"author\": \"021bd7999774a59b6d0e40d650c2ed24a49a54bdb0b46c922fd13afe8a4f3e4aeb\", \"stream\": \"coinbaseALGO-USD\", \"target\": \"data.rates.ALGO\"}", "data": "0.23114999999999997"}
-        if response != 'failure: error, a minimum 10 seconds between publications per topic.':
-            if response.startswith('{"topic":') or response.startswith('{"data":'):
-                logging.info('received message:', response, print=True)
-                getStart().engine.data.newData.on_next(Observation.parse(response))
+        # parsing, filtering and delivery happen off the socket thread
+        getStart().ingest.submit(response)
 
         # furthermore, shouldn't we do more than route it to the correct models?
         # like, shouldn't we save it to disk, compress if necessary, pin, and
@@ -60,137 +57,191 @@ def establishConnection(pubkey: str, key: str, url: str = None, onConnect: calla
 # accept optional data necessary to generate models data and learner
 
 
+def generateModelManagers(
+    publications: list[Stream],
+    routes: RoutingIndex,
+) -> set['ModelManager']:
+    ''' generate a set of Model(s) for Engine, one per prediction publication '''
+    # the model stack (satoriengine, xgboost, ...) is only imported when needed
+    from satoriengine.concepts import HyperParameter
+    from satoriengine.model import metrics
+    from satoriengine import ModelManager
+    from satorineuron.init.start import getStart
+
+    features = getStart().features
+    # models building the same dataset share it
+    sharedMemory = getStart().datasets.memory(memory.Memory)
+
+    # # unused
+    # def generateCombinedFeature(
+    #    df: pd.DataFrame = None,
+    #    columns: list[tuple] = None,
+    #    prefix='Diff'
+    # ):
+    #    '''
+    #    example of making a feature out of data you know ahead of time.
+    #    most of the time you don't know what kinds of data you'll get...
+    #    '''
+    #    def name():
+    #        return (columns[0][0], columns[0][1], f'{prefix}{columns[0][2]}{columns[1][2]}')
+    #
+    #    if df is None:
+    #        return name()
+    #    columns = columns or []
+    #    feature = df.loc[:, columns[0]] - df.loc[:, columns[1]]
+    #    feature.name = name()
+    #    return feature
+
+    # these will be sensible defaults based upon the patterns in the data
+    kwargs = {
+        'hyperParameters': [
+            HyperParameter(
+                name='lookback_len',
+                value=1,
+                kind=int,
+                limit=1,
+                minimum=1,
+                maximum=64),
+            HyperParameter(
+                name='n_estimators',
+                value=300,
+                kind=int,
+                limit=100,
+                minimum=200,
+                maximum=5000),
+            HyperParameter(
+                name='learning_rate',
+                value=0.3,
+                kind=float,
+                limit=.05,
+                minimum=.01,
+                maximum=.1),
+            HyperParameter(
+                name='max_depth',
+                value=6,
+                kind=int,
+                limit=1,
+                minimum=10,
+                maximum=2),
+            HyperParameter(
+                name='early_stopping_rounds',
+                value=200,
+                kind=int,
+                limit=1,
+                minimum=100,
+                maximum=400),
+        ],
+        'xgbParams': ['n_estimators','learning_rate','max_depth','early_stopping_rounds'],
+        # computed incrementally and shared between models, see features.py
+        'metrics':  {
+            # raw data features
+            'Raw': features.incremental(metrics.rawDataMetric),
+            # daily percentage change, 1 day ago, 2 days ago, 3 days ago...
+            # **{f'Daily{i}': features.incremental(partial(metrics.dailyPercentChangeMetric, yesterday=i), lookback=i+1) for i in list(range(1, 31))},
+            # rolling period transformation percentage change, max of the last 7 days, etc...
+            # **{f'Rolling{tx[0:3]}{i}': features.incremental(partial(metrics.rollingPercentChangeMetric, window=i, transformation=tx), lookback=i+1)
+            #    for tx, i in product('sum() max() min() mean() median() std()'.split(), list(range(2, 21)))},
+            # rolling period transformation percentage change, max of the last 50 or 70 days, etc...
+            # **{f'Rolling{tx[0:3]}{i}': features.incremental(partial(metrics.rollingPercentChangeMetric, window=i, transformation=tx), lookback=i+1)
+            #    for tx, i in product('sum() max() min() mean() median() std()'.split(), list(range(22, 90, 7)))}
+        },
+        # 'features': {
+        #    ('streamrSpoof', 'simpleEURCleanedHL', 'DiffHighLow'):
+        #        partial(
+        #            generateCombinedFeature,
+        #            columns=[
+        #                ('streamrSpoof', 'simpleEURCleanedHL', 'High'),
+        #                ('streamrSpoof', 'simpleEURCleanedHL', 'Low')])
+        # },
+    }
+    models = {
+        ModelManager(
+            variable=publication.predicting,
+            output=publication.id,
+            targets=[
+                subscription.id
+                # will be unique by publication, no need to enforce
+                for subscription in routes.subscriptionsFor(publication)],
+            chosenFeatures=[(
+                subscription.id.source,
+                subscription.id.author,
+                subscription.id.stream,
+                subscription.id.target)
+                # will be unique by publication, no need to enforce
+                for subscription in routes.subscriptionsFor(publication)],
+            memory=sharedMemory,
+            **copy.deepcopy(kwargs))
+        # if publication.id in getStart().caches.keys()
+        for publication in publications
+    }
+    # their fits run on the training pool
+    getStart().harness.wrapAll(models)
+    return models
+
+
 def getEngine(
     subscriptions: list[Stream],
     publications: list[Stream],
-) -> Engine:
+    routes: RoutingIndex = None,
+) -> 'Engine':
     ''' starts the Engine. returns Engine. '''
+    # in process fits stay within the cpu budget, set before xgboost loads
+    limitThreads(config.cpuBudget())
+    from satoriengine import ModelManager, Engine, DataManager
     from satorineuron.init.start import getStart
+    # and once more for the thread pools it loaded
+    limitThreads(config.cpuBudget())
 
-    def generateModelManager():
-        ''' generate a set of Model(s) for Engine '''
-
-        # # unused
-        # def generateCombinedFeature(
-        #    df: pd.DataFrame = None,
-        #    columns: list[tuple] = None,
-        #    prefix='Diff'
-        # ):
-        #    '''
-        #    example of making a feature out of data you know ahead of time.
-        #    most of the time you don't know what kinds of data you'll get...
-        #    '''
-        #    def name():
-        #        return (columns[0][0], columns[0][1], f'{prefix}{columns[0][2]}{columns[1][2]}')
-        #
-        #    if df is None:
-        #        return name()
-        #    columns = columns or []
-        #    feature = df.loc[:, columns[0]] - df.loc[:, columns[1]]
-        #    feature.name = name()
-        #    return feature
-
-        # these will be sensible defaults based upon the patterns in the data
-        kwargs = {
-            'hyperParameters': [
-                HyperParameter(
-                    name='lookback_len',
-                    value=1,
-                    kind=int,
-                    limit=1,
-                    minimum=1,
-                    maximum=64),
-                HyperParameter(
-                    name='n_estimators',
-                    value=300,
-                    kind=int,
-                    limit=100,
-                    minimum=200,
-                    maximum=5000),
-                HyperParameter(
-                    name='learning_rate',
-                    value=0.3,
-                    kind=float,
-                    limit=.05,
-                    minimum=.01,
-                    maximum=.1),
-                HyperParameter(
-                    name='max_depth',
-                    value=6,
-                    kind=int,
-                    limit=1,
-                    minimum=10,
-                    maximum=2),
-                HyperParameter(
-                    name='early_stopping_rounds',
-                    value=200,
-                    kind=int,
-                    limit=1,
-                    minimum=100,
-                    maximum=400),
-            ],
-            'xgbParams': ['n_estimators','learning_rate','max_depth','early_stopping_rounds'],
-            'metrics':  {
-                # raw data features
-                'Raw': metrics.rawDataMetric,
-                # daily percentage change, 1 day ago, 2 days ago, 3 days ago...
-                # **{f'Daily{i}': partial(metrics.dailyPercentChangeMetric, yesterday=i) for i in list(range(1, 31))},
-                # rolling period transformation percentage change, max of the last 7 days, etc...
-                # **{f'Rolling{tx[0:3]}{i}': partial(metrics.rollingPercentChangeMetric, window=i, transformation=tx)
-                #    for tx, i in product('sum() max() min() mean() median() std()'.split(), list(range(2, 21)))},
-                # rolling period transformation percentage change, max of the last 50 or 70 days, etc...
-                # **{f'Rolling{tx[0:3]}{i}': partial(metrics.rollingPercentChangeMetric, window=i, transformation=tx)
-                #    for tx, i in product('sum() max() min() mean() median() std()'.split(), list(range(22, 90, 7)))}
-            },
-            # 'features': {
-            #    ('streamrSpoof', 'simpleEURCleanedHL', 'DiffHighLow'):
-            #        partial(
-            #            generateCombinedFeature,
-            #            columns=[
-            #                ('streamrSpoof', 'simpleEURCleanedHL', 'High'),
-            #                ('streamrSpoof', 'simpleEURCleanedHL', 'Low')])
-            # },
-        }
-        return {
-            ModelManager(
-                variable=publication.predicting,
-                output=publication.id,
-                targets=[
-                    subscription.id
-                    # will be unique by publication, no need to enforce
-                    for subscription in subscriptions
-                    if (
-                        subscription.reason is not None and
-                        subscription.reason.source == publication.id.source and
-                        subscription.reason.author == publication.id.author and
-                        subscription.reason.stream == publication.id.stream and
-                        subscription.reason.target == publication.id.target
-                    )],
-                chosenFeatures=[(
-                    subscription.id.source,
-                    subscription.id.author,
-                    subscription.id.stream,
-                    subscription.id.target)
-                    # will be unique by publication, no need to enforce
-                    for subscription in subscriptions
-                    if (
-                        subscription.reason is not None and
-                        subscription.reason.source == publication.id.source and
-                        subscription.reason.author == publication.id.author and
-                        subscription.reason.stream == publication.id.stream and
-                        subscription.reason.target == publication.id.target
-                )],
-                memory=memory.Memory,
-                **copy.deepcopy(kwargs))
-            # if publication.id in getStart().caches.keys()
-            for publication in publications
-        }
-
+    # subscriptions are looked up by reason in the index, not scanned
+    routes = routes or RoutingIndex(subscriptions, publications)
     ModelManager.setConfig(config)
     # DataManager.setConfig(config)
-    modelManager = generateModelManager()
+    modelManager = generateModelManagers(publications, routes)
+    routes.registerModels(modelManager)
     dataMananger = DataManager(getStart=getStart)
     return Engine(
         getStart=getStart,
         data=dataMananger,
         models=modelManager)
+
+
+def modelKey(model: 'ModelManager') -> tuple:
+    ''' a model is rebuilt when its output or the streams it learns from change '''
+    return (
+        model.output.topic(),
+        frozenset(target.topic() for target in model.targets or []))
+
+
+def reconcileModels(
+    engine: 'Engine',
+    publications: list[Stream],
+    routes: RoutingIndex,
+) -> bool:
+    '''
+    brings a running engine in line with a new assignment without a restart,
+    where it can: models of dropped publications are retired (their train and
+    explore steps stop, see harness.py) and taken out of the engine and the
+    routes, the rest keep running with what they learned. the engine only
+    starts its models' loops when it's built, so a new publication needs a new
+    engine: returns False, changing nothing, if there is one.
+    '''
+    from satorineuron.init.start import getStart
+    wanted = {
+        (publication.id.topic(), frozenset(
+            subscription.id.topic()
+            for subscription in routes.subscriptionsFor(publication))): publication
+        for publication in publications}
+    current = {modelKey(model): model for model in engine.models}
+    if any(key not in current for key in wanted):
+        return False
+    removed = [model for key, model in current.items() if key not in wanted]
+    if not removed:
+        return True
+    harness = getStart().harness
+    for model in removed:
+        harness.retire(model)
+    engine.models = {
+        model for key, model in current.items() if key in wanted}
+    routes.registerModels(engine.models)
+    logging.info(f'models reconciled, {len(removed)} retired', print=True)
+    return True
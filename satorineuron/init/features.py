@@ -0,0 +1,138 @@
+'''
+an incremental store of engine features. the engine's metrics (raw data, the
+daily and rolling percent change families) each turn a stream's column into a
+feature series, and are called over the whole dataset whenever a model
+rebuilds. wrapped by the store, a metric keeps its last result per column and
+on the next call only computes the rows appended since, plus the lookback
+rows they depend on. since the key is the column and the metric's own name
+for the feature, models that use the same inputs share the result.
+
+the values are kept in a buffer that doubles when it fills, so appending the
+new rows costs only those rows, and callers get a read only Series over it.
+
+a metric is called with no dataframe to get the feature's name, as usual:
+
+    features.incremental(partial(metrics.dailyPercentChangeMetric, yesterday=3), lookback=4)
+'''
+from typing import Union
+import threading
+import numpy as np
+import pandas as pd
+
+
+class Feature(object):
+    ''' a feature's values and the index of the rows they were computed for '''
+
+    def __init__(self, series: pd.Series):
+        self.name = series.name
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.values = np.empty(0, dtype=series.dtype)
+        self.index = series.index
+        self.append(series)
+
+    def append(self, series: pd.Series):
+        ''' adds values for the rows after ours, growing the buffer by doubling '''
+        rows = self.rows + len(series)
+        dtype = np.result_type(self.values.dtype, series.dtype)
+        if rows > len(self.values) or dtype != self.values.dtype:
+            values = np.empty(max(rows * 2, 16), dtype=dtype)
+            values[:self.rows] = self.values[:self.rows]
+            self.values = values
+        self.values[self.rows:rows] = series.to_numpy()
+        self.rows = rows
+
+    def extends(self, df: pd.DataFrame) -> bool:
+        ''' whether the rows the values were computed for still begin df '''
+        return 0 < self.rows <= len(df) and (
+            df.index is self.index or
+            df.index[:self.rows].equals(self.index))
+
+    def series(self, index: pd.Index) -> pd.Series:
+        ''' a read only Series over the values, index is the rows' index '''
+        self.index = index
+        values = self.values[:self.rows]
+        values.flags.writeable = False
+        return pd.Series(values, index=index, name=self.name, copy=False)
+
+
+class FeatureStore(object):
+
+    def __init__(self):
+        self.features: dict[tuple, Feature] = {}
+        self.computedRows = 0
+        self.reusedRows = 0
+        self.lock = threading.Lock()
+
+    def compute(
+        self,
+        key: tuple,
+        df: pd.DataFrame,
+        lookback: int,
+        compute: callable,
+    ) -> pd.Series:
+        '''
+        the feature for every row of df, computing only the rows it doesn't
+        have yet. lookback is how many prior rows a row's value depends on.
+        '''
+        with self.lock:
+            feature = self.features.get(key)
+        if feature is not None:
+            with feature.lock:
+                if feature.extends(df):
+                    rows = feature.rows
+                    if rows < len(df):
+                        start = max(rows - lookback, 0)
+                        tail = compute(df.iloc[start:])
+                        feature.append(tail.iloc[rows - start:])
+                        feature.name = tail.name
+                    if feature.rows == len(df):
+                        self.counted(computed=len(df) - rows, reused=rows)
+                        return feature.series(df.index)
+        computed = compute(df)
+        self.counted(computed=len(df), reused=0)
+        if len(computed) != len(df):
+            # not one value per row, nothing to extend later
+            return computed
+        feature = Feature(computed)
+        with self.lock:
+            self.features[key] = feature
+        with feature.lock:
+            return feature.series(df.index)
+
+    def counted(self, computed: int, reused: int):
+        with self.lock:
+            self.computedRows += computed
+            self.reusedRows += reused
+
+    def incremental(self, metric: callable, lookback: int = 0) -> callable:
+        ''' wraps an engine metric so it is computed incrementally '''
+
+        def wrapped(df: pd.DataFrame = None, column: tuple = None, **kwargs):
+            if df is None:
+                return metric(df=None, column=column, **kwargs)
+            name = metric(df=None, column=column, **kwargs)
+            return self.compute(
+                key=(column, name),
+                df=df,
+                lookback=lookback,
+                compute=lambda rows: metric(df=rows, column=column, **kwargs))
+
+        return wrapped
+
+    def forget(self, column: Union[tuple, None] = None):
+        ''' drops the features of a column, or all of them '''
+        with self.lock:
+            if column is None:
+                self.features = {}
+                return
+            for key in [k for k in self.features if k[0] == column]:
+                del self.features[key]
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'features': len(self.features),
+                'computedRows': self.computedRows,
+                'reusedRows': self.reusedRows}
@@ -0,0 +1,287 @@
+'''
+runs the engine's models under the node's control. the engine (satoriengine)
+trains and explores on its own threads, one loop per model, and fits xgboost
+in process. the harness wraps those steps on each ModelManager instance, and
+while a wrapped step runs the xgboost fits it makes are sent to the training
+scheduler's process pool (see training.py) instead of running on the engine
+thread, ordered by when the model's publication has to predict next.
+
+the steps are looked up by name, for the engine versions we know of:
+
+    train:   buildStable
+    explore: produceTestFit
+
+the fitted estimator comes back from the worker and its state is copied onto
+the engine's own estimator, so the engine carries on as if it had fit it.
+
+a model's snapshot (see snapshots.py) is restored on its first step; if it
+was, that first train step is skipped, training continues from the snapshot.
+each train step records the data it started from, for the next snapshot.
+
+train and explore steps first wait for the governor (see throttle.py) to
+permit them, so predict only mode and pauses stop training. explore steps then
+take turns through the hyperparameter search gate (see search.py). a step
+waits up to gateWait seconds to be let through and is skipped if it isn't, so
+the engine's loops block instead of spinning.
+'''
+from typing import Union
+import time
+import threading
+from functools import wraps
+import numpy as np
+import pandas as pd
+from satorilib import logging
+from satorineuron.init.training import TrainingScheduler
+from satorineuron.init.snapshots import ModelSnapshots
+from satorineuron.init.search import HyperparameterSearch
+from satorineuron.init.throttle import Governor
+from satorineuron.init.routing import keyOf
+
+# the step running on this thread, if any
+_running = threading.local()
+
+
+class Step(object):
+    ''' a wrapped step of one model while it runs '''
+
+    def __init__(self, harness: 'ModelHarness', model: 'ModelManager', kind: str):
+        self.harness = harness
+        self.model = model
+        self.kind = kind
+        # cpu seconds its fits took in training workers
+        self.cpu = 0.0
+
+    @property
+    def key(self) -> str:
+        return f'{self.model.output.topic()} {self.kind}'
+
+
+def fitEstimator(
+    df: pd.DataFrame,
+    estimator: object,
+    target: np.ndarray,
+    fitKwargs: dict,
+) -> tuple[object, float]:
+    '''
+    runs in a training worker, returns the fitted estimator and the cpu
+    seconds the fit took. the features come through shared memory, the target
+    is small enough to pickle.
+    '''
+    began = time.process_time()
+    # the pool is sized by the cpu budget, one thread per worker
+    estimator.set_params(n_jobs=1)
+    estimator.fit(df, target, **fitKwargs)
+    return estimator, time.process_time() - began
+
+
+class ModelHarness(object):
+
+    # method names of the steps on a ModelManager, by kind
+    steps = {
+        'train': ['buildStable'],
+        'explore': ['produceTestFit']}
+
+    def __init__(
+        self,
+        training: TrainingScheduler,
+        deadlines: callable = None,
+        snapshots: ModelSnapshots = None,
+        search: HyperparameterSearch = None,
+        governor: Governor = None,
+        gateWait: float = 60,
+    ):
+        self.training = training
+        # model -> when its publication has to predict next, None for now
+        self.deadlines = deadlines or (lambda model: None)
+        self.snapshots = snapshots
+        self.search = search
+        self.governor = governor
+        self.gateWait = gateWait
+        # publication keys of models that took their first step
+        self.started: set[tuple] = set()
+        # models taken out of the engine, their steps do nothing
+        self.retired: set['ModelManager'] = set()
+        self.installed = False
+        # the fit methods install replaced, by class
+        self.originals: dict[type, callable] = {}
+        self.counts = {
+            'offloaded': 0,
+            'inProcess': 0,
+            'failed': 0,
+            'restored': 0,
+            'trainsSkipped': 0,
+            'exploresSkipped': 0,
+            'retired': 0}
+        self.lock = threading.Lock()
+
+    def count(self, name: str):
+        with self.lock:
+            self.counts[name] += 1
+
+    def install(self):
+        ''' routes xgboost fits made inside a step through offload '''
+        with self.lock:
+            if self.installed:
+                return
+            self.installed = True
+        from xgboost import XGBModel, XGBRegressor
+        for cls in [XGBModel, XGBRegressor]:
+            if 'fit' not in cls.__dict__:
+                continue
+            original = cls.__dict__['fit']
+            self.originals[cls] = original
+
+            @wraps(original)
+            def fit(estimator, X, y=None, *args, original=original, **kwargs):
+                step = getattr(_running, 'step', None)
+                if (
+                    step is None or args or y is None or
+                    # arrays would come back with feature names of their own
+                    not isinstance(X, pd.DataFrame)
+                ):
+                    return original(estimator, X, y, *args, **kwargs)
+                return step.harness.offload(
+                    step, estimator, X, y, original, kwargs)
+
+            cls.fit = fit
+
+    def uninstall(self):
+        ''' puts back the fit methods install replaced '''
+        with self.lock:
+            originals, self.originals = self.originals, {}
+            self.installed = False
+        for cls, original in originals.items():
+            cls.fit = original
+
+    def shutdown(self):
+        ''' fits run in process again, the training pool stops '''
+        self.uninstall()
+        self.training.shutdown()
+
+    def wrap(self, model: 'ModelManager'):
+        ''' wraps the steps the model has, on the instance only '''
+        self.install()
+        for kind, names in ModelHarness.steps.items():
+            for name in names:
+                method = getattr(model, name, None)
+                if method is not None and not getattr(method, 'harnessed', False):
+                    setattr(model, name, self.stepOf(model, kind, method))
+
+    def wrapAll(self, models: list['ModelManager']):
+        for model in models:
+            self.wrap(model)
+
+    def retire(self, model: 'ModelManager'):
+        ''' stops the model's steps, its loops go on but do nothing '''
+        with self.lock:
+            if model in self.retired:
+                return
+            self.retired.add(model)
+            self.counts['retired'] += 1
+
+    def restore(self, model: 'ModelManager') -> bool:
+        ''' restores the model's snapshot on its first step only '''
+        key = keyOf(model.output)
+        with self.lock:
+            if key in self.started:
+                return False
+            self.started.add(key)
+        if self.snapshots is None or not self.snapshots.restore(model):
+            return False
+        self.count('restored')
+        logging.info(f'restored the model of {model.output}', color='green')
+        return True
+
+    def stepOf(self, model: 'ModelManager', kind: str, method: callable) -> callable:
+
+        @wraps(method)
+        def step(*args, **kwargs):
+            if getattr(_running, 'step', None) is not None:
+                # a step called from another step runs within it
+                return method(*args, **kwargs)
+            if model in self.retired:
+                return None
+            if self.governor is not None and not self.governor.wait(
+                kind, timeout=self.gateWait
+            ):
+                self.count(f'{kind}sSkipped')
+                return None
+            if self.restore(model) and kind == 'train':
+                return True
+            if kind == 'explore':
+                return self.explore(model, method, *args, **kwargs)
+            fingerprint = (
+                self.snapshots.fingerprint(model)
+                if self.snapshots is not None else None)
+            result = self.run(Step(self, model, kind), method, *args, **kwargs)
+            if fingerprint is not None:
+                self.snapshots.trained(model, fingerprint)
+            return result
+
+        step.harnessed = True
+        return step
+
+    def run(self, step: Step, method: callable, *args, **kwargs):
+        _running.step = step
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _running.step = None
+
+    def explore(self, model: 'ModelManager', method: callable, *args, **kwargs):
+        ''' an explore step, if the search admits it '''
+        step = Step(self, model, 'explore')
+        if self.search is None:
+            return self.run(step, method, *args, **kwargs)
+        key = model.output.topic()
+        if not self.search.acquire(key, timeout=self.gateWait):
+            self.count('exploresSkipped')
+            return None
+        # cpu time, this thread's and its fits' in the training workers, so
+        # waiting on a busy pool doesn't count against the stream
+        began = time.thread_time()
+        try:
+            return self.run(step, method, *args, **kwargs)
+        finally:
+            self.search.release(
+                key,
+                score=getattr(model, 'stableScore', None),
+                seconds=time.thread_time() - began + step.cpu)
+
+    def offload(
+        self,
+        step: Step,
+        estimator: object,
+        X: pd.DataFrame,
+        y: Union[pd.Series, np.ndarray],
+        original: callable,
+        kwargs: dict,
+    ) -> object:
+        ''' fits in a training worker, falls back to fitting in process '''
+        try:
+            future = self.training.submit(
+                key=step.key,
+                function=fitEstimator,
+                df=X,
+                deadline=self.deadlines(step.model),
+                estimator=estimator,
+                target=np.asarray(y),
+                fitKwargs=kwargs)
+        except Exception as e:
+            logging.debug(f'fitting {step.key} in process: {e}')
+            self.count('inProcess')
+            return original(estimator, X, y, **kwargs)
+        try:
+            fitted, cpu = future.result()
+        except Exception:
+            self.count('failed')
+            raise
+        step.cpu += cpu
+        estimator.__dict__.update(fitted.__dict__)
+        self.count('offloaded')
+        return estimator
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counts)
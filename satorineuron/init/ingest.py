@@ -0,0 +1,221 @@
+'''
+the path from the pubsub websocket to the engine, in three stages with bounded
+queues between them so a slow model update can never stall the socket:
+
+    socket thread: cheap filtering, hand off to the raw queue
+    parse thread:  Observation.parse, drop streams we don't carry, dedupe by
+                   observation hash
+    deliver thread: hand the observation to the engine's DataManager
+
+until the engine is built, and while it is paused, delivery is held and
+observations wait in the parsed queue. when a queue is full the producer waits up to blockTimeout and then drops the
+oldest waiting item, so the newest data wins. depths, drops and per stage
+latency are reported by stats (see /debug/ingest).
+'''
+from typing import Union
+import time
+import hashlib
+import threading
+from queue import Queue, Full, Empty
+from collections import OrderedDict
+from satorilib import logging
+from satorilib.concepts import Observation
+
+
+class StageTimer(object):
+    ''' running count, mean and max of a stage's latency in seconds '''
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    @property
+    def toDict(self) -> dict:
+        with self.lock:
+            return {
+                'count': self.count,
+                'mean': self.total / self.count if self.count else None,
+                'max': self.max}
+
+
+class IngestPipeline(object):
+
+    ignored = 'failure: error, a minimum 10 seconds between publications per topic.'
+
+    def __init__(
+        self,
+        deliver: callable,
+        carries: callable = None,
+        size: int = 1000,
+        blockTimeout: float = 0.05,
+        remember: int = 10000,
+        held: bool = False,
+    ):
+        # called with each observation on the deliver thread, returns False
+        # if there was nothing to deliver it to
+        self.deliver = deliver
+        # called with a StreamId, False drops the observation
+        self.carries = carries
+        self.blockTimeout = blockTimeout
+        self.raw: Queue = Queue(maxsize=size)
+        self.parsed: Queue = Queue(maxsize=size)
+        self.seen: OrderedDict[str, None] = OrderedDict()
+        self.remember = remember
+        self.counts = {
+            'received': 0,
+            'ignored': 0,
+            'dropped': 0,
+            'duplicates': 0,
+            'uncarried': 0,
+            'delivered': 0,
+            'undelivered': 0,
+            'errors': 0}
+        self.timers = {'parse': StageTimer(), 'deliver': StageTimer()}
+        self.lock = threading.Lock()
+        # set while observations may be delivered
+        self.open = threading.Event()
+        self.heldUntil: Union[float, None] = None
+        if not held:
+            self.open.set()
+        self.threads = [
+            threading.Thread(
+                target=self.parseForever, name='ingest parse', daemon=True),
+            threading.Thread(
+                target=self.deliverForever, name='ingest deliver', daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def count(self, name: str):
+        with self.lock:
+            self.counts[name] += 1
+
+    def offer(self, queue: Queue, item: tuple):
+        ''' puts item, dropping the oldest waiting item when full '''
+        try:
+            queue.put(item, timeout=self.blockTimeout)
+            return
+        except Full:
+            pass
+        try:
+            queue.get_nowait()
+            self.count('dropped')
+        except Empty:
+            pass
+        try:
+            queue.put_nowait(item)
+        except Full:
+            self.count('dropped')
+
+    def submit(self, response: str):
+        ''' called on the socket thread, must stay cheap '''
+        self.count('received')
+        if response == IngestPipeline.ignored or not (
+            response.startswith('{"topic":') or
+            response.startswith('{"data":')
+        ):
+            self.count('ignored')
+            return
+        self.offer(self.raw, (time.time(), response))
+
+    def hold(self, timeout: Union[float, None] = None):
+        '''
+        stops delivering, parsed observations wait in their queue. with a
+        timeout delivery resumes on its own after timeout seconds.
+        '''
+        with self.lock:
+            self.heldUntil = None if timeout is None else time.time() + timeout
+        self.open.clear()
+
+    def release(self):
+        ''' delivers again, starting with what waited meanwhile '''
+        with self.lock:
+            self.heldUntil = None
+        self.open.set()
+
+    def waitUntilOpen(self):
+        while not self.open.wait(timeout=1):
+            with self.lock:
+                expired = (
+                    self.heldUntil is not None and
+                    time.time() > self.heldUntil)
+            if expired:
+                logging.warning('ingest was held past its timeout, delivering')
+                self.release()
+
+    def isDuplicate(self, observation: Observation, response: str) -> bool:
+        ''' remembers the last few observation hashes '''
+        key = (
+            getattr(observation, 'observationHash', None) or
+            getattr(observation, 'hash', None) or
+            hashlib.blake2s(response.encode(), digest_size=8).hexdigest())
+        with self.lock:
+            if key in self.seen:
+                self.seen.move_to_end(key)
+                return True
+            self.seen[key] = None
+            if len(self.seen) > self.remember:
+                self.seen.popitem(last=False)
+        return False
+
+    def parseForever(self):
+        while True:
+            received, response = self.raw.get()
+            try:
+                observation = Observation.parse(response)
+                streamId = getattr(observation, 'streamId', None)
+                if (
+                    streamId is not None and
+                    self.carries is not None and
+                    not self.carries(streamId)
+                ):
+                    self.count('uncarried')
+                    continue
+                if self.isDuplicate(observation, response):
+                    self.count('duplicates')
+                    continue
+                logging.debug('received message:', response)
+                self.offer(self.parsed, (received, observation))
+            except Exception as e:
+                self.count('errors')
+                logging.error('unable to parse message:', e, response)
+            finally:
+                self.timers['parse'].add(time.time() - received)
+
+    def deliverForever(self):
+        while True:
+            self.waitUntilOpen()
+            try:
+                # wakes up now and then to notice a hold
+                received, observation = self.parsed.get(timeout=0.1)
+            except Empty:
+                continue
+            try:
+                self.count(
+                    'undelivered' if self.deliver(observation) is False
+                    else 'delivered')
+            except Exception as e:
+                self.count('errors')
+                logging.error('unable to deliver observation:', e)
+            finally:
+                self.timers['deliver'].add(time.time() - received)
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            'held': not self.open.is_set(),
+            'depth': {
+                'raw': self.raw.qsize(),
+                'parsed': self.parsed.qsize()},
+            'latency': {
+                name: timer.toDict for name, timer in self.timers.items()}}
@@ -0,0 +1,219 @@
+'''
+fan out of our observations to every destination that should receive them:
+each pubsub server we publish to, and the satori server over http. every
+destination has its own send queue and thread, so a slow or half dead server
+only delays itself. a send that fails is kept in a bounded retry buffer and
+tried again with backoff, once it's due. when the queue or the retry buffer is
+full its oldest message is dropped, a stale observation isn't worth more than
+a new one.
+
+latency and errors are tracked per destination (see /debug/publish).
+'''
+from typing import Union
+import time
+import heapq
+import random
+import threading
+import itertools
+from collections import deque
+from satorilib import logging
+
+
+class Histogram(object):
+    ''' counts of values at or below each bound, the last bucket is the rest '''
+
+    def __init__(self, bounds: list[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    @property
+    def toDict(self) -> dict:
+        return {
+            **{f'<={bound}': count for bound, count in zip(self.bounds, self.counts)},
+            f'>{self.bounds[-1]}': self.counts[-1]}
+
+
+class Destination(object):
+    '''
+    one place we publish to, with its own queue and thread. a failed send
+    waits in the retry buffer until it's due, meanwhile the thread goes on
+    sending what's queued; due retries are sent before new messages.
+    '''
+
+    # milliseconds
+    latencyBounds = [10, 50, 100, 250, 500, 1000, 5000]
+
+    def __init__(
+        self,
+        name: str,
+        send: callable,
+        size: int = 1000,
+        retries: int = 5,
+        retryDelay: float = 1,
+    ):
+        self.name = name
+        self.send = send
+        self.size = size
+        self.retries = retries
+        self.retryDelay = retryDelay
+        # (order, message, attempts), oldest on the left
+        self.queue: deque[tuple[int, dict, int]] = deque()
+        # (due, order, message, attempts), a heap by when it's due
+        self.retrying: list[tuple[float, int, dict, int]] = []
+        # messages in the order they were first put, older is lower
+        self.order = itertools.count()
+        self.condition = threading.Condition()
+        self.latency = Histogram(Destination.latencyBounds)
+        self.errors: dict[str, int] = {}
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self.thread = threading.Thread(
+            target=self.runForever, name=f'publish {name}', daemon=True)
+        self.thread.start()
+
+    def put(self, message: dict, attempts: int = 0):
+        with self.condition:
+            if len(self.queue) >= self.size:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append((next(self.order), message, attempts))
+            self.condition.notify()
+
+    def retry(self, order: int, message: dict, attempts: int):
+        ''' call with the condition held '''
+        if len(self.retrying) >= self.size:
+            oldest = min(range(len(self.retrying)), key=lambda i: self.retrying[i][1])
+            self.retrying[oldest] = self.retrying[-1]
+            self.retrying.pop()
+            heapq.heapify(self.retrying)
+            self.dropped += 1
+        # exponential backoff with jitter
+        due = time.time() + (
+            self.retryDelay * (2 ** (attempts - 1)) * random.uniform(0.5, 1.5))
+        heapq.heappush(self.retrying, (due, order, message, attempts))
+
+    def pending(self) -> list[tuple[dict, int]]:
+        ''' takes what wasn't sent yet, oldest first '''
+        with self.condition:
+            entries = sorted(
+                [(order, message, attempts)
+                 for _, order, message, attempts in self.retrying] +
+                list(self.queue),
+                key=lambda entry: entry[0])
+            self.retrying.clear()
+            self.queue.clear()
+        return [(message, attempts) for _, message, attempts in entries]
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def next(self) -> Union[tuple[int, dict, int], None]:
+        ''' blocks until a retry is due or a message is queued, None if closed '''
+        with self.condition:
+            while not self.closed:
+                now = time.time()
+                if self.retrying and self.retrying[0][0] <= now:
+                    _, order, message, attempts = heapq.heappop(self.retrying)
+                    return order, message, attempts
+                if self.queue:
+                    return self.queue.popleft()
+                self.condition.wait(
+                    timeout=self.retrying[0][0] - now if self.retrying else None)
+            return None
+
+    def runForever(self):
+        while True:
+            entry = self.next()
+            if entry is None:
+                return
+            order, message, attempts = entry
+            began = time.time()
+            try:
+                self.send(**message)
+                with self.condition:
+                    self.latency.add((time.time() - began) * 1000)
+                    self.sent += 1
+            except Exception as e:
+                kind = type(e).__name__
+                with self.condition:
+                    self.errors[kind] = self.errors.get(kind, 0) + 1
+                    if attempts + 1 < self.retries:
+                        self.retry(order, message, attempts + 1)
+                        continue
+                    self.dropped += 1
+                logging.warning(f'giving up publishing to {self.name}: {e}')
+
+    @property
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                'depth': len(self.queue),
+                'retrying': len(self.retrying),
+                'sent': self.sent,
+                'dropped': self.dropped,
+                'errors': dict(self.errors),
+                'latencyMs': self.latency.toDict}
+
+
+class Publisher(object):
+
+    def __init__(self, size: int = 1000, retries: int = 5):
+        self.size = size
+        self.retries = retries
+        self.destinations: dict[str, Destination] = {}
+        self.lock = threading.Lock()
+
+    def set(self, name: str, send: callable):
+        '''
+        adds a destination, replacing any of the same name. what the one it
+        replaces hadn't sent yet is handed over, such as on a reconnect.
+        '''
+        destination = Destination(
+            name=name, send=send, size=self.size, retries=self.retries)
+        with self.lock:
+            previous = self.destinations.get(name)
+            self.destinations[name] = destination
+        if previous is not None:
+            previous.close()
+            for message, attempts in previous.pending():
+                destination.put(message, attempts=attempts)
+
+    def remove(self, prefix: str, keep: list[str] = None):
+        ''' closes the destinations whose name starts with prefix '''
+        with self.lock:
+            names = [
+                n for n in self.destinations
+                if n.startswith(prefix) and n not in (keep or [])]
+            removed = [self.destinations.pop(n) for n in names]
+        for destination in removed:
+            destination.close()
+
+    def publish(self, prefixes: Union[list[str], None] = None, **message):
+        '''
+        queues message for every destination, or those whose name starts with
+        one of prefixes, and returns without waiting for any of them
+        '''
+        with self.lock:
+            destinations = [
+                destination for name, destination in self.destinations.items()
+                if prefixes is None or any(name.startswith(p) for p in prefixes)]
+        for destination in destinations:
+            destination.put(message)
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            destinations = dict(self.destinations)
+        return {
+            name: destination.stats
+            for name, destination in destinations.items()}
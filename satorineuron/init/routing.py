@@ -0,0 +1,103 @@
+'''
+one index from a stream to what depends on it, built from the checkin details
+and shared by getEngine (which subscriptions feed which prediction), repullFor
+and the pubsub router (which models to notify when a stream gets new data).
+'''
+from typing import Union, Iterable
+import threading
+from satorilib.concepts.structs import StreamId, Stream
+
+
+def keyOf(streamId: Union[StreamId, None]) -> Union[tuple, None]:
+    ''' the four fields a stream id is compared on '''
+    if streamId is None:
+        return None
+    return (
+        streamId.source,
+        streamId.author,
+        streamId.stream,
+        streamId.target)
+
+
+class RoutingIndex(object):
+    ''' maps streams to the subscriptions and models that depend on them '''
+
+    def __init__(
+        self,
+        subscriptions: list[Stream] = None,
+        publications: list[Stream] = None,
+    ):
+        self.lock = threading.Lock()
+        # publication key -> subscriptions whose reason is that publication
+        self.reasons: dict[tuple, list[Stream]] = {}
+        # stream key -> models that use it as their variable or a target
+        self.models: dict[tuple, list['ModelManager']] = {}
+        # the streams indexed now, by key
+        self.subscriptions: dict[tuple, Stream] = {}
+        self.publications: dict[tuple, Stream] = {}
+        self.update(subscriptions or [], publications or [])
+
+    def unindex(self, key: tuple):
+        ''' call with the lock held '''
+        subscription = self.subscriptions.pop(key)
+        if subscription.reason is None:
+            return
+        reason = keyOf(subscription.reason)
+        dependents = [
+            s for s in self.reasons.get(reason, []) if s is not subscription]
+        if dependents:
+            self.reasons[reason] = dependents
+        else:
+            self.reasons.pop(reason, None)
+
+    def index(self, key: tuple, subscription: Stream):
+        ''' call with the lock held '''
+        self.subscriptions[key] = subscription
+        if subscription.reason is not None:
+            self.reasons.setdefault(
+                keyOf(subscription.reason), []).append(subscription)
+
+    def update(self, subscriptions: list[Stream], publications: list[Stream]):
+        '''
+        takes on the streams of a checkin. only the subscriptions that were
+        added, dropped or changed (a new definition) are unindexed and
+        indexed again, the rest of the index is left as it is.
+        '''
+        wanted = {keyOf(s.streamId): s for s in subscriptions}
+        with self.lock:
+            for key in [
+                key for key, subscription in self.subscriptions.items()
+                if wanted.get(key) is not subscription
+            ]:
+                self.unindex(key)
+            for key, subscription in wanted.items():
+                if key not in self.subscriptions:
+                    self.index(key, subscription)
+            self.publications = {keyOf(p.streamId): p for p in publications}
+
+    def registerModels(self, models: Iterable['ModelManager']):
+        ''' indexes the models of a newly built engine '''
+        index: dict[tuple, list['ModelManager']] = {}
+        for model in models:
+            for streamId in [model.variable] + list(model.targets or []):
+                dependents = index.setdefault(keyOf(streamId), [])
+                if model not in dependents:
+                    dependents.append(model)
+        with self.lock:
+            self.models = index
+
+    def subscriptionsFor(self, publication: Stream) -> list[Stream]:
+        ''' the subscriptions assigned to us because of this publication '''
+        with self.lock:
+            return list(self.reasons.get(keyOf(publication.id), []))
+
+    def modelsFor(self, streamId: StreamId) -> list['ModelManager']:
+        ''' models whose inputs include this stream '''
+        with self.lock:
+            return list(self.models.get(keyOf(streamId), []))
+
+    def carries(self, streamId: StreamId) -> bool:
+        ''' whether this node subscribes to or publishes the stream '''
+        key = keyOf(streamId)
+        with self.lock:
+            return key in self.subscriptions or key in self.publications
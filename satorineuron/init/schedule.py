@@ -0,0 +1,287 @@
+'''
+readiness events and a timer scheduler for the node. components wait on the
+readiness of what they depend on instead of sleeping for a fixed time, and
+periodic work is registered as named jobs whose timing can be configured and
+inspected (see /debug/scheduler).
+'''
+from typing import Union
+import time
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from satorilib import logging
+
+
+class Readiness(object):
+    ''' named one shot events such as "checkin" or "engine" '''
+
+    def __init__(self):
+        self.events: dict[str, threading.Event] = {}
+        self.times: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def event(self, name: str) -> threading.Event:
+        with self.lock:
+            if name not in self.events:
+                self.events[name] = threading.Event()
+            return self.events[name]
+
+    def set(self, name: str):
+        with self.lock:
+            self.times.setdefault(name, time.time())
+        self.event(name).set()
+
+    def isReady(self, name: str) -> bool:
+        return self.event(name).is_set()
+
+    def wait(self, name: str, timeout: Union[float, None] = None) -> bool:
+        ''' blocks until name is ready, returns False on timeout '''
+        return self.event(name).wait(timeout)
+
+    def when(
+        self,
+        name: str,
+        predicate: callable,
+        interval: float = 0.01,
+        maxInterval: float = 1.0,
+        timeout: Union[float, None] = None,
+    ) -> bool:
+        '''
+        for things we can't be notified about (such as a loop started by a
+        library): sets name once predicate holds. between checks it waits on
+        the event itself, backing off from interval to maxInterval, so it
+        returns as soon as someone else sets name. False on timeout.
+        '''
+        event = self.event(name)
+        deadline = None if timeout is None else time.time() + timeout
+        while not predicate():
+            wait = interval
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            if event.wait(wait):
+                return True
+            interval = min(interval * 2, maxInterval)
+        self.set(name)
+        return True
+
+    @property
+    def status(self) -> dict[str, Union[float, None]]:
+        ''' when each event became ready, None if it hasn't '''
+        with self.lock:
+            return {
+                name: self.times.get(name)
+                for name in self.events.keys()}
+
+
+class Job(object):
+    ''' a named task run once, or every interval seconds '''
+
+    def __init__(
+        self,
+        name: str,
+        task: callable,
+        interval: Union[float, None] = None,
+        delay: Union[float, None] = None,
+    ):
+        self.name = name
+        self.task = task
+        self.interval = interval
+        self.nextRun: float = time.time() + (
+            delay if delay is not None else (interval or 0))
+        self.lastRun: Union[float, None] = None
+        self.lastDuration: Union[float, None] = None
+        self.lastError: Union[str, None] = None
+        self.runs = 0
+        self.running = False
+        self.cancelled = False
+
+    def __lt__(self, other: 'Job'):
+        return self.nextRun < other.nextRun
+
+    def __call__(self):
+        self.running = True
+        self.lastRun = time.time()
+        try:
+            self.task()
+            self.lastError = None
+        except Exception as e:
+            self.lastError = str(e)
+            logging.error(f'scheduled job {self.name} failed: {e}')
+        finally:
+            self.runs += 1
+            self.lastDuration = time.time() - self.lastRun
+            self.running = False
+
+    @property
+    def toDict(self) -> dict:
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'nextRun': (
+                None if self.cancelled or (
+                    self.interval is None and self.lastRun is not None)
+                else self.nextRun),
+            'lastRun': self.lastRun,
+            'lastDuration': self.lastDuration,
+            'lastError': self.lastError,
+            'runs': self.runs,
+            'running': self.running}
+
+
+class Scheduler(object):
+    '''
+    runs jobs when they come due on a single timer thread. each run gets its
+    own daemon thread so a slow job never delays the others, and a job isn't
+    started again while its previous run is still going.
+    '''
+
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self.queue: list[Job] = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(
+            target=self.runForever, name='scheduler', daemon=True)
+        self.thread.start()
+
+    def add(
+        self,
+        name: str,
+        task: callable,
+        interval: Union[float, None] = None,
+        delay: Union[float, None] = None,
+    ) -> Job:
+        ''' schedules task, replacing any job of the same name '''
+        job = Job(name=name, task=task, interval=interval, delay=delay)
+        with self.lock:
+            if name in self.jobs:
+                self.jobs[name].cancelled = True
+            self.jobs[name] = job
+            heapq.heappush(self.queue, job)
+        self.wake.set()
+        return job
+
+    def cancel(self, name: str):
+        with self.lock:
+            job = self.jobs.pop(name, None)
+            if job is not None:
+                job.cancelled = True
+
+    @property
+    def status(self) -> list[dict]:
+        with self.lock:
+            return [job.toDict for job in self.jobs.values()]
+
+    def runForever(self):
+        while True:
+            with self.lock:
+                while self.queue and self.queue[0].cancelled:
+                    heapq.heappop(self.queue)
+                wait = (
+                    max(self.queue[0].nextRun - time.time(), 0)
+                    if self.queue else None)
+            if wait is None or wait > 0:
+                self.wake.wait(wait)
+                self.wake.clear()
+                continue
+            with self.lock:
+                job = heapq.heappop(self.queue)
+                if job.interval is not None:
+                    job.nextRun = time.time() + job.interval
+                    heapq.heappush(self.queue, job)
+            if not job.running:
+                job.running = True
+                threading.Thread(
+                    target=job, name=f'job {job.name}', daemon=True).start()
+
+
+class Coalescer(object):
+    '''
+    debounces bursts of work by key: the first request for a key runs its task
+    window seconds later, requests for the same key in the meantime are folded
+    into that one run. used so a burst of new rows retrains a model once.
+    due tasks run on a small pool, so one slow key doesn't hold up the others,
+    and never twice at once for the same key: a key that comes due while its
+    last run is still going runs again right after it.
+    '''
+
+    def __init__(self, window: float = 1.0, workers: int = 4):
+        self.window = window
+        self.pending: dict[object, float] = {}
+        self.queue: list[tuple[float, int, object, callable]] = []
+        # keys whose task is running, and the task to run again after it
+        self.running: dict[object, Union[callable, None]] = {}
+        self.sequence = 0
+        self.requested = 0
+        self.ran = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='coalesced')
+        self.thread = threading.Thread(
+            target=self.runForever, name='coalescer', daemon=True)
+        self.thread.start()
+
+    def request(self, key: object, task: callable):
+        ''' runs task for key once the window closes, unless already pending '''
+        with self.lock:
+            self.requested += 1
+            if key in self.pending:
+                return
+            self.push(key, task, due=time.time() + self.window)
+        self.wake.set()
+
+    def push(self, key: object, task: callable, due: float):
+        ''' call with the lock held '''
+        self.pending[key] = due
+        self.sequence += 1
+        heapq.heappush(self.queue, (due, self.sequence, key, task))
+
+    def run(self, key: object, task: callable):
+        try:
+            task()
+        except Exception as e:
+            logging.error(f'coalesced task failed: {e}')
+        finally:
+            with self.lock:
+                again = self.running.pop(key, None)
+                if again is not None:
+                    self.push(key, again, due=time.time())
+            if again is not None:
+                self.wake.set()
+
+    def runForever(self):
+        while True:
+            with self.lock:
+                wait = (
+                    max(self.queue[0][0] - time.time(), 0)
+                    if self.queue else None)
+                if wait == 0:
+                    _, _, key, task = heapq.heappop(self.queue)
+                    if key in self.running:
+                        # runs once the current run is done, still pending
+                        self.running[key] = task
+                        continue
+                    # requests from here on start a new window
+                    self.pending.pop(key, None)
+                    self.running[key] = None
+                    self.ran += 1
+            if wait is None or wait > 0:
+                self.wake.wait(wait)
+                self.wake.clear()
+                continue
+            self.pool.submit(self.run, key, task)
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'window': self.window,
+                'requested': self.requested,
+                'ran': self.ran,
+                'saved': self.requested - self.ran - len(self.pending),
+                'pending': len(self.pending),
+                'running': len(self.running)}
@@ -0,0 +1,174 @@
+'''
+budgeted hyperparameter exploration. the engine explores each model's
+HyperParameter ranges on its own, forever, one explore loop per model. the
+model harness (see harness.py) asks this gate before each explore step, so
+exploring is spent where it still pays:
+
+which stream explores next is a bandit: streams that are still improving, in
+score gained per cpu second of exploring, are chosen first, and only slots
+streams explore at once. a stream stops exploring once its budget of cpu
+seconds is spent, or once its best score hasn't improved for patience steps, and
+starts again after rest seconds.
+
+the score is the model's stableScore after the step, higher is better.
+'''
+from typing import Union
+import time
+import math
+import threading
+
+
+class StreamSearch(object):
+    ''' what exploring one stream has cost and gained '''
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.seconds = 0.0
+        self.rounds = 0
+        self.best: Union[float, None] = None
+        self.firstBest: Union[float, None] = None
+        self.stale = 0
+        self.exhaustedAt: Union[float, None] = None
+
+    def record(self, score: Union[float, None], seconds: float, tolerance: float):
+        self.rounds += 1
+        self.seconds += seconds
+        if score is None or (isinstance(score, float) and math.isnan(score)):
+            self.stale += 1
+            return
+        if self.best is None or score > self.best + tolerance * abs(self.best):
+            self.stale = 0
+        else:
+            self.stale += 1
+        if self.best is None or score > self.best:
+            self.best = score
+        if self.firstBest is None:
+            self.firstBest = score
+
+    @property
+    def gain(self) -> float:
+        ''' score gained since the first step '''
+        if self.best is None or self.firstBest is None:
+            return 0.0
+        return self.best - self.firstBest
+
+    @property
+    def gainPerSecond(self) -> Union[float, None]:
+        return self.gain / self.seconds if self.seconds else None
+
+    def toDict(self, patience: int) -> dict:
+        return {
+            'budget': self.budget,
+            'seconds': self.seconds,
+            'rounds': self.rounds,
+            'bestScore': self.best,
+            'gain': self.gain,
+            'gainPerSecond': self.gainPerSecond,
+            'plateaued': self.stale >= patience,
+            'exhaustedAt': self.exhaustedAt}
+
+
+class HyperparameterSearch(object):
+
+    def __init__(
+        self,
+        budget: float = 600,
+        slots: int = 1,
+        patience: int = 3,
+        tolerance: float = 0.01,
+        rest: float = 60*60*24,
+    ):
+        # cpu seconds of exploring per stream
+        self.budget = budget
+        self.slots = max(slots, 1)
+        self.patience = patience
+        self.tolerance = tolerance
+        self.rest = rest
+        self.streams: dict[str, StreamSearch] = {}
+        self.waiting: set[str] = set()
+        self.running = 0
+        self.condition = threading.Condition()
+
+    def searchOf(self, key: str) -> StreamSearch:
+        ''' call with the condition held '''
+        if key not in self.streams:
+            self.streams[key] = StreamSearch(self.budget)
+        return self.streams[key]
+
+    def exhausted(self, key: str) -> bool:
+        ''' call with the condition held '''
+        search = self.searchOf(key)
+        if search.exhaustedAt is not None:
+            if time.time() - search.exhaustedAt < self.rest:
+                return True
+            # rested, explores again on a fresh budget
+            search = self.streams[key] = StreamSearch(self.budget)
+        if search.seconds >= search.budget or search.stale >= self.patience:
+            search.exhaustedAt = time.time()
+            return True
+        return False
+
+    def resetBudget(self, key: str):
+        ''' lets a stream explore again, after its data changed a lot '''
+        with self.condition:
+            self.streams.pop(key, None)
+            self.condition.notify_all()
+
+    def choose(self, keys: set[str]) -> Union[str, None]:
+        '''
+        call with the condition held. the stream to explore next: ones never
+        explored first, then the best gain per second, with an exploration
+        bonus for few rounds.
+        '''
+        candidates = [key for key in keys if not self.exhausted(key)]
+        if not candidates:
+            return None
+        rounds = sum(self.searchOf(key).rounds for key in candidates) + 1
+
+        def priority(key: str) -> float:
+            search = self.searchOf(key)
+            if search.rounds == 0:
+                return math.inf
+            return (search.gainPerSecond or 0.0) + math.sqrt(
+                2 * math.log(rounds) / search.rounds)
+
+        return max(sorted(candidates), key=priority)
+
+    def acquire(self, key: str, timeout: Union[float, None] = None) -> bool:
+        '''
+        blocks until key may take an explore step: it isn't exhausted, a slot
+        is free and the bandit chooses it. False on timeout.
+        '''
+        with self.condition:
+            self.waiting.add(key)
+            try:
+                admitted = self.condition.wait_for(
+                    lambda: (
+                        self.running < self.slots and
+                        self.choose(self.waiting) == key),
+                    timeout=timeout)
+                if admitted:
+                    self.running += 1
+                return admitted
+            finally:
+                self.waiting.discard(key)
+                # whoever is chosen now may be waiting
+                self.condition.notify_all()
+
+    def release(self, key: str, score: Union[float, None], seconds: float):
+        ''' records an explore step acquire admitted, and frees its slot '''
+        with self.condition:
+            self.running -= 1
+            self.searchOf(key).record(score, seconds, self.tolerance)
+            self.condition.notify_all()
+
+    @property
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                'slots': self.slots,
+                'running': self.running,
+                'waiting': len(self.waiting),
+                'streams': {
+                    key: search.toDict(self.patience)
+                    for key, search in self.streams.items()}}
@@ -0,0 +1,202 @@
+'''
+snapshots of each model's best state so a restarted engine predicts with what
+it had learned instead of starting over. a snapshot is kept per publication in
+config.modelPath('snapshots'), as a small json header and a pickled body:
+
+    header: the publication, when it was taken, the dataset fingerprint and
+            the digest of the body
+    body:   the stable model, its score, chosen features and hyperparameters
+
+the body is written first and the header last, a body is only unpickled if
+its digest matches the header's, so a crash between the two writes leaves a
+snapshot that isn't restored rather than a body paired with an older header.
+
+the fingerprint records, for each input stream, how many rows the model was
+trained on and the time and hash of the last one, taken when its train step
+started (see harness.py), from the stream's loaded data, or what it was the
+last time if its cache has unloaded it, so a train step never rereads a
+stream from disk for it. a snapshot is only restored if each stream still
+begins with those rows (new rows may have arrived since), and the body is only
+unpickled once its header matches. models are restored lazily, by the harness
+on their first step, so only their own streams are read.
+'''
+from typing import Union
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+import pandas as pd
+from satorilib.concepts.structs import StreamId
+from satorilib import logging
+from satorineuron import config
+from satorineuron.config.config import atomicWrite
+from satorineuron.init.routing import keyOf
+
+
+def fingerprintOf(df: Union[pd.DataFrame, None]) -> Union[dict, None]:
+    ''' rows, time and hash of the last row of a stream's history '''
+    if df is None or len(df) == 0:
+        return None
+    return {
+        'rows': len(df),
+        'time': str(df.index[-1]),
+        'hash': str(df['hash'].iloc[-1]) if 'hash' in df.columns else None}
+
+
+def extends(df: Union[pd.DataFrame, None], fingerprint: Union[dict, None]) -> bool:
+    ''' whether df begins with the rows the fingerprint describes '''
+    if fingerprint is None:
+        return df is None or len(df) == 0
+    rows = fingerprint.get('rows', 0)
+    if df is None or not 0 < rows <= len(df):
+        return False
+    return (
+        str(df.index[rows - 1]) == fingerprint.get('time') and (
+            fingerprint.get('hash') is None or
+            str(df['hash'].iloc[rows - 1]) == fingerprint.get('hash')))
+
+
+class ModelSnapshots(object):
+
+    # the ModelManager attributes that make up its best model
+    attributes = ['stable', 'stableScore', 'chosenFeatures', 'hyperParameters']
+
+    def __init__(
+        self,
+        path: str = None,
+        histories: callable = None,
+        loaded: callable = None,
+    ):
+        self.path = path or config.modelPath('snapshots')
+        # StreamId -> its history as a DataFrame, or None
+        self.histories = histories or (lambda streamId: None)
+        # StreamId -> its history if it's in memory already, or None
+        self.loaded = loaded or (lambda streamId: None)
+        # stream name -> the fingerprint of its history last time
+        self.latest: dict[str, Union[dict, None]] = {}
+        # publication key -> train steps finished, and the fingerprint of the
+        # data the last one started with
+        self.generations: dict[tuple, int] = {}
+        self.fingerprints: dict[tuple, dict] = {}
+        # publication key -> generation last saved or restored
+        self.saved: dict[tuple, int] = {}
+        self.restored = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def inputsOf(model: 'ModelManager') -> list[StreamId]:
+        return [model.variable] + list(model.targets or [])
+
+    def filename(self, output: StreamId) -> str:
+        name = hashlib.sha1(
+            json.dumps(keyOf(output)).encode()).hexdigest()[:16]
+        return os.path.join(self.path, name)
+
+    def fingerprintOfStream(self, streamId: StreamId) -> Union[dict, None]:
+        ''' from the loaded history, reading it only the first time '''
+        name = '.'.join(str(k) for k in keyOf(streamId))
+        df = self.loaded(streamId)
+        with self.lock:
+            if df is None and name in self.latest:
+                return self.latest[name]
+        fingerprint = fingerprintOf(
+            df if df is not None else self.histories(streamId))
+        with self.lock:
+            self.latest[name] = fingerprint
+        return fingerprint
+
+    def fingerprint(self, model: 'ModelManager') -> dict:
+        return {
+            '.'.join(str(k) for k in keyOf(streamId)):
+                self.fingerprintOfStream(streamId)
+            for streamId in ModelSnapshots.inputsOf(model)}
+
+    def trained(self, model: 'ModelManager', fingerprint: dict):
+        ''' a train step finished on the data fingerprint describes '''
+        key = keyOf(model.output)
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            self.fingerprints[key] = fingerprint
+
+    def save(self, model: 'ModelManager') -> bool:
+        ''' snapshots model if it trained since the last save '''
+        if getattr(model, 'stable', None) is None:
+            return False
+        key = keyOf(model.output)
+        with self.lock:
+            generation = self.generations.get(key)
+            fingerprint = self.fingerprints.get(key)
+            if generation is None or self.saved.get(key) == generation:
+                return False
+        os.makedirs(self.path, exist_ok=True)
+        filename = self.filename(model.output)
+        body = pickle.dumps(
+            {
+                attribute: getattr(model, attribute)
+                for attribute in ModelSnapshots.attributes
+                if hasattr(model, attribute)},
+            protocol=pickle.HIGHEST_PROTOCOL)
+        atomicWrite(f'{filename}.pickle', lambda f: f.write(body), mode='wb')
+        # last, it makes the body valid
+        atomicWrite(
+            f'{filename}.json',
+            lambda f: json.dump({
+                'publication': list(key),
+                'taken': time.time(),
+                'fingerprint': fingerprint,
+                'digest': hashlib.sha256(body).hexdigest()}, f))
+        with self.lock:
+            self.saved[key] = generation
+        return True
+
+    def saveAll(self, models: list['ModelManager']) -> int:
+        saved = 0
+        for model in models:
+            try:
+                saved += int(self.save(model))
+            except Exception as e:
+                logging.warning(f'unable to snapshot {model.output}: {e}')
+        return saved
+
+    def restore(self, model: 'ModelManager') -> bool:
+        ''' loads the model's snapshot if its dataset still holds '''
+        filename = self.filename(model.output)
+        try:
+            with open(f'{filename}.json', mode='r') as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return False
+        fingerprint = header.get('fingerprint', {})
+        for streamId in ModelSnapshots.inputsOf(model):
+            name = '.'.join(str(k) for k in keyOf(streamId))
+            if name not in fingerprint or not extends(
+                self.histories(streamId), fingerprint[name]
+            ):
+                return False
+        try:
+            with open(f'{filename}.pickle', mode='rb') as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != header.get('digest'):
+                logging.warning(
+                    f'snapshot of {model.output} is incomplete, not restored')
+                return False
+            body = pickle.loads(data)
+        except Exception as e:
+            logging.warning(f'unable to load snapshot of {model.output}: {e}')
+            return False
+        for attribute, value in body.items():
+            setattr(model, attribute, value)
+        key = keyOf(model.output)
+        with self.lock:
+            self.generations.setdefault(key, 0)
+            self.fingerprints[key] = fingerprint
+            self.saved[key] = self.generations[key]
+            self.restored += 1
+        return True
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {'restored': self.restored, 'saved': len(self.saved)}
@@ -7,7 +7,6 @@ import threading
 from reactivex.subject import BehaviorSubject
 from queue import Queue
 import satorineuron
-import satoriengine
 from satorilib.concepts.structs import StreamId, Stream
 from satorilib.api import disk
 from satorilib.api.wallet import RavencoinWallet, EvrmoreWallet
@@ -19,9 +18,25 @@ from satorilib.asynchronous import AsyncThread
 from satorineuron import logging
 from satorineuron import config
 from satorineuron.init.restart import restartLocalSatori
+from satorineuron.init.dag import Task, TaskGraph
+from satorineuron.init.timeline import timeline
+from satorineuron.init.caches import CacheRegistry
+from satorineuron.init.verify import CacheVerifier
+from satorineuron.init.schedule import Readiness, Scheduler, Coalescer
+from satorineuron.init.routing import RoutingIndex, keyOf
+from satorineuron.init.ingest import IngestPipeline
+from satorineuron.init.training import TrainingScheduler
+from satorineuron.init.harness import ModelHarness
+from satorineuron.init.snapshots import ModelSnapshots
+from satorineuron.init.search import HyperparameterSearch
+from satorineuron.init.features import FeatureStore
+from satorineuron.init.datasets import DatasetStore
+from satorineuron.init.throttle import Governor, EngineMode
+from satorineuron.init.publish import Publisher
 from satorineuron.init.tag import LatestTag
 from satorineuron.common.structs import ConnectionTo
 from satorineuron.relay import RawStreamRelayEngine, ValidateRelayStream
+from satorineuron.relay.fetch import fetcher
 from satorineuron.structs.start import StartupDagStruct
 from satorineuron.structs.pubsub import SignedStreamId
 from satorineuron.synergy.engine import SynergyManager
@@ -56,6 +71,7 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         urlSynergy: str = None,
         isDebug: bool = False
     ):
+        initBegan = time.time()
         super(StartupDag, self).__init__(*args)
         self.env = env
         self.lastWalletCall = 0
@@ -81,60 +97,178 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         self._ravencoinVault: Union[RavencoinWallet, None] = None
         self._evrmoreVault: Union[EvrmoreWallet, None] = None
         self.details: CheckinDetails = None
+        self.checkinLock = threading.Lock()
+        self.checkedIn: bool = False
+        self.warmed: bool = False
+        # the streams the running relay and engine were built for
+        self.relayStreams: Union[frozenset, None] = None
+        self.engineStreams: Union[frozenset, None] = None
         self.key: str
         self.oracleKey: str
         self.idKey: str
         self.subscriptionKeys: str
         self.publicationKeys: str
         # self.ipfs: Ipfs = Ipfs()
-        self.caches: dict[StreamId, disk.Cache] = {}
+        self.routes: RoutingIndex = RoutingIndex()
+        self.caches: CacheRegistry = CacheRegistry(
+            budget=config.cacheMemoryBudget())
         self.relayValidation: ValidateRelayStream
+        self.cacheVerifier: Union[CacheVerifier, None] = None
         self.server: SatoriServerClient
         self.sub: SatoriPubSubConn = None
         self.pubs: list[SatoriPubSubConn] = []
         self.synergy: Union[SynergyManager, None] = None
         self.relay: RawStreamRelayEngine = None
-        self.engine: satoriengine.Engine
+        self.engine: 'satoriengine.Engine' = None
         self.publications: list[Stream] = []
         self.subscriptions: list[Stream] = []
         self.udpQueue: Queue = Queue()
         self.stakeStatus: bool = False
         self.miningMode: bool = False
         self.mineToVault: bool = False
-        if not config.get().get('disable_restart', False):
-            self.restartThread = threading.Thread(
-                target=self.restartEverythingPeriodic, daemon=True)
-        self.restartThread.start()
-        self.checkinCheckThread = threading.Thread(
-            target=self.checkinCheck, daemon=True)
-        self.checkinCheckThread.start()
+        self.ready: Readiness = Readiness()
+        self.scheduler: Scheduler = Scheduler()
+        self.publisher: Publisher = Publisher(
+            size=config.value(key='publish retry buffer', default=1000))
+        self.publisher.set(
+            'server',
+            send=lambda **message: self.server.publish(
+                isPrediction=False, **message))
+        self.governor: Governor = Governor(
+            workers=lambda: self.training.workers,
+            maxCpuPercent=config.value(key='max cpu percent', default=None))
+        # the engine's fits run here, through the model harness
+        self.training: TrainingScheduler = TrainingScheduler(
+            processes=config.cpuBudget(),
+            permits=lambda: self.governor.permits('train'))
+        self.features: FeatureStore = FeatureStore()
+        self.datasets: DatasetStore = DatasetStore()
+        self.snapshots: ModelSnapshots = ModelSnapshots(
+            histories=self.historyOf,
+            loaded=self.loadedHistoryOf)
+        self.search: HyperparameterSearch = HyperparameterSearch(
+            budget=config.value(key='search budget', default=600),
+            slots=config.value(key='search slots', default=1))
+        # models pick up where they left off, restored on their first step
+        self.harness: ModelHarness = ModelHarness(
+            training=self.training,
+            deadlines=self.deadlineOf,
+            snapshots=self.snapshots,
+            search=self.search,
+            governor=self.governor)
+        self.coalescer: Coalescer = Coalescer(
+            window=config.value(key='update coalescing window', default=1.0),
+            workers=config.value(key='update coalescing workers', default=4))
+        self.ingest: IngestPipeline = IngestPipeline(
+            deliver=self.deliverObservation,
+            carries=self.routes.carries,
+            size=config.value(key='ingest queue size', default=1000),
+            # released once the engine is built
+            held=True)
+        if not config.value(key='disable_restart', default=False):
+            self.restartTime = time.time() + config.value(
+                key='restartTime',
+                default=random.randint(60*60*21, 60*60*24))
+            self.latestTag = LatestTag()
+            self.scheduler.add(
+                'restart check',
+                task=self.restartCheck,
+                interval=config.value(
+                    key='restart check interval',
+                    default=random.randint(10, 20)))
+        # caches load their data after they're handed out, so their sizes
+        # are only known by measuring them again now and then
+        self.scheduler.add(
+            'cache budget',
+            task=self.caches.measure,
+            interval=config.value(key='cache measure interval', default=30))
+        self.scheduler.add(
+            'checkin check',
+            task=self.checkinCheck,
+            interval=config.value(
+                key='checkin check interval',
+                default=60*60*6))
         # self.delayedStart()
         alreadySetup: bool = os.path.exists(config.walletPath('wallet.yaml'))
         if not alreadySetup:
-            threading.Thread(target=self.delayedEngine).start()
+            self.scheduler.add(
+                'delayed engine',
+                task=self.delayedEngine,
+                delay=config.value(key='delayed engine', default=60*60*6))
         self.ranOnce = False
-        while True:
-            if self.asyncThread.loop is not None:
-                self.checkinThread = self.asyncThread.repeatRun(
-                    task=self.start,
-                    interval=60*60*24 if alreadySetup else 60*60*12)
-                break
-            time.sleep(60*15)
+        # the loop is started by AsyncThread, which can't notify us
+        if not self.ready.when(
+            'loop',
+            lambda: self.asyncThread.loop is not None,
+            timeout=60,
+        ):
+            logging.warning('async loop did not start within 60s')
+        self.checkinThread = self.asyncThread.repeatRun(
+            task=self.start,
+            interval=60*60*24 if alreadySetup else 60*60*12)
+        timeline.record('StartupDag.__init__', initBegan, time.time())
+        self.persistTimeline()
+
+    def persistTimeline(self):
+        ''' saves the boot timeline so it survives the daily restart '''
+        try:
+            timeline.persist(config.dataPath('startup-timeline.json'))
+        except Exception as e:
+            logging.warning(f'unable to save startup timeline: {e}')
+
+    def recordStartupTask(self, task: Task):
+        timeline.record(
+            task.name,
+            began=task.began,
+            ended=task.ended,
+            status=task.status)
+        self.persistTimeline()
 
     def delayedEngine(self):
-        time.sleep(60*60*6)
-        self.buildEngine()
+        ''' fallback for fresh installs, if startup never built the engine '''
+        if not self.ready.isReady('engine'):
+            self.buildEngine()
 
     def checkinCheck(self):
-        while True:
-            time.sleep(60*60*6)
-            if self.server.checkinCheck():
-                self.triggerRestart()  # should just be start()
+        if self.ready.isReady('checkin') and self.server.checkinCheck():
+            self.triggerRestart()  # should just be start()
 
     def cacheOf(self, streamId: StreamId) -> Union[disk.Cache, None]:
         ''' returns the reference to the cache of a stream '''
         return self.caches.get(streamId)
 
+    def historyOf(self, streamId: StreamId) -> Union['pd.DataFrame', None]:
+        ''' the history of a stream, as loaded by its cache '''
+        cache = self.cacheOf(streamId)
+        if cache is None:
+            return None
+        df = getattr(cache, 'cache', None)
+        if df is None or len(df) == 0:
+            df = cache.read()
+        return df
+
+    def loadedHistoryOf(self, streamId: StreamId) -> Union['pd.DataFrame', None]:
+        ''' the history of a stream if its cache has it loaded, never reads '''
+        cache = self.cacheOf(streamId)
+        df = getattr(cache, 'cache', None) if cache is not None else None
+        if df is None or len(df) == 0:
+            return None
+        return df
+
+    def deadlineOf(self, model: 'ModelManager') -> float:
+        ''' when the model's publication has to predict next '''
+        cadence = Stream.minimumCadence
+        for publication in self.publications:
+            if publication.id == model.output:
+                cadence = max(publication.cadence or cadence, cadence)
+                break
+        return time.time() + cadence
+
+    def snapshotModels(self):
+        ''' saves the models whose stable model changed since last time '''
+        if self.engine is not None:
+            self.snapshots.saveAll(list(getattr(self.engine, 'models', [])))
+
     @property
     def rewardAddress(self) -> str:
         if isinstance(self.details, CheckinDetails):
@@ -308,21 +442,54 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         if self.ranOnce:
             time.sleep(60*60)
         self.ranOnce = True
-        self.setMiningMode()
-        self.createRelayValidation()
-        self.getWallet()
-        self.getVault()
-        self.checkin()
-        self.verifyCaches()
-        # self.startSynergyEngine()
-        self.subConnect()
-        self.pubsConnect()
+        # every run checks in again and reconciles against that checkin
+        with self.checkinLock:
+            self.checkedIn = False
+            self.warmed = False
+        statuses = TaskGraph(
+            self.startupTasks(),
+            onFinished=self.recordStartupTask).run()
+        logging.info('startup:', statuses, print=True)
         if self.isDebug:
             return
-        self.startRelay()
-        self.buildEngine()
         time.sleep(60*60*24)
 
+    def startupTasks(self) -> list[Task]:
+        '''
+        the startup DAG: once checkin has finished, caches, pubsub connections,
+        the relay and the engine do not depend on each other and start together
+        '''
+        tasks = [
+            Task('setMiningMode', self.setMiningMode, timeout=60),
+            Task('createRelayValidation', self.createRelayValidation),
+            Task('getWallet', self.getWallet, timeout=60*5, retries=2),
+            Task('getVault', self.getVault, timeout=60*5, retries=2),
+            # checkin retries and backs off on its own, never give up on it
+            Task('checkin', self.checkin, dependsOn=['getWallet']),
+            Task('verifyCaches', self.verifyCaches, dependsOn=['checkin']),
+            # self.startSynergyEngine()
+            Task(
+                'subConnect', self.subConnect,
+                dependsOn=['checkin'], timeout=60*5, retries=3),
+            Task(
+                'pubsConnect', self.pubsConnect,
+                dependsOn=['checkin'], timeout=60*5, retries=3)]
+        if self.isDebug:
+            return tasks
+        return tasks + [
+            # start from the last good checkin while the fresh one is pending
+            Task('warmStart', self.warmStart),
+            Task('warmEngine', self.warmEngine, dependsOn=['warmStart']),
+            # the relay publishes through the pubsub connections, which need
+            # the keys of a fresh checkin, so it never starts warm
+            Task(
+                'startRelay', self.reconcileRelay,
+                dependsOn=['checkin', 'createRelayValidation', 'pubsConnect'],
+                timeout=60*5, retries=1),
+            Task(
+                'buildEngine', self.reconcileEngine,
+                dependsOn=['checkin', 'warmEngine'])]
+
     def updateConnectionStatus(self, connTo: ConnectionTo, status: bool):
         # logging.info('connTo:', connTo, status, color='yellow')
         self.latestConnectionStatus = {
@@ -348,67 +515,30 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         attempt = 0
         while True:
             attempt += 1
+            attemptBegan = time.time()
             try:
-                self.details = CheckinDetails(
-                    self.server.checkin(referrer=referrer))
+                raw = self.server.checkin(referrer=referrer)
+                details = CheckinDetails(raw)
+                timeline.record(
+                    f'checkin attempt {attempt}', attemptBegan, time.time())
                 self.updateConnectionStatus(
                     connTo=ConnectionTo.central,
                     status=True)
-                # logging.debug(self.details, color='magenta')
-                self.key = self.details.key
-                self.oracleKey = self.details.oracleKey
-                self.idKey = self.details.idKey
-                self.subscriptionKeys = self.details.subscriptionKeys
-                self.publicationKeys = self.details.publicationKeys
-                self.subscriptions = [
-                    Stream.fromMap(x)
-                    for x in json.loads(self.details.subscriptions)]
-                if attempt < 5 and (self.details is None or len(self.subscriptions) == 0):
+                # logging.debug(details, color='magenta')
+                if attempt < 5 and len(json.loads(details.subscriptions)) == 0:
                     time.sleep(30)
                     continue
-                logging.info('subscriptions:', len(
-                    self.subscriptions), print=True)
-                # logging.info('subscriptions:', self.subscriptions, print=True)
-                self.publications = [
-                    Stream.fromMap(x)
-                    for x in json.loads(self.details.publications)]
-                logging.info('publications:', len(
-                    self.publications), print=True)
-                # logging.info('publications:', self.publications, print=True)
-                self.caches = {
-                    x.streamId: disk.Cache(id=x.streamId)
-                    for x in set(self.subscriptions + self.publications)}
-                # for k, v in self.caches.items():
-                #    logging.debug(k, v, color='magenta')
-
-                # logging.debug(self.caches, color='yellow')
-                # self.signedStreamIds = [
-                #    SignedStreamId(
-                #        source=s.id.source,
-                #        author=s.id.author,
-                #        stream=s.id.stream,
-                #        target=s.id.target,
-                #        publish=False,
-                #        subscribe=True,
-                #        signature=sig,  # doesn't the server need my pubkey?
-                #        signed=self.wallet.sign(sig)) for s, sig in zip(
-                #            self.subscriptions,
-                #            self.subscriptionKeys)
-                # ] + [
-                #    SignedStreamId(
-                #        source=p.id.source,
-                #        author=p.id.author,
-                #        stream=p.id.stream,
-                #        target=p.id.target,
-                #        publish=True,
-                #        subscribe=True,
-                #        signature=sig,  # doesn't the server need my pubkey?
-                #        signed=self.wallet.sign(sig)) for p, sig in zip(
-                #            self.publications,
-                #            self.publicationKeys)]
+                with self.checkinLock:
+                    self.applyCheckin(details)
+                    self.checkedIn = True
+                self.ready.set('checkin')
+                self.saveCheckin(details)
                 logging.info('checked in with Satori', color='green')
                 break
             except Exception as e:
+                timeline.record(
+                    f'checkin attempt {attempt}', attemptBegan, time.time(),
+                    status='failed')
                 self.updateConnectionStatus(
                     connTo=ConnectionTo.central,
                     status=False)
@@ -417,17 +547,181 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
             logging.warning(f'trying again in {x}')
             time.sleep(x)
 
-    def verifyCaches(self) -> bool:
-        ''' rehashes my published hashes '''
+    def applyCheckin(self, details: CheckinDetails):
+        ''' takes on the keys and streams assigned by a checkin '''
+        self.details = details
+        self.key = self.details.key
+        self.oracleKey = self.details.oracleKey
+        self.idKey = self.details.idKey
+        self.subscriptionKeys = self.details.subscriptionKeys
+        self.publicationKeys = self.details.publicationKeys
+        self.applyStreams(*StartupDag.streamsOf(
+            subscriptions=self.details.subscriptions,
+            publications=self.details.publications))
+
+    @staticmethod
+    def streamsOf(subscriptions: str, publications: str) -> tuple[list[Stream], list[Stream]]:
+        ''' parses the stream definitions of a checkin '''
+        return (
+            [Stream.fromMap(x) for x in json.loads(subscriptions)],
+            [Stream.fromMap(x) for x in json.loads(publications)])
+
+    def applyStreams(self, subscriptions: list[Stream], publications: list[Stream]):
+        ''' takes on the assigned streams, from a checkin or the saved one '''
+        self.subscriptions = subscriptions
+        logging.info('subscriptions:', len(
+            self.subscriptions), print=True)
+        # logging.info('subscriptions:', self.subscriptions, print=True)
+        self.publications = publications
+        logging.info('publications:', len(
+            self.publications), print=True)
+        # logging.info('publications:', self.publications, print=True)
+        self.routes.update(self.subscriptions, self.publications)
+        with timeline.phase('build caches'):
+            # opened lazily, handles survive re-checkins
+            self.caches.register(
+                x.streamId
+                for x in set(self.subscriptions + self.publications))
+            self.datasets.clear()
+        # for k, v in self.caches.items():
+        #    logging.debug(k, v, color='magenta')
+
+        # logging.debug(self.caches, color='yellow')
+        # self.signedStreamIds = [
+        #    SignedStreamId(
+        #        source=s.id.source,
+        #        author=s.id.author,
+        #        stream=s.id.stream,
+        #        target=s.id.target,
+        #        publish=False,
+        #        subscribe=True,
+        #        signature=sig,  # doesn't the server need my pubkey?
+        #        signed=self.wallet.sign(sig)) for s, sig in zip(
+        #            self.subscriptions,
+        #            self.subscriptionKeys)
+        # ] + [
+        #    SignedStreamId(
+        #        source=p.id.source,
+        #        author=p.id.author,
+        #        stream=p.id.stream,
+        #        target=p.id.target,
+        #        publish=True,
+        #        subscribe=True,
+        #        signature=sig,  # doesn't the server need my pubkey?
+        #        signed=self.wallet.sign(sig)) for p, sig in zip(
+        #            self.publications,
+        #            self.publicationKeys)]
+
+    def saveCheckin(self, details: CheckinDetails):
+        '''
+        remembers the streams of the last good checkin for the next warm start.
+        only their definitions, the keys always come from a fresh checkin.
+        '''
+        try:
+            config.put('checkin', data={
+                'subscriptions': details.subscriptions,
+                'publications': details.publications})
+        except Exception as e:
+            logging.warning(f'unable to save checkin snapshot: {e}')
+
+    def warmStart(self) -> bool:
+        '''
+        takes on the streams of the last good checkin so caches and the engine
+        can start before the central server answers. the fresh checkin is
+        reconciled against it in reconcileEngine.
+        only on boot, later runs reconcile what is already running.
+        '''
+        try:
+            saved = config.get('checkin')
+            if not isinstance(saved, dict) or not (
+                'subscriptions' in saved and 'publications' in saved
+            ):
+                return False
+            subscriptions, publications = StartupDag.streamsOf(
+                subscriptions=saved['subscriptions'],
+                publications=saved['publications'])
+        except Exception as e:
+            logging.warning(f'unable to warm start from checkin: {e}')
+            return False
+        with self.checkinLock:
+            if self.checkedIn or self.relay is not None or self.engine is not None:
+                return False
+            self.applyStreams(subscriptions, publications)
+            self.warmed = True
+        logging.info('warm start from last checkin', color='green')
+        return True
+
+    @staticmethod
+    def relayFingerprint(publications: list[Stream]) -> frozenset:
+        return frozenset(p.streamId.topic() for p in publications)
+
+    @staticmethod
+    def engineFingerprint(
+        subscriptions: list[Stream],
+        publications: list[Stream],
+    ) -> frozenset:
+        return frozenset(
+            [('p', p.streamId.topic())
+             for p in StartupDag.predictionStreams(publications)] +
+            [('s', s.streamId.topic(), s.reason.topic() if s.reason else None)
+             for s in subscriptions])
+
+    def warmStreams(self) -> Union[tuple[list[Stream], list[Stream]], None]:
+        '''
+        the warm started streams, unless a fresh checkin already replaced them.
+        the lock only covers taking them, builds run outside of it.
+        '''
+        with self.checkinLock:
+            if self.warmed and not self.checkedIn:
+                return list(self.subscriptions), list(self.publications)
+        return None
+
+    def warmEngine(self):
+        streams = self.warmStreams()
+        if streams is not None:
+            self.buildEngine(*streams)
 
-        def validateCache(cache: disk.Cache):
-            success, _ = cache.validateAllHashes()
-            if not success:
-                cache.saveHashes()
+    def reconcileRelay(self):
+        ''' (re)starts the relay unless it already relays the assigned streams '''
+        if self.relayStreams != StartupDag.relayFingerprint(self.publications):
+            self.startRelay()
 
-        for stream in set(self.publications):
-            cache = self.cacheOf(stream.id)
-            self.asyncThread.runAsync(cache, task=validateCache)
+    def reconcileEngine(self):
+        '''
+        builds the engine, or brings the running one in line with the assigned
+        streams: models of dropped publications are retired, the others keep
+        what they have learned. new publications need a new engine, a restart.
+        '''
+        if self.engine is None:
+            return self.buildEngine()
+        fingerprint = StartupDag.engineFingerprint(
+            self.subscriptions, self.publications)
+        if self.engineStreams == fingerprint:
+            return
+        if satorineuron.engine.reconcileModels(
+            self.engine,
+            publications=StartupDag.predictionStreams(self.publications),
+            routes=self.routes,
+        ):
+            self.engineStreams = fingerprint
+            return
+        logging.info('assigned streams changed, restarting', print=True)
+        self.triggerRestart()
+
+    def verifyCaches(self, entire: bool = False) -> bool:
+        '''
+        rehashes my published hashes, only the rows appended since the last
+        verified checkpoint unless entire.
+        '''
+
+        def validateCaches(caches: list[disk.Cache]):
+            self.cacheVerifier.verifyAll(caches, entire=entire)
+
+        if self.cacheVerifier is None:
+            self.cacheVerifier = CacheVerifier()
+        self.asyncThread.runAsync(
+            [self.cacheOf(stream.id) for stream in set(self.publications)],
+            task=validateCaches)
         return True
 
     @staticmethod
@@ -441,14 +735,30 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         ''' filter down to prediciton publications '''
         return [s for s in streams if s.predicting is None]
 
-    def buildEngine(self):
+    def buildEngine(
+        self,
+        subscriptions: list[Stream] = None,
+        publications: list[Stream] = None,
+    ):
         ''' start the engine, it will run w/ what it has til ipfs is synced '''
         # if self.miningMode:
         # logging.warning('Running in Minng Mode.', color='green')
-        self.engine: satoriengine.Engine = satorineuron.engine.getEngine(
-            subscriptions=self.subscriptions,
-            publications=StartupDag.predictionStreams(self.publications))
+        subscriptions = self.subscriptions if subscriptions is None else subscriptions
+        publications = self.publications if publications is None else publications
+        self.engine: 'satoriengine.Engine' = satorineuron.engine.getEngine(
+            subscriptions=subscriptions,
+            publications=StartupDag.predictionStreams(publications),
+            routes=self.routes)
+        self.engineStreams = StartupDag.engineFingerprint(
+            subscriptions, publications)
         self.engine.run()
+        self.ready.set('engine')
+        if self.governor.permits('predict'):
+            self.ingest.release()
+        self.scheduler.add(
+            'model snapshots',
+            task=self.snapshotModels,
+            interval=config.value(key='model snapshot interval', default=600))
         # else:
         #    logging.warning('Running in Local Mode.', color='green')
 
@@ -483,21 +793,33 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         oracle nodes publish to every pubsub machine. therefore, they have
         an additional set of connections that they mush push to.
         '''
-        self.pubs = []
+        # a retry, or a reconnect, replaces the connections of the last try
+        previous, self.pubs = self.pubs, []
+        for pub in previous:
+            try:
+                pub.disconnect()
+            except Exception as e:
+                logging.debug(f'closing a pubsub connection: {e}')
         # oracles = oracleStreams(self.publications)
         if not self.oracleKey:
+            self.publisher.remove('pubsub ')
             return
         for pubsubMachine in self.urlPubsubs:
             signature = self.wallet.sign(self.oracleKey)
-            self.pubs.append(
-                satorineuron.engine.establishConnection(
-                    subscription=False,
-                    url=pubsubMachine,
-                    pubkey=self.wallet.publicKey + ':publishing',
-                    emergencyRestart=self.emergencyRestart,
-                    key=signature.decode() + '|' + self.oracleKey))
-
-    def startRelay(self):
+            pub = satorineuron.engine.establishConnection(
+                subscription=False,
+                url=pubsubMachine,
+                pubkey=self.wallet.publicKey + ':publishing',
+                emergencyRestart=self.emergencyRestart,
+                key=signature.decode() + '|' + self.oracleKey)
+            self.pubs.append(pub)
+            # each server gets its own send queue, see publish.py
+            self.publisher.set(f'pubsub {pubsubMachine}', send=pub.publish)
+        self.publisher.remove(
+            'pubsub ',
+            keep=[f'pubsub {url}' for url in self.urlPubsubs])
+
+    def startRelay(self, publications: list[Stream] = None):
         def append(streams: list[Stream]):
             relays = satorineuron.config.get('relay')
             rawStreams = []
@@ -512,10 +834,21 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
                     rawStreams.append(x)
             return rawStreams
 
+        publications = self.publications if publications is None else publications
         if self.relay is not None:
             self.relay.kill()
-        self.relay = RawStreamRelayEngine(streams=append(self.publications))
+        # relay.yaml may have changed, the validators were for the old calls
+        fetcher.forget()
+        relays = satorineuron.config.get('relay')
+        self.relayStreams = StartupDag.relayFingerprint(publications)
+        self.relay = RawStreamRelayEngine(
+            streams=append(publications),
+            suppressUnchanged={
+                x.streamId.topic()
+                for x in publications
+                if relays.get(x.streamId.topic(asJson=True), {}).get('suppress unchanged', False)})
         self.relay.run()
+        self.ready.set('relay')
         logging.info('started relay engine', color='green')
 
     def startSynergyEngine(self):
@@ -571,33 +904,72 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         # else:
         #    raise Exception('synergy not created or not connected.')
 
-    def pause(self, timeout: int = 60):
-        ''' pause the engine. '''
+    def pause(self, timeout: int = 60, mode: str = EngineMode.paused):
+        '''
+        pause the engine, or with mode predict only, stop it from training.
+        it resumes after timeout seconds.
+        '''
         self.paused = True
-        # self.engine.pause()
+        self.governor.setMode(mode)
+        if mode == EngineMode.paused:
+            # new data waits in the ingest queue, at most until the pause ends
+            self.ingest.hold(timeout=timeout)
+            if hasattr(self.engine, 'pause'):
+                self.engine.pause()
+        else:
+            if self.engine is not None:
+                self.ingest.release()
+            if hasattr(self.engine, 'unpause'):
+                self.engine.unpause()
+        if self.pauseThread is not None:
+            self.asyncThread.cancelTask(self.pauseThread)
         self.pauseThread = self.asyncThread.delayedRun(
             task=self.unpause,
             delay=timeout)
         logging.info('AI engine paused', color='green')
 
     def unpause(self):
-        ''' pause the engine. '''
-        # self.engine.unpause()
+        ''' resumes the engine, models catch up on what came in meanwhile '''
+        if hasattr(self.engine, 'unpause'):
+            self.engine.unpause()
+        self.governor.setMode(EngineMode.running)
         self.paused = False
+        if self.engine is not None:
+            self.ingest.release()
         if self.pauseThread is not None:
             self.asyncThread.cancelTask(self.pauseThread)
         self.pauseThread = None
+        if self.engine is not None:
+            for model in getattr(self.engine, 'models', []):
+                self.coalescer.request(
+                    key=keyOf(model.output),
+                    task=lambda model=model: model.inputsUpdated.on_next(True))
         logging.info('AI engine unpaused', color='green')
 
+    def throttle(self, maxCpuPercent: Union[float, None] = None):
+        ''' caps the cpu of the engine, in percent of one core, None for no cap '''
+        self.governor.setMaxCpuPercent(maxCpuPercent)
+
+    def deliverObservation(self, observation: 'Observation') -> bool:
+        '''
+        hands new data to the engine. the ingest pipeline holds delivery until
+        the engine is built and while it is paused.
+        '''
+        if self.engine is None:
+            return False
+        self.engine.data.newData.on_next(observation)
+        return True
+
     def repullFor(self, streamId: StreamId):
-        if self.engine is not None:
-            for model in self.engine.models:
-                if model.variable == streamId:
-                    model.inputsUpdated.on_next(True)
-                else:
-                    for target in model.targets:
-                        if target == streamId:
-                            model.inputsUpdated.on_next(True)
+        '''
+        tells the models that use this stream it has new data. updates to the
+        same model within the coalescing window produce one recompute.
+        '''
+        if self.engine is not None and self.governor.permits('predict'):
+            for model in self.routes.modelsFor(streamId):
+                self.coalescer.request(
+                    key=keyOf(model.output),
+                    task=lambda model=model: model.inputsUpdated.on_next(True))
 
     def delayedStart(self):
         alreadySetup: bool = os.path.exists(config.walletPath('wallet.yaml'))
@@ -613,6 +985,11 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
 
     def triggerRestart(self):
         from satorisynapse import Envelope, Signal
+        try:
+            self.snapshotModels()
+        except Exception as e:
+            logging.warning(f'unable to snapshot models before restart: {e}')
+        self.harness.shutdown()
         self.udpQueue.put(Envelope(ip='', vesicle=Signal(restart=True)))
         import time
         time.sleep(5)
@@ -626,29 +1003,32 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
         time.sleep(60*10)
         self.triggerRestart()
 
-    def restartEverythingPeriodic(self):
-        import random
-        restartTime = time.time() + config.get().get(
-            'restartTime',
-            random.randint(60*60*21, 60*60*24))
-        latestTag = LatestTag()
-        while True:
-            if time.time() > restartTime:
-                self.triggerRestart()
-            # time.sleep(random.randint(60*60, 60*60*4))
-            time.sleep(random.randint(10, 20))
-            latestTag.get()
-            if latestTag.isNew:
-                self.triggerRestart()
-
-    def publish(self, topic: str, data: str, observationTime: str, observationHash: str):
-        ''' publishes to all the pubsub servers '''
-        for pub in self.pubs:
-            pub.publish(
-                topic=topic,
-                data=data,
-                observationTime=observationTime,
-                observationHash=observationHash)
+    def restartCheck(self):
+        ''' restarts daily, or as soon as a new version is tagged '''
+        if time.time() > self.restartTime:
+            self.triggerRestart()
+        self.latestTag.get()
+        if self.latestTag.isNew:
+            self.triggerRestart()
+
+    def publish(
+        self,
+        topic: str,
+        data: str,
+        observationTime: str = None,
+        observationHash: str = None,
+        toServer: bool = False,
+    ):
+        '''
+        publishes to all the pubsub servers, and the satori server if
+        toServer, concurrently. returns without waiting for them.
+        '''
+        self.publisher.publish(
+            prefixes=['pubsub '] + (['server'] if toServer else []),
+            topic=topic,
+            data=data,
+            observationTime=observationTime,
+            observationHash=observationHash)
 
     def performStakeCheck(self):
         self.stakeStatus = self.server.stakeCheck()
@@ -656,9 +1036,10 @@ class StartupDag(StartupDagStruct, metaclass=SingletonMeta):
 
     def setMiningMode(self, miningMode: Union[bool, None] = None):
         miningMode = miningMode if isinstance(
-            miningMode, bool) else config.get().get('mining mode', True)
+            miningMode, bool) else config.miningMode()
         self.miningMode = miningMode
-        config.add(data={'mining mode': self.miningMode})
+        if config.value(key='mining mode') != self.miningMode:
+            config.add(data={'mining mode': self.miningMode})
         return self.miningMode
 
     def enableMineToVault(self, network: str = 'main'):
@@ -0,0 +1,146 @@
+'''
+how much work the engine is allowed to do. the node runs in one of three
+modes:
+
+    running:      predicting, training and exploring hyperparameters
+    predict only: new data still produces predictions, nothing is trained
+    paused:       nothing runs, incoming data waits in the ingest queue
+
+and optionally under a cpu cap, in percent of one core. components ask the
+governor before doing work (permits, wait). the training workers are separate
+processes, so they are also suspended while paused, and suspended for part of
+each period while the node is over its cap.
+'''
+from typing import Union
+import time
+import threading
+import psutil
+from satorilib import logging
+
+
+class EngineMode(object):
+    running = 'running'
+    predictOnly = 'predict only'
+    paused = 'paused'
+
+    # the kinds of work each mode allows
+    allowed = {
+        running: {'predict', 'train', 'explore'},
+        predictOnly: {'predict'},
+        paused: set()}
+
+
+class Governor(object):
+
+    def __init__(
+        self,
+        workers: callable = None,
+        maxCpuPercent: Union[float, None] = None,
+        period: float = 1.0,
+    ):
+        # pids of worker processes we may suspend
+        self.workers = workers or (lambda: [])
+        self.mode = EngineMode.running
+        self.maxCpuPercent = maxCpuPercent
+        self.period = period
+        self.cpuPercent = 0.0
+        self.throttledSeconds = 0.0
+        self.suspended: set[int] = set()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(
+            target=self.runForever, name='governor', daemon=True)
+        self.thread.start()
+
+    def permits(self, work: str) -> bool:
+        ''' work is one of predict, train or explore '''
+        return work in EngineMode.allowed[self.mode]
+
+    def wait(self, work: str, timeout: Union[float, None] = None) -> bool:
+        ''' blocks until work is permitted, False on timeout '''
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.permits(work), timeout=timeout)
+
+    def setMode(self, mode: str):
+        if mode not in EngineMode.allowed:
+            raise ValueError(f'unknown engine mode: {mode}')
+        with self.condition:
+            self.mode = mode
+            self.condition.notify_all()
+        if mode == EngineMode.paused:
+            self.suspend()
+        else:
+            self.resume()
+        logging.info(f'engine {mode}', color='green')
+
+    def setMaxCpuPercent(self, maxCpuPercent: Union[float, None]):
+        ''' None, or 0, removes the cap '''
+        self.maxCpuPercent = maxCpuPercent or None
+        if self.maxCpuPercent is None and self.mode != EngineMode.paused:
+            self.resume()
+
+    def suspend(self):
+        for pid in self.workers():
+            try:
+                psutil.Process(pid).suspend()
+                self.suspended.add(pid)
+            except psutil.Error:
+                pass
+
+    def resume(self):
+        for pid in list(self.suspended):
+            try:
+                psutil.Process(pid).resume()
+            except psutil.Error:
+                pass
+            self.suspended.discard(pid)
+
+    def measure(self, processes: dict[int, psutil.Process]) -> float:
+        '''
+        cpu percent of the node and its workers since the last call. the
+        process objects are kept between calls, psutil measures from the
+        previous call on the same object.
+        '''
+        pids = set([psutil.Process().pid] + list(self.workers()))
+        for pid in list(processes.keys()):
+            if pid not in pids:
+                del processes[pid]
+        total = 0.0
+        for pid in pids:
+            try:
+                if pid not in processes:
+                    processes[pid] = psutil.Process(pid)
+                total += processes[pid].cpu_percent(interval=None)
+            except psutil.Error:
+                processes.pop(pid, None)
+        return total
+
+    def runForever(self):
+        ''' duty cycles the workers while the node is over its cap '''
+        processes: dict[int, psutil.Process] = {}
+        while True:
+            time.sleep(self.period)
+            self.cpuPercent = self.measure(processes)
+            if (
+                self.maxCpuPercent is None or
+                self.mode == EngineMode.paused or
+                self.cpuPercent <= self.maxCpuPercent
+            ):
+                continue
+            # off for the share of the period we went over by
+            off = self.period * min(
+                1 - self.maxCpuPercent / self.cpuPercent, 0.9)
+            self.suspend()
+            time.sleep(off)
+            if self.mode != EngineMode.paused:
+                self.resume()
+            self.throttledSeconds += off
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'mode': self.mode,
+            'maxCpuPercent': self.maxCpuPercent,
+            'cpuPercent': self.cpuPercent,
+            'throttledSeconds': self.throttledSeconds,
+            'suspendedWorkers': len(self.suspended)}
@@ -0,0 +1,120 @@
+'''
+records how long each boot phase takes and when it happened relative to the
+start of the process, so cold start regressions between versions can be seen.
+the timeline of the current boot is persisted next to the last few boots and
+served as json at /debug/startup.
+
+this module must stay free of heavy imports, it is loaded first.
+'''
+from typing import Union
+from contextlib import contextmanager
+import os
+import json
+import time
+import tempfile
+import threading
+
+
+class Timeline(object):
+    ''' a thread safe record of the phases of one boot '''
+
+    def __init__(self, began: float = None, keep: int = 10):
+        self.began: float = began or time.time()
+        self.keep = keep
+        self.version: Union[str, None] = None
+        self.phases: list[dict] = []
+        self.lock = threading.Lock()
+        # persist is called from several threads
+        self.persistLock = threading.Lock()
+
+    def record(
+        self,
+        name: str,
+        began: float,
+        ended: Union[float, None] = None,
+        status: str = 'succeeded',
+    ) -> dict:
+        ''' records a phase that ran from began to ended (epoch seconds) '''
+        phase = {
+            'name': name,
+            'status': status,
+            'offset': round(began - self.began, 4),
+            'duration': (
+                round(ended - began, 4) if ended is not None else None),
+            'thread': threading.current_thread().name,
+        }
+        with self.lock:
+            self.phases.append(phase)
+        return phase
+
+    @contextmanager
+    def phase(self, name: str):
+        ''' times the body of a with statement as a phase '''
+        began = time.time()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, began, time.time(), status='failed')
+            raise e
+        self.record(name, began, time.time())
+
+    def mark(self, name: str) -> dict:
+        ''' records an instant, such as "first prediction" '''
+        now = time.time()
+        return self.record(name, now, now)
+
+    @property
+    def toDict(self) -> dict:
+        with self.lock:
+            phases = list(self.phases)
+        return {
+            'version': self.version,
+            'began': self.began,
+            'elapsed': round(time.time() - self.began, 4),
+            'phases': phases}
+
+    @staticmethod
+    def history(path: str) -> list[dict]:
+        ''' the persisted timelines of previous boots, oldest first '''
+        try:
+            with open(path, mode='r') as f:
+                boots = json.load(f)
+            return boots if isinstance(boots, list) else []
+        except Exception as _:
+            return []
+
+    def persist(self, path: str) -> list[dict]:
+        ''' saves this boot, replacing its earlier save, keeping the last few '''
+        with self.persistLock:
+            boots = [
+                boot for boot in Timeline.history(path)
+                if boot.get('began') != self.began]
+            boots = (boots + [self.toDict])[-self.keep:]
+            folder = os.path.dirname(path) or '.'
+            os.makedirs(folder, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                mode='w',
+                dir=folder,
+                prefix=f'.{os.path.basename(path)}.',
+                suffix='.tmp',
+                delete=False,
+            ) as f:
+                json.dump(boots, f)
+            try:
+                os.replace(f.name, path)
+            except OSError as e:
+                os.remove(f.name)
+                raise e
+        return boots
+
+
+def processStartTime() -> float:
+    ''' when the os started this process, falls back to now '''
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).create_time()
+    except Exception as _:
+        return time.time()
+
+
+timeline = Timeline(began=processStartTime())
@@ -0,0 +1,354 @@
+'''
+model training off the neuron process. fits run in a process pool sized by the
+'cpu budget' config so they don't compete with flask, pubsub and the relay for
+the GIL, and the work waiting for a worker is ordered by prediction deadline:
+the stream that has to predict soonest trains first.
+
+datasets are handed to workers through shared memory. the owner copies a
+DataFrame's values into a SharedMemory block once and sends only its name,
+shape and labels; a worker attaches to the block and reads it without a copy.
+frames with non numeric columns can't be viewed that way and are pickled.
+
+the engine's own fits are routed here by the model harness (see harness.py).
+'''
+from typing import Union
+import os
+import time
+import heapq
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from satorilib import logging
+
+
+def limitThreads(cores: int):
+    '''
+    caps the threads numeric libraries (xgboost, numpy) use in this process.
+    the environment covers libraries loaded from here on, threadpoolctl the
+    ones already loaded, so call it again once xgboost is imported.
+    '''
+    for name in [
+        'OMP_NUM_THREADS',
+        'OPENBLAS_NUM_THREADS',
+        'MKL_NUM_THREADS',
+    ]:
+        os.environ.setdefault(name, str(cores))
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=cores)
+
+
+class InlineFrame(object):
+    ''' a DataFrame sent to the worker whole, like SharedFrame otherwise '''
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    def attach(self) -> pd.DataFrame:
+        return self.df
+
+    def detach(self):
+        pass
+
+    def release(self):
+        self.df = None
+
+
+class SharedFrame(object):
+    ''' a numeric DataFrame held in shared memory, picklable by reference '''
+
+    def __init__(
+        self,
+        name: str,
+        shape: tuple,
+        dtype: str,
+        index: pd.Index,
+        columns: pd.Index,
+    ):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.index = index
+        self.columns = columns
+        self.block: Union[shared_memory.SharedMemory, None] = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['block'] = None
+        return state
+
+    @staticmethod
+    def share(df: pd.DataFrame) -> Union['SharedFrame', InlineFrame]:
+        '''
+        copies df's values into a new block, the caller owns it. frames with
+        non numeric columns are sent whole instead.
+        '''
+        if not all(
+            isinstance(dtype, np.dtype) and dtype.kind in 'biuf'
+            for dtype in df.dtypes
+        ):
+            return InlineFrame(df)
+        values = np.ascontiguousarray(
+            df.to_numpy(),
+            dtype=np.result_type(*df.dtypes) if len(df.columns) else np.float64)
+        block = shared_memory.SharedMemory(
+            create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+        frame = SharedFrame(
+            name=block.name,
+            shape=values.shape,
+            dtype=str(values.dtype),
+            index=df.index,
+            columns=df.columns)
+        frame.block = block
+        return frame
+
+    def attach(self) -> pd.DataFrame:
+        ''' a read only view of the shared values, call detach when done '''
+        if self.block is None:
+            self.block = shared_memory.SharedMemory(name=self.name)
+        values = np.ndarray(self.shape, dtype=self.dtype, buffer=self.block.buf)
+        values.flags.writeable = False
+        return pd.DataFrame(values, index=self.index, columns=self.columns, copy=False)
+
+    def detach(self):
+        if self.block is not None:
+            try:
+                self.block.close()
+            except BufferError:
+                # a view outlived the fit, the block closes when it's collected
+                pass
+            self.block = None
+
+    def release(self):
+        ''' frees the block, by the owner once no worker needs it '''
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+
+def _fit(function: callable, frame: Union[SharedFrame, InlineFrame], kwargs: dict):
+    ''' runs in a worker: attaches to the dataset and fits '''
+    try:
+        return function(frame.attach(), **kwargs)
+    finally:
+        frame.detach()
+
+
+class TrainingJob(object):
+
+    def __init__(
+        self,
+        key: str,
+        deadline: float,
+        function: callable,
+        frame: Union[SharedFrame, InlineFrame],
+        kwargs: dict,
+    ):
+        self.key = key
+        self.deadline = deadline
+        self.function = function
+        self.frame = frame
+        self.kwargs = kwargs
+        self.submitted = time.time()
+        self.future: Future = Future()
+        self.cancelled = False
+
+    def __lt__(self, other: 'TrainingJob'):
+        return self.deadline < other.deadline
+
+
+class TrainingScheduler(object):
+    '''
+    runs fits in a pool of cpu budget processes, earliest deadline first.
+    a newer fit for the same key replaces one that hasn't started yet.
+    '''
+
+    def __init__(self, processes: int = 1, permits: callable = None):
+        self.processes = max(processes, 1)
+        # False holds fits that haven't started, such as while paused
+        self.permits = permits or (lambda: True)
+        self.pool: Union[ProcessPoolExecutor, None] = None
+        self.queue: list[TrainingJob] = []
+        self.waiting: dict[str, TrainingJob] = {}
+        self.running = 0
+        self.counts = {
+            'submitted': 0,
+            'superseded': 0,
+            'completed': 0,
+            'failed': 0,
+            'late': 0}
+        self.waited = 0.0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(
+            target=self.runForever, name='training', daemon=True)
+        self.thread.start()
+
+    def submit(
+        self,
+        key: str,
+        function: callable,
+        df: pd.DataFrame,
+        deadline: Union[float, None] = None,
+        **kwargs,
+    ) -> Future:
+        '''
+        queues function(dataset, **kwargs) to run in a worker. function must
+        be importable by the worker (defined at module level) and its result
+        picklable. deadline is when the stream has to predict next. raises
+        RuntimeError once shut down.
+        '''
+        if self.closed:
+            raise RuntimeError('the training pool is shut down')
+        job = TrainingJob(
+            key=key,
+            deadline=deadline if deadline is not None else time.time(),
+            function=function,
+            frame=SharedFrame.share(df),
+            kwargs=kwargs)
+        with self.lock:
+            self.counts['submitted'] += 1
+            previous = self.waiting.pop(key, None)
+            if previous is not None:
+                previous.cancelled = True
+                previous.future.cancel()
+                previous.frame.release()
+                self.counts['superseded'] += 1
+            self.waiting[key] = job
+            heapq.heappush(self.queue, job)
+        self.wake.set()
+        return job.future
+
+    def next(self) -> Union[TrainingJob, None]:
+        ''' the earliest deadline waiting job, if a worker is free '''
+        if self.closed or not self.permits():
+            return None
+        with self.lock:
+            while self.queue and self.running < self.processes:
+                job = heapq.heappop(self.queue)
+                if job.cancelled:
+                    continue
+                self.waiting.pop(job.key, None)
+                if not job.future.set_running_or_notify_cancel():
+                    # cancelled by whoever submitted it
+                    job.frame.release()
+                    continue
+                self.running += 1
+                self.waited += time.time() - job.submitted
+                return job
+            return None
+
+    def finished(
+        self,
+        job: TrainingJob,
+        result: object = None,
+        error: Union[BaseException, None] = None,
+    ):
+        job.frame.release()
+        with self.lock:
+            self.running -= 1
+            if error is not None:
+                self.counts['failed'] += 1
+            else:
+                self.counts['completed'] += 1
+                if time.time() > job.deadline:
+                    self.counts['late'] += 1
+        if error is not None:
+            logging.error(f'training {job.key} failed: {error}')
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+        self.wake.set()
+
+    @property
+    def workers(self) -> list[int]:
+        ''' pids of the pool's processes '''
+        if self.pool is None:
+            return []
+        return list(getattr(self.pool, '_processes', None) or {})
+
+    def reset(self, pool: ProcessPoolExecutor):
+        ''' drops a broken pool, the next job starts a new one '''
+        with self.lock:
+            if self.pool is not pool:
+                return
+            self.pool = None
+        logging.warning('the training pool broke, starting a new one')
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        ''' cancels the jobs that haven't started and stops the workers '''
+        with self.lock:
+            self.closed = True
+            pool, self.pool = self.pool, None
+            waiting = [job for job in self.queue if not job.cancelled]
+            self.queue.clear()
+            self.waiting.clear()
+        for job in waiting:
+            job.cancelled = True
+            job.future.cancel()
+            job.frame.release()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.wake.set()
+
+    def runForever(self):
+        while not self.closed:
+            job = self.next()
+            if job is None:
+                # rechecks permits now and then, nothing wakes us for them
+                self.wake.wait(timeout=1)
+                self.wake.clear()
+                continue
+            pool = self.pool
+            try:
+                if pool is None:
+                    pool = self.pool = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        # the pool is the budget, each worker gets one core
+                        initializer=limitThreads,
+                        initargs=(1,))
+                future = pool.submit(
+                    _fit, job.function, job.frame, job.kwargs)
+            except Exception as e:
+                # a broken pool is replaced on the next submission
+                self.reset(pool)
+                self.finished(job, error=e)
+                continue
+            future.add_done_callback(
+                lambda future, job=job, pool=pool: self.done(job, pool, future))
+
+    def done(self, job: TrainingJob, pool: ProcessPoolExecutor, future: Future):
+        if future.cancelled():
+            error = RuntimeError('the training pool is shut down')
+        else:
+            error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # a worker died mid fit, the pool can't take more jobs
+            self.reset(pool)
+        self.finished(
+            job,
+            result=None if error is not None else future.result(),
+            error=error)
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            started = (
+                self.counts['completed'] + self.counts['failed'] + self.running)
+            return {
+                **self.counts,
+                'processes': self.processes,
+                'running': self.running,
+                'waiting': len(self.waiting),
+                'meanWait': self.waited / started if started else None}
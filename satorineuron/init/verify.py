@@ -0,0 +1,327 @@
+'''
+incremental validation of the hash chain of our published streams. each row's
+hash is hashRow(priorRowHash, timestamp, value), so once a prefix of the chain
+has been verified we remember where it ended (a checkpoint: the number of rows,
+the time and hash of the last one) and the next validation only rehashes the
+rows appended since. when the chain breaks it is rehashed from the first row
+that diverges, not from the beginning.
+
+a row only depends on the stored hash of the row before it, so a stored chain
+can be checked in independent segments: many streams, and long streams cut into
+segments, are validated across a process pool on plain lists of strings.
+'''
+from typing import Union
+from contextlib import contextmanager
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from satorilib.api import disk
+from satorilib.api.hash import hashRow
+from satorilib import logging
+from satorineuron import config
+
+
+def firstDivergence(
+    df: pd.DataFrame,
+    priorHash: str = '',
+    start: int = 0,
+) -> Union[int, None]:
+    '''
+    position of the first row, at or after start, whose hash doesn't follow
+    from the row before it. None if the chain holds to the end.
+    '''
+    prior = priorHash
+    for position, ts, value, rowHash in zip(
+        range(start, len(df)),
+        df.index[start:],
+        df['value'].values[start:],
+        df['hash'].values[start:],
+    ):
+        if hashRow(priorRowHash=prior, ts=str(ts), value=str(value)) != rowHash:
+            return position
+        prior = rowHash
+    return None
+
+
+def checkSegment(
+    timestamps: list[str],
+    values: list[str],
+    hashes: list[str],
+    priorHash: str,
+    offset: int,
+) -> Union[int, None]:
+    '''
+    checks a segment of a stored chain against the stored hash of the row
+    before it. returns the absolute position of the first bad row, if any.
+    runs in worker processes, so it only takes plain lists.
+    '''
+    prior = priorHash
+    for position, (ts, value, rowHash) in enumerate(
+        zip(timestamps, values, hashes)
+    ):
+        if hashRow(priorRowHash=prior, ts=ts, value=value) != rowHash:
+            return offset + position
+        prior = rowHash
+    return None
+
+
+def _checkSegment(args: tuple) -> Union[int, None]:
+    return checkSegment(*args)
+
+
+class ParallelVerifier(object):
+    '''
+    validates the stored chains of many streams at once: each stream, from
+    its start row, is cut into segments that are checked in a process pool.
+    '''
+
+    def __init__(
+        self,
+        processes: int = None,
+        segmentRows: int = 100000,
+        minimumRows: int = 50000,
+    ):
+        # the engine's cpu budget, hashing shouldn't take more than training
+        self.processes = processes or config.cpuBudget()
+        self.segmentRows = segmentRows
+        # below this many rows in total a pool costs more than it saves
+        self.minimumRows = minimumRows
+        self.lastRows = 0
+        self.lastSeconds = 0.0
+
+    @property
+    def throughput(self) -> float:
+        ''' rows per second of the last run '''
+        return self.lastRows / self.lastSeconds if self.lastSeconds else 0.0
+
+    def segments(self, topic: str, df: pd.DataFrame, start: int) -> list[tuple]:
+        ''' (topic, checkSegment args) for the rows from start onward '''
+        # one row before start is kept for the prior hash of the first segment
+        first = max(start - 1, 0)
+        timestamps = [str(ts) for ts in df.index[first:]]
+        values = [str(v) for v in df['value'].values[first:]]
+        hashes = [str(h) for h in df['hash'].values[first:]]
+        return [
+            (topic, (
+                timestamps[a - first:a - first + self.segmentRows],
+                values[a - first:a - first + self.segmentRows],
+                hashes[a - first:a - first + self.segmentRows],
+                hashes[a - first - 1] if a > 0 else '',
+                a))
+            for a in range(start, len(df), self.segmentRows)]
+
+    def verify(
+        self,
+        frames: dict[str, tuple[pd.DataFrame, int]],
+    ) -> dict[str, Union[int, None]]:
+        '''
+        frames maps a topic to its history and the row to start checking at.
+        returns, by topic, the first divergent position or None.
+        '''
+        began = time.time()
+        work = [
+            segment
+            for topic, (df, start) in frames.items()
+            for segment in self.segments(topic, df, start)]
+        rows = sum(len(args[0]) for _, args in work)
+        if rows < self.minimumRows or self.processes == 1:
+            results = [_checkSegment(args) for _, args in work]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+            ) as pool:
+                results = list(pool.map(
+                    _checkSegment,
+                    [args for _, args in work],
+                    chunksize=max(len(work) // (self.processes * 4), 1)))
+        divergent: dict[str, Union[int, None]] = {
+            topic: None for topic in frames}
+        for (topic, _), position in zip(work, results):
+            if position is not None and (
+                divergent[topic] is None or position < divergent[topic]
+            ):
+                divergent[topic] = position
+        self.lastRows = rows
+        self.lastSeconds = time.time() - began
+        logging.info(
+            f'validated {rows} rows of {len(frames)} streams in '
+            f'{self.lastSeconds:.2f}s ({self.throughput:.0f} rows/sec)',
+            color='green')
+        return divergent
+
+
+def rehashFrom(df: pd.DataFrame, start: int) -> pd.DataFrame:
+    ''' a copy of df whose hashes from row start onward are recomputed '''
+    df = df.copy()
+    prior = df['hash'].iloc[start - 1] if start > 0 else ''
+    hashes = list(df['hash'].values)
+    for position in range(start, len(df)):
+        prior = hashRow(
+            priorRowHash=prior,
+            ts=str(df.index[position]),
+            value=str(df['value'].iloc[position]))
+        hashes[position] = prior
+    df['hash'] = hashes
+    return df
+
+
+class Checkpoints(object):
+    '''
+    the last verified row of each stream, persisted as yaml. inside batch the
+    file is written once, when the batch ends.
+    '''
+
+    def __init__(self, path: str = None):
+        self.path = path or config.dataPath('verified.yaml')
+        self.lock = threading.Lock()
+        self.checkpoints: dict[str, dict] = config.get(path=self.path)
+        self.batches = 0
+        self.dirty = False
+
+    def get(self, topic: str) -> Union[dict, None]:
+        with self.lock:
+            return self.checkpoints.get(topic)
+
+    def set(self, topic: str, df: pd.DataFrame):
+        ''' marks every row of df as verified '''
+        with self.lock:
+            if len(df) == 0:
+                self.checkpoints.pop(topic, None)
+            else:
+                self.checkpoints[topic] = {
+                    'rows': len(df),
+                    'time': str(df.index[-1]),
+                    'hash': str(df['hash'].iloc[-1])}
+            self.changed()
+
+    def clear(self, topic: str):
+        with self.lock:
+            if self.checkpoints.pop(topic, None) is not None:
+                self.changed()
+
+    def changed(self):
+        ''' writes the checkpoints, or leaves that to the open batch '''
+        self.dirty = True
+        if self.batches == 0:
+            self.save()
+
+    def save(self):
+        config.put(path=self.path, data=dict(self.checkpoints))
+        self.dirty = False
+
+    @contextmanager
+    def batch(self):
+        ''' one write for every checkpoint set or cleared inside '''
+        with self.lock:
+            self.batches += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.batches -= 1
+                if self.batches == 0 and self.dirty:
+                    self.save()
+
+    @staticmethod
+    def resumesAt(checkpoint: Union[dict, None], df: pd.DataFrame) -> int:
+        '''
+        how many leading rows of df the checkpoint vouches for. 0 if the
+        history changed underneath it, such as a merge of older data.
+        '''
+        if not checkpoint:
+            return 0
+        rows = checkpoint.get('rows', 0)
+        if (
+            0 < rows <= len(df) and
+            str(df.index[rows - 1]) == checkpoint.get('time') and
+            str(df['hash'].iloc[rows - 1]) == checkpoint.get('hash')
+        ):
+            return rows
+        return 0
+
+
+class CacheVerifier(object):
+    ''' validates, and if necessary repairs, the hash chain of caches '''
+
+    def __init__(
+        self,
+        checkpoints: Checkpoints = None,
+        parallel: ParallelVerifier = None,
+    ):
+        self.checkpoints = checkpoints or Checkpoints()
+        self.parallel = parallel or ParallelVerifier()
+
+    def verifyAll(self, caches: list[disk.Cache], entire: bool = False) -> bool:
+        '''
+        like verify for many caches, but the chains are checked together in
+        the process pool. returns True if every chain held.
+        '''
+        frames: dict[str, tuple[pd.DataFrame, int]] = {}
+        byTopic: dict[str, disk.Cache] = {}
+        for cache in caches:
+            if cache is None:
+                continue
+            df = cache.read()
+            if df is None or len(df) == 0 or 'hash' not in df.columns:
+                continue
+            topic = cache.id.topic()
+            byTopic[topic] = cache
+            frames[topic] = (df, 0 if entire else Checkpoints.resumesAt(
+                self.checkpoints.get(topic), df))
+        held = True
+        with self.checkpoints.batch():
+            for topic, divergent in self.parallel.verify(frames).items():
+                df, _ = frames[topic]
+                if divergent is None:
+                    self.checkpoints.set(topic, df)
+                    continue
+                held = False
+                logging.info(
+                    f'rehashing {topic} from row {divergent} of {len(df)}',
+                    color='yellow')
+                self.repair(byTopic[topic], df, divergent)
+        return held
+
+    def verify(self, cache: disk.Cache, entire: bool = False) -> bool:
+        '''
+        rehashes the rows appended since the last checkpoint, or every row if
+        entire. returns True if the chain held, False if it had to be repaired.
+        '''
+        topic = cache.id.topic()
+        df = cache.read()
+        if df is None or len(df) == 0 or 'hash' not in df.columns:
+            return True
+        start = 0 if entire else Checkpoints.resumesAt(
+            self.checkpoints.get(topic), df)
+        divergent = firstDivergence(
+            df,
+            priorHash=df['hash'].iloc[start - 1] if start > 0 else '',
+            start=start)
+        if divergent is None:
+            self.checkpoints.set(topic, df)
+            return True
+        logging.info(
+            f'rehashing {topic} from row {divergent} of {len(df)}',
+            color='yellow')
+        self.repair(cache, df, divergent)
+        return False
+
+    def repair(self, cache: disk.Cache, df: pd.DataFrame, start: int):
+        ''' rewrites the hashes from start, falls back to a full rehash '''
+        try:
+            cache.write(rehashFrom(df, start))
+            repaired = cache.read()
+            if firstDivergence(
+                repaired,
+                priorHash=repaired['hash'].iloc[start - 1] if start > 0 else '',
+                start=start,
+            ) is None:
+                self.checkpoints.set(cache.id.topic(), repaired)
+                return
+        except Exception as e:
+            logging.warning(f'partial rehash failed, rehashing all: {e}')
+        self.checkpoints.clear(cache.id.topic())
+        cache.saveHashes()
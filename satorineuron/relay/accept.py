@@ -1,5 +1,6 @@
 from satorilib.concepts import StreamId
 from satorilib import logging
+from satorineuron import config
 import pandas as pd
 
 
@@ -7,27 +8,36 @@ def processRelayCsv(start: 'StartupDag', df: pd.DataFrame):
     # from satorineuron.init.start import getStart
     # start = getStart()
     statuses = []
-    for ix, row in df.iterrows():
-        if len(start.relay.streams) + ix+1 >= 50:
-            return ['relay stream limit reached'], 400
-        # data = row.to_dict(na_action='ignore')
-        data = {col: None if pd.isna(val) else val for col, val in row.items()}
-        if data.get('stream') is None or data.get('stream') == '':
-            continue
-        data['name'] = data.get('stream', '')
-        data['source'] = data.get('source', 'satori')
-        data['url'] = data.get('url', '') or ''
-        if data.get('hook') is None or data.get('hook') == '':
-            msg, status = generateHookFromTarget(data.get('target', ''))
-            if status == 200:
-                data['hook'] = msg
-        # msg, status = _registerDataStreamMock(start, data=data)
-        msg, status = registerDataStream(start, data=data, restart=False)
-        statuses.append(status)
-        # start.workingUpdates.on_next(
-        #    f"{data['stream']}{data['target']} - {'success' if status == 200 else msg}")
-        start.workingUpdates.put(
-            f"{data['stream']}{data['target']} - {'success' if status == 200 else msg}")
+    # rows are registered one by one, their relay.yaml entries are written
+    # together afterwards, even if a later row raises
+    saved = []
+    try:
+        for ix, row in df.iterrows():
+            if len(start.relay.streams) + ix+1 >= 50:
+                return ['relay stream limit reached'], 400
+            # data = row.to_dict(na_action='ignore')
+            data = {col: None if pd.isna(val) else val for col, val in row.items()}
+            if data.get('stream') is None or data.get('stream') == '':
+                continue
+            data['name'] = data.get('stream', '')
+            data['source'] = data.get('source', 'satori')
+            data['url'] = data.get('url', '') or ''
+            if data.get('hook') is None or data.get('hook') == '':
+                msg, status = generateHookFromTarget(data.get('target', ''))
+                if status == 200:
+                    data['hook'] = msg
+            # msg, status = _registerDataStreamMock(start, data=data)
+            msg, status = registerDataStream(
+                start, data=data, restart=False, saved=saved)
+            statuses.append(status)
+            # start.workingUpdates.on_next(
+            #    f"{data['stream']}{data['target']} - {'success' if status == 200 else msg}")
+            start.workingUpdates.put(
+                f"{data['stream']}{data['target']} - {'success' if status == 200 else msg}")
+    finally:
+        with config.transaction():
+            for data in saved:
+                start.relayValidation.saveLocal(data)
     failures = [str(i) for i, s in enumerate(statuses) if s != 200]
     if len(failures) == 0:
         start.checkin()
@@ -50,6 +60,11 @@ def _registerDataStreamMock(start: 'StartupDag', data: dict):
 
 
 def acceptRelaySubmission(start: 'StartupDag', data: dict):
+    '''
+    registers the stream if need be and queues data for publishing. success
+    means queued: sending happens afterwards, per destination, with retries
+    (see /debug/publish for what was sent, dropped or failed).
+    '''
     data['url'] = data.get('url', '') or ''
     if not start.relayValidation.validRelay(data):
         return 'Invalid payload. here is an example: {"source": "satori", "name": "nameOfSomeAPI", "target": "optional", "data": 420}', 400
@@ -74,10 +89,19 @@ def acceptRelaySubmission(start: 'StartupDag', data: dict):
     # todo: why am I not passing these here?
     # observationTime=timestamp,
     # observationHash=observationHash
-    return 'Success: ', 200
+    return 'Success: queued for publishing', 200
 
 
-def registerDataStream(start: 'StartupDag', data: dict, restart: bool = True):
+def registerDataStream(
+    start: 'StartupDag',
+    data: dict,
+    restart: bool = True,
+    saved: list = None,
+):
+    '''
+    validates, registers and saves a relay stream. if saved is given the
+    stream is appended to it instead of saved, for the caller to save.
+    '''
     data['url'] = data.get('url', '') or ''
     if len(start.relay.streams) >= 50:
         return ['relay stream limit reached'], 400
@@ -140,7 +164,10 @@ def registerDataStream(start: 'StartupDag', data: dict, restart: bool = True):
     # subscribe to save ipfs automatically
     # subscribed = start.relayValidation.subscribeToStream(data=data)
 
-    start.relayValidation.saveLocal(data)
+    if saved is None:
+        start.relayValidation.saveLocal(data)
+    else:
+        saved.append(data)
     if hasHistory:
         try:
             # this can take a very long time - will flask/browser timeout?
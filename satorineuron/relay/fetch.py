@@ -0,0 +1,217 @@
+'''
+the http side of the relay. every call to a relay stream's api goes through one
+fetcher, which keeps a requests Session per host so calls to the same api reuse
+kept alive connections, bounds every call with connect and read timeouts,
+limits how many calls may be open against one host at a time, and retries
+failed GETs with jittered backoff; a POST may not be safe to repeat, so it is
+made once. relay calls run on a bounded pool of workers rather than a new
+thread each, so an api that hangs can tie up at most its host's share of the
+pool, never an unbounded number of threads.
+
+GETs can be made conditional: the ETag and Last-Modified of the last full
+response are kept per call (uri, headers and payload, as the relay groups
+streams, unless the caller keys it) and sent back as If-None-Match and If-Modified-Since, so an api that
+supports them answers 304 and nothing instead of the same body again. the
+caller remembers a response's validators once it has handled it, a response
+it failed to handle is asked for again rather than answered 304.
+'''
+from typing import Union
+import json
+import time
+import random
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, Future
+import requests
+from requests.adapters import HTTPAdapter
+from satorilib import logging
+
+
+def isValidJson(x: str) -> bool:
+    try:
+        json.loads(x)
+        return True
+    except Exception as _:
+        return False
+
+
+def normalizeHeaders(headers: Union[str, dict, None]) -> Union[str, dict, None]:
+    ''' headers written with single quotes are read as json '''
+    if (
+        isinstance(headers, str) and
+        not isValidJson(headers) and
+        "'" in headers and
+        '"' not in headers
+    ):
+        return headers.replace("'", '"')
+    return headers
+
+
+class Host(object):
+    ''' the connections and limits of one api host '''
+
+    def __init__(self, concurrency: int):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=concurrency,
+            max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.notModified = 0
+        self.busy = 0
+        self.seconds = 0.0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'errors': self.errors,
+            'notModified': self.notModified,
+            'busy': self.busy,
+            'meanSeconds': self.seconds / self.requests if self.requests else None}
+
+
+class Fetcher(object):
+
+    def __init__(
+        self,
+        connectTimeout: float = 5,
+        readTimeout: float = 20,
+        perHost: int = 4,
+        workers: int = 16,
+        retries: int = 2,
+        backoff: float = 0.5,
+    ):
+        self.timeout = (connectTimeout, readTimeout)
+        self.perHost = perHost
+        self.retries = retries
+        self.backoff = backoff
+        self.hosts: dict[str, Host] = {}
+        # call -> the validators of its last full response
+        self.validators: dict[str, dict[str, str]] = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='relay fetch')
+
+    def hostOf(self, uri: str) -> Host:
+        name = urlparse(uri).netloc
+        with self.lock:
+            if name not in self.hosts:
+                self.hosts[name] = Host(self.perHost)
+            return self.hosts[name]
+
+    @staticmethod
+    def keyOf(uri: str, headers: Union[str, dict, None], payload: Union[str, None]) -> str:
+        return uri + str(headers) + str(payload)
+
+    def conditionalHeaders(self, key: str) -> dict:
+        with self.lock:
+            validators = self.validators.get(key, {})
+        return {
+            **({'If-None-Match': validators['ETag']} if 'ETag' in validators else {}),
+            **({'If-Modified-Since': validators['Last-Modified']} if 'Last-Modified' in validators else {})}
+
+    def remember(self, key: str, r: requests.Response):
+        ''' the validators of r are sent with the next conditional call '''
+        validators = {
+            name: r.headers[name]
+            for name in ('ETag', 'Last-Modified')
+            if r.headers.get(name) not in ['', None]}
+        with self.lock:
+            if validators:
+                self.validators[key] = validators
+            else:
+                self.validators.pop(key, None)
+
+    def forget(self):
+        ''' drops every call's validators, their next calls are full '''
+        with self.lock:
+            self.validators.clear()
+
+    def submit(self, function: callable, *args, **kwargs) -> Future:
+        ''' runs function on the fetch workers '''
+        return self.pool.submit(function, *args, **kwargs)
+
+    def request(
+        self,
+        uri: str,
+        headers: Union[str, dict, None] = None,
+        payload: Union[str, None] = None,
+        conditional: bool = False,
+        key: str = None,
+    ) -> Union[requests.Response, None]:
+        '''
+        GETs uri, or POSTs payload (as json if it parses) to it. None if the
+        host is saturated for longer than a connect timeout, or the call
+        failed after its retries, a POST isn't retried. responses are returned whatever the status.
+        a conditional GET is answered 304 if nothing changed since the last
+        full response remembered under key, keyOf the call by default.
+        '''
+        kwargs = {}
+        if payload is not None:
+            kwargs = {'json': payload} if isValidJson(payload) else {'data': payload}
+        if headers not in ['', None]:
+            kwargs['headers'] = (
+                json.loads(headers)
+                if isinstance(headers, str) and isValidJson(headers)
+                else headers)
+        key = key or Fetcher.keyOf(uri, headers, payload)
+        conditional = (
+            conditional and payload is None and
+            isinstance(kwargs.get('headers', {}), dict))
+        if conditional:
+            kwargs['headers'] = {
+                **(kwargs.get('headers') or {}),
+                **self.conditionalHeaders(key)}
+        method = 'GET' if payload is None else 'POST'
+        retries = self.retries if method == 'GET' else 0
+        host = self.hostOf(uri)
+        if not host.slots.acquire(timeout=self.timeout[0]):
+            host.busy += 1
+            logging.warning('relay api is saturated, skipping call:', uri)
+            return None
+        try:
+            for attempt in range(retries + 1):
+                began = time.time()
+                try:
+                    host.requests += 1
+                    r = host.session.request(
+                        method,
+                        uri,
+                        timeout=self.timeout,
+                        **kwargs)
+                    if r.status_code == 304:
+                        host.notModified += 1
+                    if r.status_code < 500 or attempt == retries:
+                        return r
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt == retries:
+                        host.errors += 1
+                        logging.warning('relay call failed:', uri, e)
+                        return None
+                except requests.RequestException as e:
+                    # such as an invalid url, retrying won't help
+                    host.errors += 1
+                    logging.warning('relay call failed:', uri, e)
+                    return None
+                finally:
+                    host.seconds += time.time() - began
+                host.retries += 1
+                time.sleep(
+                    self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+        finally:
+            host.slots.release()
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {name: host.stats for name, host in self.hosts.items()}
+
+
+fetcher = Fetcher()
@@ -0,0 +1,90 @@
+'''
+user supplied relay code (a stream's postRequestHook, its GetHistory class) is
+compiled once and run in a namespace of its own. the namespace starts as a
+copy of the calling module's globals, so hooks see the same names they always
+have (json, requests, ...), but what a hook defines stays in its namespace
+instead of replacing a module global that other streams' hooks are racing to
+define and call.
+
+compiled namespaces are cached by a hash of the source, so an edited hook is
+compiled again on its next call and the old one ages out of the cache.
+'''
+from typing import Union
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class CompiledHooks(object):
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        # (id of base namespace, source hash) -> namespace, or the error
+        self.namespaces: OrderedDict[tuple, Union[dict, Exception]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.compileSeconds = 0.0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def hashOf(source: str) -> str:
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def namespaceOf(self, source: str, base: dict) -> dict:
+        '''
+        the namespace source defines, executed once on a copy of base.
+        raises what compiling or executing it raised, every time it's asked.
+        '''
+        key = (id(base), CompiledHooks.hashOf(source))
+        with self.lock:
+            namespace = self.namespaces.get(key)
+            if namespace is not None:
+                self.namespaces.move_to_end(key)
+                self.hits += 1
+        if namespace is None:
+            # outside the lock, a slow hook doesn't hold up the others
+            began = time.time()
+            namespace = dict(base)
+            try:
+                exec(compile(source, '<relay hook>', 'exec'), namespace)
+            except Exception as e:
+                namespace = e
+            seconds = time.time() - began
+            with self.lock:
+                self.misses += 1
+                self.compileSeconds += seconds
+                # whoever compiled it first wins, everyone shares theirs
+                namespace = self.namespaces.setdefault(key, namespace)
+                self.namespaces.move_to_end(key)
+                if len(self.namespaces) > self.size:
+                    self.namespaces.popitem(last=False)
+        if isinstance(namespace, Exception):
+            raise namespace.with_traceback(None)
+        return namespace
+
+    def function(self, source: str, name: str, base: dict) -> Union[callable, None]:
+        ''' what source defines as name, None if it doesn't define it '''
+        return self.namespaceOf(source, base).get(name)
+
+    def forget(self, source: str = None):
+        ''' drops the compiled source, or everything '''
+        with self.lock:
+            if source is None:
+                self.namespaces.clear()
+                return
+            hashed = CompiledHooks.hashOf(source)
+            for key in [k for k in self.namespaces if k[1] == hashed]:
+                del self.namespaces[key]
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'compiled': len(self.namespaces),
+                'hits': self.hits,
+                'misses': self.misses,
+                'compileSeconds': self.compileSeconds}
+
+
+hooks = CompiledHooks()
@@ -9,13 +9,16 @@ need it's history. maybe we should subscribe to our own relay streams by defult.
 from typing import Union
 import threading
 import time
-import json
 import requests
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor, Future
 from satorilib.concepts.structs import Stream, StreamId
 from satorilib.api.disk import Cached
 from satorilib.api.disk.cache import CachedResult
 from satorilib import logging
+from satorineuron.relay.schedule import RelaySchedule
+from satorineuron.relay.fetch import Fetcher, fetcher, normalizeHeaders
+from satorineuron.relay.hooks import hooks
+from satorineuron.relay.sandbox import sandbox
 
 
 def postRequestHookForNone(r: requests.Response):
@@ -32,12 +35,28 @@ class RawStreamRelayEngine(Cached):
     def __init__(
         self,
         streams: list[Stream] = None,
+        suppressUnchanged: set[str] = None,
     ):
         self.streams: list[Stream] = streams or []
+        # topics that don't relay a value equal to the last one they relayed
+        self.suppressUnchanged: set[str] = suppressUnchanged or set()
         self.thread = None
         self.killed = False
         self.latest = {}
+        self.notModified = 0
+        self.suppressed = 0
         self.active = 0  # the thread that should be active
+        self.wake = threading.Event()
+        self.relaySchedule: Union[RelaySchedule, None] = None
+        # groups of streams being fetched or hooked, a group isn't called
+        # again until it's done, so neither pool queues more than one call
+        # per group
+        self.inFlight: set[str] = set()
+        self.inFlightLock = threading.Lock()
+        self.skipped = 0
+        # hooks run here, off the fetch pool, which only waits on apis
+        self.hookPool = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix='relay hooks')
 
     def status(self):
         if self.killed:
@@ -61,47 +80,53 @@ class RawStreamRelayEngine(Cached):
             return int(time.time()) > (mostRecentTSinSeconds + self._cadence(stream) + self._offset(stream))
         return True
 
-    @staticmethod
-    def call(stream: Stream) -> Union[requests.Response, None]:
-        ''' calls API and relays data to pubsub '''
+    @property
+    def stats(self) -> dict:
+        return {
+            'streams': len(self.streams),
+            'notModified': self.notModified,
+            'suppressed': self.suppressed,
+            'inFlight': len(self.inFlight),
+            'skipped': self.skipped}
 
-        def is_valid_json(x):
-            try:
-                json.loads(x)
-                return True
-            except Exception as _:
-                return False
+    @staticmethod
+    def validatorKeyOf(streams: list[Stream]) -> str:
+        '''
+        a group's call and the streams whose hooks handle its response: a
+        stream added to the group, or a hook edited, makes it a different
+        call, answered in full rather than 304.
+        '''
+        return Fetcher.keyOf(
+            streams[0].uri,
+            normalizeHeaders(streams[0].headers),
+            streams[0].payload) + str(sorted(
+                (stream.streamId.topic(), hooks.hashOf(stream.hook or ''))
+                for stream in streams))
 
+    @staticmethod
+    def call(
+        stream: Stream,
+        conditional: bool = False,
+        key: str = None,
+    ) -> Union[requests.Response, None]:
+        '''
+        calls API and relays data to pubsub. a conditional call may return a
+        304 response, meaning nothing changed since the last call.
+        '''
         if stream.uri is None or stream.uri.strip() == '':
             r = requests.Response()
             r.status_code = 200
             return r
-        if stream.payload is None:
-            method = partial(requests.get)
-        else:
-            if is_valid_json(stream.payload):
-                method = partial(requests.post, json=stream.payload)
-            else:
-                method = partial(requests.post, data=stream.payload)
-        if stream.headers not in ['', None]:
-            if is_valid_json(stream.headers):
-                r = method(
-                    stream.uri,
-                    headers=json.loads(stream.headers),)
-            elif (
-                not is_valid_json(stream.headers) and
-                "'" in stream.headers and
-                '"' not in stream.headers
-            ):
-                stream.headers = stream.headers.replace("'", '"')
-                r = method(
-                    stream.uri,
-                    headers=json.loads(stream.headers))
-            else:
-                r = method(stream.uri, headers=stream.headers)
-        else:
-            r = method(stream.uri)
-        if r.status_code == 200:
+        stream.headers = normalizeHeaders(stream.headers)
+        r = fetcher.request(
+            stream.uri,
+            headers=stream.headers,
+            payload=stream.payload,
+            conditional=conditional,
+            key=key)
+        if r is not None and (
+            r.status_code == 200 or (conditional and r.status_code == 304)
+        ):
             return r
         return None
 
@@ -109,12 +134,19 @@ class RawStreamRelayEngine(Cached):
     def callHook(stream: Stream, r: requests.Response):
         hookFunction = postRequestHookForNone
         if stream.hook is not None or (isinstance(stream.hook, str) and stream.hook.strip() == ''):
-            try:
-                exec(stream.hook, globals())
-                hookFunction = postRequestHook
-            except Exception as e:
-                logging.error('HOOK CREATION ERROR 1:', e)
-                return None
+            if sandbox.enabled:
+                # in a worker process, with time and memory limits, see sandbox.py
+                def hookFunction(r: requests.Response):
+                    return sandbox.hook(stream.hook, r)
+            else:
+                try:
+                    # compiled once, into a namespace of its own, see hooks.py
+                    hookFunction = hooks.function(
+                        stream.hook, 'postRequestHook', base=globals()
+                    ) or postRequestHookForNone
+                except Exception as e:
+                    logging.error('HOOK CREATION ERROR 1:', e)
+                    return None
         try:
             text = hookFunction(r)
         except Exception as e:
@@ -136,35 +168,59 @@ class RawStreamRelayEngine(Cached):
             f'{stream.streamId.source}.{stream.streamId.stream}.{stream.streamId.target}',
             data, timestamp, print=True)
         getStart().publish(
-            topic=stream.streamId.topic(),
-            data=data,
-            observationTime=timestamp,
-            observationHash=observationHash)
-        getStart().server.publish(
             topic=stream.streamId.topic(),
             data=data,
             observationTime=timestamp,
             observationHash=observationHash,
-            isPrediction=False)
+            toServer=True)
 
     def save(self, stream: Stream, data: str = None) -> CachedResult:
         self.latest[stream.streamId.topic()] = data
         self.streamId = stream.streamId  # required by Cache
         return self.disk.appendByAttributes(value=data, hashThis=True)
 
-    def callRelay(self, streams: list[Stream]) -> bool:
+    def callRelay(self, streams: list[Stream], conditional: bool = True) -> bool:
         '''
         calls API and relays data to pubsub
         the list of streams should all have the same URI and cadence and headers
         and payload. Then we can only make 1 call and parse it out according to
         the details of each stream.
         '''
-        result = RawStreamRelayEngine.call(streams[0])
+        return self.relayResult(
+            streams,
+            RawStreamRelayEngine.call(
+                streams[0],
+                conditional=conditional,
+                key=RawStreamRelayEngine.validatorKeyOf(streams)))
+
+    def relayResult(
+        self,
+        streams: list[Stream],
+        result: Union[requests.Response, None],
+    ) -> bool:
+        '''
+        runs each stream's hook on the api's response and relays the values.
+        once every stream's value was saved, or suppressed as unchanged, the
+        response's validators are remembered for the next conditional call.
+        '''
         successes = []
+        if result is not None and result.status_code == 304:
+            # the api says nothing changed, so neither did any hook's value
+            self.notModified += 1
+            return True
         if result is not None:
             for stream in streams:
                 hookResult = RawStreamRelayEngine.callHook(stream, result)
-                if hookResult is not None:
+                topic = stream.streamId.topic()
+                if (
+                    hookResult is not None and
+                    topic in self.suppressUnchanged and
+                    topic in self.latest and
+                    self.latest[topic] == hookResult
+                ):
+                    self.suppressed += 1
+                    successes.append(True)
+                elif hookResult is not None:
                     cachedResult = self.save(stream, data=hookResult)
                     if cachedResult.success:
                         self.relay(
@@ -193,6 +249,11 @@ class RawStreamRelayEngine(Cached):
                 f'{streams[0].streamId.stream}.{streams[0].streamId.target}',
                 print=True)
 
+        if (
+            len(successes) == len(streams) and all(successes) and
+            result.status_code == 200
+        ):
+            fetcher.remember(RawStreamRelayEngine.validatorKeyOf(streams), result)
         if len(successes) > 0 and all(successes):
             return True
         return False
@@ -207,7 +268,7 @@ class RawStreamRelayEngine(Cached):
         ''' called from UI '''
         stream = self._getStreamFor(streamId)
         if stream is not None:
-            return self.callRelay([stream])
+            return self.callRelay([stream], conditional=False)
         return False
 
     def _cadence(self, stream: Stream) -> int:
@@ -218,18 +279,26 @@ class RawStreamRelayEngine(Cached):
         ''' returns cadence in seconds, engine does not allow < 60 '''
         return int(stream.offset or 0)
 
+    def schedule(self) -> RelaySchedule:
+        ''' a schedule of the current streams, keyed by topic '''
+        schedule = RelaySchedule()
+        for stream in self.streams:
+            schedule.add(
+                stream.streamId.topic(),
+                cadence=self._cadence(stream),
+                offset=self._offset(stream))
+        return schedule
+
     def runForever(self, active: int):
         # though I would like to use the asyncThread for this, as it would be
         # simpler to reason about, I'm not sure how I would reduce the number
         # of api calls as we are doing here (see uri logic) for streams that all
         # call the same api. so we're leaving it as is.
-
+        self.relaySchedule = self.schedule()
+        byTopic = {stream.streamId.topic(): stream for stream in self.streams}
         while self.active == active:
-            now = int(time.time())
-            streams: list[Stream] = []
-            for stream in self.streams:
-                if (now + self._offset(stream)) % self._cadence(stream) == 0:
-                    streams.append(stream)
+            streams: list[Stream] = [
+                byTopic[topic] for topic in self.relaySchedule.due()]
             if len(streams) > 0:
                 segmentedStreams: dict[str, list[Stream]] = {}
                 for stream in streams:
@@ -238,25 +307,54 @@ class RawStreamRelayEngine(Cached):
                     if uri not in segmentedStreams.keys():
                         segmentedStreams[uri] = []
                     segmentedStreams[uri].append(stream)
-                for _, ss in segmentedStreams.items():
-                    threading.Thread(
-                        target=self.callRelay,
-                        args=(ss,)).start()
-            newNow = time.time()
-            if int(newNow) == now:
-                try:
-                    # wait till the next stream
-                    seconds = min([
-                        self._cadence(stream) - ((int(newNow) + self._offset(stream)) %
-                                                 self._cadence(stream))
-                        for stream in self.streams])
-                except Exception as e:
-                    logging.error(
-                        '\n err ',
-                        e, color='red')
-                    # wait till the next second
-                    seconds = (int(newNow)+1)-newNow
-                time.sleep(seconds)
+                for uri, ss in segmentedStreams.items():
+                    self.submit(uri, ss)
+            # wait till the next stream, or until we're killed
+            self.wake.wait(self.relaySchedule.wait())
+            self.wake.clear()
+
+    def submit(self, group: str, streams: list[Stream]):
+        '''
+        calls the api on the fetch pool, then runs the hooks on the hook pool.
+        skipped if the group's last call is still in flight.
+        '''
+        with self.inFlightLock:
+            if group in self.inFlight:
+                self.skipped += 1
+                logging.debug('relay call still in flight, skipping:', group)
+                return
+            self.inFlight.add(group)
+
+        def done():
+            with self.inFlightLock:
+                self.inFlight.discard(group)
+
+        def hook(result: Union[requests.Response, None]):
+            try:
+                self.relayResult(streams, result)
+            except Exception as e:
+                logging.error('relay failed:', e)
+            finally:
+                done()
+
+        def fetched(future: Future):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error('relay call failed:', e)
+                result = None
+            try:
+                self.hookPool.submit(hook, result)
+            except RuntimeError:
+                # shut down by kill
+                done()
+
+        try:
+            fetcher.submit(
+                RawStreamRelayEngine.call, streams[0], conditional=True,
+            ).add_done_callback(fetched)
+        except RuntimeError:
+            done()
 
     def run(self):
         if len(self.streams) > 0:
@@ -271,6 +369,8 @@ class RawStreamRelayEngine(Cached):
     def kill(self):
         self.active += 1
         self.killed = True
+        self.wake.set()
+        self.hookPool.shutdown(wait=False)
         time.sleep(3)
         self.thread = None
         self.killed = False
@@ -0,0 +1,241 @@
+'''
+user supplied relay code (postRequestHook, GetHistory) runs in a small pool of
+worker processes instead of the node itself. each call has a wall time limit
+and each worker a memory limit, on what it allocates beyond the modules it
+imported at start up: a hook that runs over is killed with its
+worker, which is replaced, and the failure is reported to the caller like any
+other hook error. a slow or greedy hook costs its own stream a value, it can't
+stall the relay threads or hold the GIL away from the engine.
+
+a response is passed to a worker as its status, headers, encoding and raw
+bytes and rebuilt there as a requests.Response, so hooks see what they always
+have. the workers compile hooks once each, see hooks.py.
+
+workers are spawned, so each imports the node's modules afresh; the node only
+starts under the main guard of web/satori.py, so a worker doesn't start a
+second node. that's what lets the sandbox be on by default ('relay hook
+sandbox' in the config turns it off).
+'''
+from typing import Union
+import queue
+import threading
+import multiprocessing
+from multiprocessing.connection import Connection
+import requests
+from satorilib import logging
+from satorineuron import config
+
+
+class HookFailed(Exception):
+    ''' the hook raised, ran out of time or memory, or its worker died '''
+
+
+def responseData(r: requests.Response) -> dict:
+    return {
+        'status': r.status_code,
+        'headers': dict(r.headers or {}),
+        'encoding': r.encoding,
+        'url': r.url,
+        'content': r.content if r.status_code is not None else b''}
+
+
+def responseOf(data: dict) -> requests.Response:
+    r = requests.Response()
+    r.status_code = data['status']
+    r.headers.update(data['headers'])
+    r.encoding = data['encoding']
+    r.url = data['url']
+    r._content = data['content']
+    return r
+
+
+def historyOf(compiled: 'CompiledHooks', source: str, base: dict, kind: str):
+    instance = compiled.function(source, 'GetHistory', base=base)()
+    if kind == 'history test':
+        if not instance.isDone():
+            instance.getNext()
+        return True
+    if kind == 'history all':
+        return instance.getAll()
+    values = []
+    while not instance.isDone():
+        values.append(instance.getNext())
+    return values
+
+
+def addressSpace() -> Union[int, None]:
+    ''' bytes of address space this process has mapped, None if unknown '''
+    try:
+        import os
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def limitMemory(memoryLimit: Union[int, None]):
+    ''' caps the address space at what's mapped now plus memoryLimit '''
+    mapped = addressSpace()
+    if not memoryLimit or mapped is None:
+        return
+    try:
+        import resource
+        resource.setrlimit(
+            resource.RLIMIT_AS, (mapped + memoryLimit, mapped + memoryLimit))
+    except (ImportError, ValueError, OSError):
+        # not on this platform, the wall time limit still applies
+        pass
+
+
+def serve(connection: Connection, memoryLimit: Union[int, None]):
+    ''' a worker: runs what it's sent until the pipe closes '''
+    from satorineuron.relay import raw_stream_relay, validate
+    from satorineuron.relay.hooks import CompiledHooks
+    # once the imports are in, the limit is on what hooks allocate
+    limitMemory(memoryLimit)
+    bases = {'relay': vars(raw_stream_relay), 'validate': vars(validate)}
+    compiled = CompiledHooks()
+    while True:
+        try:
+            kind, base, source, payload = connection.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if kind == 'hook':
+                function = compiled.function(
+                    source, 'postRequestHook', base=bases[base])
+                r = responseOf(payload)
+                result = function(r) if function is not None else r.text
+            else:
+                result = historyOf(compiled, source, bases[base], kind)
+            connection.send((True, result))
+        except MemoryError:
+            connection.send((False, 'MemoryError: over the hook memory limit'))
+        except BaseException as e:
+            connection.send((False, f'{type(e).__name__}: {e}'))
+
+
+class Worker(object):
+
+    def __init__(self, memoryLimit: Union[int, None]):
+        context = multiprocessing.get_context('spawn')
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=serve,
+            args=(child, memoryLimit),
+            name='relay hook sandbox',
+            daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        finally:
+            self.connection.close()
+
+
+class HookSandbox(object):
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        workers: int = 2,
+        timeLimit: float = 5,
+        historyTimeLimit: float = 300,
+        memoryLimit: Union[int, None] = 256 * 1024 * 1024,
+    ):
+        # off runs hooks in process, compiled once, as before
+        self.enabled = enabled
+        self.size = workers
+        self.timeLimit = timeLimit
+        self.historyTimeLimit = historyTimeLimit
+        # bytes of address space a worker's hooks may add
+        self.memoryLimit = memoryLimit
+        self.idle: queue.Queue[Worker] = queue.Queue()
+        self.started = 0
+        self.calls = 0
+        self.killed = 0
+        self.failures: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def worker(self) -> Worker:
+        ''' an idle worker, starting one if the pool isn't full yet '''
+        with self.lock:
+            start = self.idle.empty() and self.started < self.size
+            if start:
+                self.started += 1
+        if not start:
+            return self.idle.get()
+        # spawning takes a while, its slot is taken so others don't wait on it
+        try:
+            return Worker(self.memoryLimit)
+        except Exception:
+            with self.lock:
+                self.started -= 1
+            raise
+
+    def fail(self, kind: str, message: str) -> HookFailed:
+        with self.lock:
+            self.failures[kind] = self.failures.get(kind, 0) + 1
+        return HookFailed(message)
+
+    def run(
+        self,
+        kind: str,
+        source: str,
+        payload: object = None,
+        base: str = 'relay',
+    ) -> object:
+        '''
+        runs source in a worker: kind hook calls its postRequestHook with the
+        response in payload, the history kinds use its GetHistory. raises
+        HookFailed if it raised, ran out of time or memory.
+        '''
+        limit = self.timeLimit if kind == 'hook' else self.historyTimeLimit
+        worker = self.worker()
+        with self.lock:
+            self.calls += 1
+        try:
+            worker.connection.send((kind, base, source, payload))
+            if worker.connection.poll(limit):
+                ok, result = worker.connection.recv()
+                self.idle.put(worker)
+                worker = None
+                if not ok:
+                    raise self.fail(kind, result)
+                return result
+            raise self.fail(kind, f'over the {limit}s time limit, killed')
+        except (EOFError, OSError, BrokenPipeError) as e:
+            raise self.fail(kind, f'hook worker died: {e}')
+        finally:
+            if worker is not None:
+                # it's stuck or dead, replace it
+                worker.kill()
+                with self.lock:
+                    self.killed += 1
+                    self.started -= 1
+                logging.warning(f'killed a relay hook worker running {kind}')
+
+    def hook(self, source: str, r: requests.Response, base: str = 'relay') -> object:
+        return self.run('hook', source, payload=responseData(r), base=base)
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'workers': self.started,
+                'idle': self.idle.qsize(),
+                'calls': self.calls,
+                'killed': self.killed,
+                'failures': dict(self.failures)}
+
+
+sandbox = HookSandbox(
+    enabled=config.value(key='relay hook sandbox', default=True),
+    workers=config.value(key='relay hook workers', default=2),
+    timeLimit=config.value(key='hook time limit', default=5),
+    historyTimeLimit=config.value(key='history time limit', default=300),
+    memoryLimit=config.value(key='hook memory limit', default=256) * 1024 * 1024)
@@ -0,0 +1,104 @@
+'''
+when each relay stream is next due. a stream with cadence c and offset o is due
+at the seconds t where (t + o) % c == 0. streams are kept in a heap by their
+next due time, so finding what is due costs O(log n) per stream that fires
+rather than a pass over every stream each second, and a tick is never lost to
+an overrunning loop: a stream found past its due time fires once, late, and the
+ticks it slept through are counted as missed.
+
+the clock is passed in so the schedule can be driven by a simulated one.
+'''
+from typing import Union
+import math
+import time
+import heapq
+import threading
+
+
+def nextDue(after: float, cadence: int, offset: int = 0) -> int:
+    ''' the first second at or after after where (t + offset) % cadence == 0 '''
+    return int(cadence * math.ceil((after + offset) / cadence) - offset)
+
+
+class RelaySchedule(object):
+
+    def __init__(self, clock: callable = time.time, tolerance: float = 1.0):
+        self.clock = clock
+        # seconds past due before a tick counts as late
+        self.tolerance = tolerance
+        # (due, sequence, key)
+        self.heap: list[tuple[int, int, str]] = []
+        # key -> (cadence, offset, due)
+        self.entries: dict[str, tuple[int, int, int]] = {}
+        self.sequence = 0
+        self.ticks = 0
+        self.late = 0
+        self.missed = 0
+        self.maxLateness = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def push(self, key: str, due: int):
+        self.sequence += 1
+        heapq.heappush(self.heap, (due, self.sequence, key))
+
+    def add(self, key: str, cadence: int, offset: int = 0):
+        ''' schedules key from now, replacing its previous schedule '''
+        with self.lock:
+            due = nextDue(self.clock(), cadence, offset)
+            self.entries[key] = (cadence, offset, due)
+            self.push(key, due)
+
+    def remove(self, key: str):
+        ''' its heap entry is discarded when it comes up '''
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def due(self) -> list[str]:
+        ''' keys due by now, each rescheduled to its next due time '''
+        now = self.clock()
+        fired = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                due, _, key = heapq.heappop(self.heap)
+                entry = self.entries.get(key)
+                if entry is None or entry[2] != due:
+                    # removed or rescheduled since
+                    continue
+                cadence, offset, _ = entry
+                lateness = now - due
+                missed = int(lateness // cadence)
+                if lateness > self.tolerance:
+                    self.late += 1
+                    self.maxLateness = max(self.maxLateness, lateness)
+                self.missed += missed
+                self.ticks += 1
+                following = due + cadence * (missed + 1)
+                self.entries[key] = (cadence, offset, following)
+                self.push(key, following)
+                fired.append(key)
+        return fired
+
+    def wait(self) -> Union[float, None]:
+        ''' seconds until the next key is due, None if nothing is scheduled '''
+        with self.lock:
+            while self.heap and (
+                self.heap[0][2] not in self.entries or
+                self.entries[self.heap[0][2]][2] != self.heap[0][0]
+            ):
+                heapq.heappop(self.heap)
+            if not self.heap:
+                return None
+            return max(self.heap[0][0] - self.clock(), 0)
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'streams': len(self.entries),
+                'ticks': self.ticks,
+                'late': self.late,
+                'missed': self.missed,
+                'maxLateness': self.maxLateness}
@@ -11,6 +11,9 @@ from satorilib.api.time import nowStr
 from satorineuron import config
 from satorineuron import logging
 from satorineuron.relay.history import GetHistory
+from satorineuron.relay.fetch import fetcher, normalizeHeaders
+from satorineuron.relay.hooks import hooks
+from satorineuron.relay.sandbox import sandbox
 
 
 def postRequestHookForNone(r: requests.Response):
@@ -126,17 +129,22 @@ class ValidateRelayStream(object):
             author=getStart().wallet.publicKey,
             stream=data.get('name'),
             target=data.get('target'))
-        config.put(
+        suppress = data.get('suppress unchanged')
+        if suppress is None:
+            # the form doesn't have it, keep what was set in relay.yaml
+            suppress = (config.get('relay') or {}).get(
+                streamId.topic(asJson=True), {}).get('suppress unchanged', False)
+        config.add(
             'relay',
             data={
-                **config.get('relay'),
-                **{streamId.topic(asJson=True): {
+                streamId.topic(asJson=True): {
                     'uri': data.get('uri'),
                     'headers': data.get('headers'),
                     'payload': data.get('payload'),
                     'hook': data.get('hook'),
                     'history': data.get('history'),
-                }}})
+                    **({'suppress unchanged': True} if suppress else {}),
+                }})
 
     def validRelay(self, data: dict):
         return (
@@ -153,43 +161,16 @@ class ValidateRelayStream(object):
             re.compile(self.regexURL).match(url) is not None)
 
     def testCall(self, data: dict):
-        def isValidJson(x):
-            try:
-                json.loads(x)
-                return True
-            except Exception as _:
-                return False
-
         if data.get('uri') is None or data.get('uri').strip() == '':
             r = requests.Response()
             r.status_code = 200
             return r
-        if data.get('payload') is None:
-            method = partial(requests.get)
-        else:
-            if isValidJson(data.get('payload')):
-                method = partial(requests.post, json=data.get('payload'))
-            else:
-                method = partial(requests.post, data=data.get('payload'))
-        if data.get('headers') not in ['', None]:
-            if isValidJson(data.get('headers')):
-                r = method(
-                    data.get('uri'),
-                    headers=json.loads(data.get('headers')),)
-            elif (
-                not isValidJson(data.get('headers')) and
-                "'" in data.get('headers') and
-                '"' not in data.get('headers')
-            ):
-                data['headers'] = data.get('headers').replace("'", '"')
-                r = method(
-                    data.get('uri'),
-                    headers=json.loads(data.get('headers')))
-            else:
-                r = method(data.get('uri'), headers=data.get('headers'))
-        else:
-            r = method(data.get('uri'))
-        if r.status_code == 200:
+        data['headers'] = normalizeHeaders(data.get('headers'))
+        r = fetcher.request(
+            data.get('uri'),
+            headers=data.get('headers'),
+            payload=data.get('payload'))
+        if r is not None and r.status_code == 200:
             return r
         return False
 
@@ -198,10 +179,13 @@ class ValidateRelayStream(object):
 
     def testHook(self, data: dict, text: requests.Response):
         hookFunction = postRequestHookForNone
-        if data.get('hook') is not None:
+        if data.get('hook') is not None and sandbox.enabled:
+            hookFunction = partial(sandbox.hook, data.get('hook'), base='validate')
+        elif data.get('hook') is not None:
             try:
-                exec(data.get('hook'), globals())
-                hookFunction = postRequestHook
+                hookFunction = hooks.function(
+                    data.get('hook'), 'postRequestHook', base=globals()
+                ) or postRequestHookForNone
             except Exception as e:
                 logging.error('HOOK CREATION ERROR:', e)
                 return None
@@ -216,10 +200,17 @@ class ValidateRelayStream(object):
 
     def testHistory(self, data: dict):
         historyInstance = None
+        if data.get('history') is not None and sandbox.enabled:
+            try:
+                sandbox.run('history test', data.get('history'), base='validate')
+            except Exception as e:
+                logging.error('HISTORY EXECUTION ERROR:', e)
+                return False
+            return True
         if data.get('history') is not None:
             try:
-                exec(data.get('history'), globals())
-                historyInstance = GetHistory()
+                historyInstance = hooks.function(
+                    data.get('history'), 'GetHistory', base=globals())()
             except Exception as e:
                 logging.error('HISTORY CREATION ERROR:', e)
                 return False
@@ -259,21 +250,36 @@ class ValidateRelayStream(object):
             while not historyInstance.isDone():
                 saver.saveIncremental(historyInstance.getNext())
 
+        def saveFromSandbox():
+            ''' the worker runs GetHistory, we save what it returns '''
+            values = sandbox.run('history each', data.get('history'), base='validate')
+            try:
+                saver.saveAll(values)
+            except Exception as e:
+                logging.error('relay error', e)
+                for value in values:
+                    saver.saveIncremental(value)
+
         historyInstance = None
         if data.get('history') is not None:
-            exec(data.get('history'), globals())
-            historyInstance = GetHistory()
             saver = RelayStreamHistorySaver(
                 id=StreamId(
                     source=data.get('source', 'satori'),
                     author=getStart().wallet.publicKey,
                     stream=data.get('name'),
                     target=data.get('target')))
-            values = historyInstance.getAll()
+            if sandbox.enabled:
+                values = sandbox.run('history all', data.get('history'), base='validate')
+            else:
+                historyInstance = hooks.function(
+                    data.get('history'), 'GetHistory', base=globals())()
+                values = historyInstance.getAll()
             success = False
             if (isinstance(values, list) or isinstance(values, pd.DataFrame)) and len(values) > 0:
                 success = saver.saveAll(values)
-            if not success and not saveOnce():
+            if not success and sandbox.enabled:
+                saveFromSandbox()
+            elif not success and not saveOnce():
                 saveIncrementally()
             # no need to register pin at this time
             # saver.report(path, pinAddress=saver.pin(saver.pathForDataset()))
@@ -44,6 +44,18 @@ class StartupDagStruct(object):
         self.subscriptionKeys: str = None
         self.publicationKeys: str = None
         # self.ipfs: Ipfs = None
+        self.caches: 'CacheRegistry' = None
+        self.routes: 'RoutingIndex' = None
+        self.ingest: 'IngestPipeline' = None
+        self.coalescer: 'Coalescer' = None
+        self.publisher: 'Publisher' = None
+        self.governor: 'Governor' = None
+        self.training: 'TrainingScheduler' = None
+        self.harness: 'ModelHarness' = None
+        self.features: 'FeatureStore' = None
+        self.datasets: 'DatasetStore' = None
+        self.snapshots: 'ModelSnapshots' = None
+        self.search: 'HyperparameterSearch' = None
         self.signedStreamIds: list['SignedStreamId'] = None
         self.relayValidation: 'ValidateRelayStream' = None
         self.server: SatoriServerClient = None
@@ -97,6 +109,9 @@ class StartupDagStruct(object):
     def start(self):
         ''' start the satori engine. '''
 
+    def startupTasks(self) -> list['Task']:
+        ''' the startup tasks and their dependencies '''
+
     def createRelayValidation(self):
         ''' creates relay validation engine '''
 
@@ -123,6 +138,9 @@ class StartupDagStruct(object):
     def checkin(self):
         ''' checks in with the Satori Server '''
 
+    def warmStart(self) -> bool:
+        ''' starts from the last good checkin '''
+
     def buildEngine(self):
         ''' start the engine, it will run w/ what it has til ipfs is synced '''
 
@@ -143,11 +161,14 @@ class StartupDagStruct(object):
     #    '''
     #    pass
 
-    def pause(self, timeout: int = 60):
-        ''' pause the engine. '''
+    def pause(self, timeout: int = 60, mode: str = 'paused'):
+        ''' pause the engine, or with mode predict only, stop it from training '''
 
     def unpause(self):
-        ''' pause the engine. '''
+        ''' resumes the engine '''
+
+    def throttle(self, maxCpuPercent: float = None):
+        ''' caps the cpu of the engine, in percent of one core '''
 
     def performStakeCheck(self):
         ''' check the stake status '''
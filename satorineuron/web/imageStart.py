@@ -3,36 +3,11 @@
 
 # run with:
 # sudo nohup /app/anaconda3/bin/python app.py > /dev/null 2>&1 &
-from flask_cors import CORS
-from typing import Union
-from functools import wraps, partial
 import os
-import sys
-import json
 import secrets
-import webbrowser
-import time
-import traceback
-import pandas as pd
-import threading
-from queue import Queue
-from waitress import serve  # necessary ?
-from flask import Flask, url_for, redirect, jsonify, flash, send_from_directory
-from flask import session, request, render_template
-from flask import Response, stream_with_context
-from satorilib.concepts.structs import StreamId, StreamOverviews
-from satorilib.api.wallet.wallet import TransactionFailure
-from satorilib.api.time import timeToSeconds
-from satorilib.api.wallet import RavencoinWallet, EvrmoreWallet
-from satorilib.utils import getRandomName, getRandomQuote
-from satorisynapse import Envelope, Signal
-from satorineuron import VERSION, MOTTO, config
-from satorineuron import logging
-from satorineuron.relay import acceptRelaySubmission, processRelayCsv, generateHookFromTarget, registerDataStream
-from satorineuron.web import forms
-from satorineuron.init.start import StartupDag
-from satorineuron.web.utils import deduceCadenceString, deduceOffsetString
-
+from flask import Flask, send_from_directory, render_template
+# ui only entry point: keep imports light, nothing from the node or engine
+from satorineuron import config
 
 ###############################################################################
 ## Globals ####################################################################
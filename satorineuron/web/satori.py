@@ -35,6 +35,10 @@ from satorineuron import logging
 from satorineuron.relay import acceptRelaySubmission, processRelayCsv, generateHookFromTarget, registerDataStream
 from satorineuron.web import forms
 from satorineuron.init.start import StartupDag
+from satorineuron.init.throttle import EngineMode
+from satorineuron.relay.fetch import fetcher
+from satorineuron.relay.hooks import hooks
+from satorineuron.relay.sandbox import sandbox
 from satorineuron.web.utils import deduceCadenceString, deduceOffsetString
 
 logging.info(f'version: {VERSION}', print=True)
@@ -81,51 +85,59 @@ else:
 ###############################################################################
 ## Startup ####################################################################
 ###############################################################################
-while True:
-    try:
-        start = StartupDag(
-            env=ENV,
-            urlServer={
-                # TODO: local endpoint should be in a config file.
-                'local': 'http://192.168.0.10:5002',
-                'dev': 'http://localhost:5002',
-                'test': 'https://test.satorinet.io',
-                'prod': 'https://stage.satorinet.io'}[ENV],
-            urlMundo={
-                'local': 'http://192.168.0.10:5002',
-                'dev': 'http://localhost:5002',
-                'test': 'https://test.satorinet.io',
-                'prod': 'https://mundo.satorinet.io'}[ENV],
-            urlPubsubs={
-                'local': ['ws://192.168.0.10:24603'],
-                'dev': ['ws://localhost:24603'],
-                'test': ['ws://test.satorinet.io:24603'],
-                'prod': ['ws://pubsub1.satorinet.io:24603', 'ws://pubsub5.satorinet.io:24603', 'ws://pubsub6.satorinet.io:24603']}[ENV],
-            # 'prod': ['ws://pubsub2.satorinet.foundation:24603', 'ws://pubsub5.satorinet.io:24603', 'ws://pubsub6.satorinet.io:24603']}[ENV],
-            urlSynergy={
-                'local': 'https://192.168.0.10:24602',
-                'dev': 'https://localhost:24602',
-                'test': 'https://test.satorinet.io:24602',
-                'prod': 'https://synergy.satorinet.io:24602'}[ENV],
-            isDebug=sys.argv[1] if len(sys.argv) > 1 else False)
-
-        # print('building engine')
-        # start.buildEngine()
-        # threading.Thread(target=start.start, daemon=True).start()
-        logging.info(f'environment: {ENV}', print=True)
-        logging.info('Satori Neuron is starting...', color='green')
-        break
-    except ConnectionError as e:
-        # try again...
-        traceback.print_exc()
-        logging.error(f'ConnectionError in app startup: {e}', color='red')
-        time.sleep(30)
-    # except RemoteDisconnected as e:
-    except Exception as e:
-        # try again...
-        traceback.print_exc()
-        logging.error(f'Exception in app startup: {e}', color='red')
-        time.sleep(30)
+# the node is started by the main guard: worker processes started with spawn
+# import this module again as __mp_main__, and must not boot a second node.
+start: StartupDag = None
+
+
+def startNode() -> StartupDag:
+    ''' builds the StartupDag singleton, retrying until it comes up '''
+    while True:
+        try:
+            node = StartupDag(
+                env=ENV,
+                urlServer={
+                    # TODO: local endpoint should be in a config file.
+                    'local': 'http://192.168.0.10:5002',
+                    'dev': 'http://localhost:5002',
+                    'test': 'https://test.satorinet.io',
+                    'prod': 'https://stage.satorinet.io'}[ENV],
+                urlMundo={
+                    'local': 'http://192.168.0.10:5002',
+                    'dev': 'http://localhost:5002',
+                    'test': 'https://test.satorinet.io',
+                    'prod': 'https://mundo.satorinet.io'}[ENV],
+                urlPubsubs={
+                    'local': ['ws://192.168.0.10:24603'],
+                    'dev': ['ws://localhost:24603'],
+                    'test': ['ws://test.satorinet.io:24603'],
+                    'prod': ['ws://pubsub1.satorinet.io:24603', 'ws://pubsub5.satorinet.io:24603', 'ws://pubsub6.satorinet.io:24603']}[ENV],
+                # 'prod': ['ws://pubsub2.satorinet.foundation:24603', 'ws://pubsub5.satorinet.io:24603', 'ws://pubsub6.satorinet.io:24603']}[ENV],
+                urlSynergy={
+                    'local': 'https://192.168.0.10:24602',
+                    'dev': 'https://localhost:24602',
+                    'test': 'https://test.satorinet.io:24602',
+                    'prod': 'https://synergy.satorinet.io:24602'}[ENV],
+                isDebug=sys.argv[1] if len(sys.argv) > 1 else False)
+
+            # print('building engine')
+            # start.buildEngine()
+            # threading.Thread(target=start.start, daemon=True).start()
+            logging.info(f'environment: {ENV}', print=True)
+            logging.info('Satori Neuron is starting...', color='green')
+            return node
+        except ConnectionError as e:
+            # try again...
+            traceback.print_exc()
+            logging.error(f'ConnectionError in app startup: {e}', color='red')
+            time.sleep(30)
+        # except RemoteDisconnected as e:
+        except Exception as e:
+            # try again...
+            traceback.print_exc()
+            logging.error(f'Exception in app startup: {e}', color='red')
+            time.sleep(30)
+
 
 ###############################################################################
 ## Functions ##################################################################
@@ -148,17 +160,11 @@ def hashSaltIt(string: str) -> str:
 
 
 def isActuallyLockable():
-    conf = config.get()
-    return conf.get('neuron lock enabled') is not None and (
-        conf.get('neuron lock hash') is not None or
-        conf.get('neuron lock password') is not None)
+    return config.isLockable()
 
 
 def isActuallyLocked():
-    conf = config.get()
-    return conf.get('neuron lock enabled') == True and (
-        conf.get('neuron lock hash') is not None or
-        conf.get('neuron lock password') is not None)
+    return config.isLocked()
 
 
 def get_user_id():
@@ -249,9 +255,7 @@ def passphrase():
     if request.method == 'POST':
         time.sleep(timeout)
         target = request.form.get('next') or 'dashboard'
-        conf = config.get()
-        expectedPassword = conf.get('neuron lock password')
-        expectedPassword = expectedPassword or conf.get('neuron lock hash', '')
+        expectedPassword = config.lockSecret()
         if (
             request.form['passphrase'] == expectedPassword or
             hashSaltIt(request.form['passphrase']) == expectedPassword or
@@ -372,12 +376,29 @@ def pause(timeout):
     try:
         timeout = int(timeout)
         if timeout < 12:
-            start.pause(timeout*60*60)
+            # ?mode=predict keeps predicting but stops training
+            start.pause(
+                timeout*60*60,
+                mode=(
+                    EngineMode.predictOnly
+                    if request.args.get('mode') == 'predict'
+                    else EngineMode.paused))
     except Exception as _:
         flash('invalid pause timeout', 'error')
     return redirect(url_for('dashboard'))
 
 
+@app.route('/throttle/<percent>', methods=['GET'])
+@authRequired
+def throttle(percent):
+    ''' caps the engine's cpu, in percent of one core, 0 removes the cap '''
+    try:
+        start.throttle(float(percent))
+    except Exception as _:
+        flash('invalid cpu percent', 'error')
+    return redirect(url_for('dashboard'))
+
+
 @app.route('/unpause', methods=['GET'])
 @authRequired
 def unpause():
@@ -1344,7 +1365,7 @@ def wallet(network: str = 'main'):
 
     myWallet = start.openWallet(network=network)
     alias = myWallet.alias or start.server.getWalletAlias()
-    if config.get().get('wallet lock'):
+    if config.walletLock():
         if request.method == 'POST':
             accept_submittion(forms.VaultPassword(formdata=request.form))
         if start.vault is not None and not start.vault.isEncrypted:
@@ -1464,10 +1485,10 @@ def vault():
         _vault = start.openVault(
             password=passwordForm.password.data,
             create=True)
-        if not config.get().get('neuron lock hash', False):
+        if not config.value(key='neuron lock hash', default=False):
             config.add(data={'neuron lock hash': hashSaltIt(
                 passwordForm.password.data)})
-            if 'neuron lock enabled' not in config.get():
+            if config.lockEnabled() is None:
                 config.add(data={'neuron lock enabled': False})
         # if rvn is None or not rvn.isEncrypted:
         #    flash('unable to open vault')
@@ -1765,11 +1786,66 @@ def systemMetrics():
         'disk': system.getDiskDetails(),
         'boot_time': system.getBootTime(),
         'uptime': system.getUptime(),
+        'stream_caches': start.caches.stats,
+        'training': start.training.stats,
+        'model_harness': start.harness.stats,
+        'model_snapshots': start.snapshots.stats,
+        'features': start.features.stats,
+        'datasets': start.datasets.stats,
+        'governor': start.governor.stats,
+        'relay_fetch': fetcher.stats,
+        'relay_hooks': hooks.stats,
+        'relay_sandbox': sandbox.stats,
+        'relay': start.relay.stats if start.relay is not None else None,
+        'hyperparameter_search': start.search.stats,
         'version': VERSION,
         'timestamp': time.time(),
     }), 200
 
 
+@app.route('/debug/startup', methods=['GET'])
+@authRequired
+def debugStartup():
+    ''' the timeline of this boot and of the last few boots '''
+    from satorineuron.init.timeline import timeline, Timeline
+    return jsonify({
+        'current': timeline.toDict,
+        'previous': [
+            boot for boot in Timeline.history(
+                config.dataPath('startup-timeline.json'))
+            if boot.get('began') != timeline.began],
+    }), 200
+
+
+@app.route('/debug/scheduler', methods=['GET'])
+@authRequired
+def debugScheduler():
+    ''' timers of the node and when each component became ready '''
+    return jsonify({
+        'jobs': start.scheduler.status,
+        'ready': start.ready.status,
+        'coalescing': start.coalescer.stats,
+        'relay': (
+            start.relay.relaySchedule.stats
+            if start.relay is not None and start.relay.relaySchedule is not None
+            else None),
+    }), 200
+
+
+@app.route('/debug/publish', methods=['GET'])
+@authRequired
+def debugPublish():
+    ''' queue depth, latency and errors of each place we publish to '''
+    return jsonify(start.publisher.stats), 200
+
+
+@app.route('/debug/ingest', methods=['GET'])
+@authRequired
+def debugIngest():
+    ''' queue depths, drops and per stage latency of incoming observations '''
+    return jsonify(start.ingest.stats), 200
+
+
 # @app.route('/vote/submit/manifest/vault', methods=['POST'])
 # @authRequired
 # def voteSubmitManifestVault():
@@ -1932,6 +2008,15 @@ def mergeHistoryCsv(topic: str = None):
     return redirect(url_for('dashboard'))
 
 
+@app.route('/verify_caches', methods=['GET'])
+@authRequired
+def verifyCaches():
+    ''' rehashes the entire history of every published stream '''
+    start.verifyCaches(entire=True)
+    flash('full verification of published history started', 'success')
+    return redirect(url_for('dashboard'))
+
+
 @app.route('/remove_history_csv/<topic>', methods=['GET'])
 @authRequired
 def removeHistoryCsv(topic: str = None):
@@ -2084,6 +2169,7 @@ def synapseMessage():
 if __name__ == '__main__':
     # if False:
     #    spoofStreamer()
+    start = startNode()
 
     # serve(app, host='0.0.0.0', port=config.get()['port'])
     app.run(
@@ -0,0 +1,52 @@
+'''
+measures the configuration overhead of a single dashboard request: getResp
+asks isActuallyLocked and isActuallyLockable, authRequired asks
+isActuallyLocked again. before: every question parses config.yaml. after: the
+parse is cached until the file's mtime or size changes.
+
+python tests/manual/config_benchmark.py
+'''
+import os
+import time
+import shutil
+import tempfile
+from satorineuron.config import config as raw
+
+
+def uncachedRequest(path: str):
+    ''' the way requests used to read the config '''
+    for _ in range(3):
+        conf = raw.load(path)
+        conf.get('neuron lock enabled') is not None and (
+            conf.get('neuron lock hash') is not None or
+            conf.get('neuron lock password') is not None)
+
+
+def cachedRequest(path: str):
+    ''' the way requests read the config now '''
+    for _ in range(3):
+        raw.value(key='neuron lock enabled', path=path) is not None and (
+            raw.value(key='neuron lock hash', path=path) is not None or
+            raw.value(key='neuron lock password', path=path) is not None)
+
+
+def measure(fn: callable, path: str, n: int) -> float:
+    began = time.perf_counter()
+    for _ in range(n):
+        fn(path)
+    return (time.perf_counter() - began) / n
+
+
+if __name__ == '__main__':
+    n = 2000
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'config.yaml')
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), '../../config/config.yaml'),
+        path)
+    before = measure(uncachedRequest, path, n)
+    after = measure(cachedRequest, path, n)
+    print(f'before: {before*1e6:.1f}us per request')
+    print(f'after:  {after*1e6:.1f}us per request')
+    print(f'speedup: {before/after:.1f}x')
+    shutil.rmtree(folder)
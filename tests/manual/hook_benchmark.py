@@ -0,0 +1,64 @@
+'''
+overhead of running relay hooks per tick: exec of the source every call (as
+callHook used to) versus the compiled namespace cache, and how often streams
+ran each other's hook when they shared the module globals.
+
+python tests/manual/hook_benchmark.py
+'''
+import json
+import time
+import threading
+from satorineuron.relay.hooks import CompiledHooks
+
+HOOK = '''
+def postRequestHook(r):
+    return json.loads(r).get('{key}')
+'''
+RESPONSE = json.dumps({f'key{i}': i for i in range(100)})
+
+
+def execPerTick(source: str, namespace: dict):
+    exec(source, namespace)
+    return namespace['postRequestHook'](RESPONSE)
+
+
+def compiledOnce(hooks: CompiledHooks, source: str, namespace: dict):
+    return hooks.function(source, 'postRequestHook', base=namespace)(RESPONSE)
+
+
+def perTick(call: callable, ticks: int = 20000) -> float:
+    began = time.perf_counter()
+    for _ in range(ticks):
+        call()
+    return (time.perf_counter() - began) / ticks * 1e6
+
+
+def wrongResults(call: callable, streams: int = 8, ticks: int = 2000) -> int:
+    ''' how many calls returned another stream's value '''
+    wrong = [0]
+
+    def run(i: int):
+        for _ in range(ticks):
+            if call(i) != i:
+                wrong[0] += 1
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return wrong[0]
+
+
+if __name__ == '__main__':
+    namespace = {'json': json}
+    hooks = CompiledHooks()
+    source = HOOK.format(key='key7')
+    print(f'exec per tick: {perTick(lambda: execPerTick(source, namespace)):.1f}us')
+    print(f'compiled once: {perTick(lambda: compiledOnce(hooks, source, namespace)):.1f}us')
+    sources = [HOOK.format(key=f'key{i}') for i in range(8)]
+    shared = {'json': json}
+    print('wrong results, shared globals:', wrongResults(
+        lambda i: execPerTick(sources[i], shared)))
+    print('wrong results, own namespaces:', wrongResults(
+        lambda i: compiledOnce(hooks, sources[i], shared)))
@@ -0,0 +1,32 @@
+'''
+throughput of hash chain validation on synthetic streams, inline versus
+across the process pool.
+
+python tests/manual/verify_benchmark.py
+'''
+import pandas as pd
+from satorilib.api.hash import hashRow
+from satorineuron.init.verify import ParallelVerifier
+
+
+def syntheticStream(rows: int) -> pd.DataFrame:
+    index = [f'2024-01-01 00:00:{i:09d}' for i in range(rows)]
+    values = [str(i * 0.5) for i in range(rows)]
+    hashes = []
+    prior = ''
+    for ts, value in zip(index, values):
+        prior = hashRow(priorRowHash=prior, ts=ts, value=value)
+        hashes.append(prior)
+    return pd.DataFrame({'value': values, 'hash': hashes}, index=index)
+
+
+if __name__ == '__main__':
+    frames = {
+        f'stream{i}': (syntheticStream(200000), 0)
+        for i in range(8)}
+    inline = ParallelVerifier(processes=1)
+    assert all(v is None for v in inline.verify(frames).values())
+    print(f'inline: {inline.throughput:.0f} rows/sec')
+    pooled = ParallelVerifier()
+    assert all(v is None for v in pooled.verify(frames).values())
+    print(f'pool of {pooled.processes}: {pooled.throughput:.0f} rows/sec')
@@ -0,0 +1,62 @@
+'''
+bulk relay registration keeps the rows the server accepted, even when a later
+row fails part way.
+'''
+from queue import Queue
+import pandas as pd
+from satorineuron.relay.accept import processRelayCsv
+
+
+class Validation(object):
+
+    def __init__(self, failOn: str):
+        self.failOn = failOn
+        self.claimed = set()
+        self.registered = []
+        self.savedLocal = []
+
+    def validUrl(self, url):
+        return True
+
+    def validHook(self, hook):
+        return True
+
+    def testCall(self, data):
+        return True
+
+    def testHook(self, data, result):
+        return 1
+
+    def registerStream(self, data):
+        if data['name'] == self.failOn:
+            raise ConnectionError('server went away')
+        self.registered.append(data['name'])
+        return 'ok'
+
+    def saveLocal(self, data):
+        self.savedLocal.append(data['name'])
+
+
+class Start(object):
+
+    def __init__(self, failOn: str):
+        self.relayValidation = Validation(failOn)
+        self.relay = type('Relay', (), {'streams': []})()
+        self.wallet = type('Wallet', (), {'publicKey': 'pubkey'})()
+        self.workingUpdates = Queue()
+
+
+def rows(*names: str) -> pd.DataFrame:
+    return pd.DataFrame([
+        {'stream': name, 'target': 't', 'url': '', 'hook': 'def postRequestHook(r): return 1'}
+        for name in names])
+
+
+def testSavesRowsRegisteredBeforeAFailure():
+    start = Start(failOn='c')
+    try:
+        processRelayCsv(start, rows('a', 'b', 'c', 'd'))
+    except ConnectionError:
+        pass
+    assert start.relayValidation.registered == ['a', 'b']
+    assert start.relayValidation.savedLocal == ['a', 'b']
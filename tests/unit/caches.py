@@ -0,0 +1,90 @@
+'''
+the stream cache registry: lazy opening, one handle per stream and eviction
+of loaded dataframes under the memory budget.
+'''
+import pandas as pd
+from satorilib.concepts.structs import StreamId
+from satorineuron.init.caches import CacheRegistry
+
+
+class FakeCache(object):
+    ''' stands in for disk.Cache, loads its dataframe on read '''
+
+    def __init__(self, streamId: StreamId, rows: int = 1000):
+        self.id = streamId
+        self.rows = rows
+        self.cache = None
+
+    def read(self) -> pd.DataFrame:
+        self.cache = pd.DataFrame({'value': range(self.rows)})
+        return self.cache
+
+
+def streamIds(n: int) -> list[StreamId]:
+    return [
+        StreamId(source='s', author='a', stream=f'stream{i}', target='t')
+        for i in range(n)]
+
+
+def registry(n: int, budget: int = None) -> tuple[CacheRegistry, list[StreamId], list]:
+    opened = []
+
+    def factory(streamId: StreamId) -> FakeCache:
+        cache = FakeCache(streamId)
+        opened.append(cache)
+        return cache
+
+    ids = streamIds(n)
+    return CacheRegistry(ids, budget=budget, factory=factory), ids, opened
+
+
+def testOpensLazily():
+    caches, ids, opened = registry(3)
+    assert opened == []
+    assert caches.get(ids[0]) is caches.get(ids[0])
+    assert len(opened) == 1
+    assert caches.get(streamIds(5)[4]) is None
+
+
+def testEvictsLeastRecentlyUsedFramesInPlace():
+    loaded = FakeCache(None)
+    loaded.read()
+    one = CacheRegistry.sizeOf(loaded)
+    caches, ids, opened = registry(3, budget=int(one * 2.5))
+    for streamId in ids:
+        caches.get(streamId).read()
+        caches.measure()
+    first, second, third = opened
+    # the oldest was unloaded, its handle kept
+    assert first.cache is None
+    assert second.cache is not None and third.cache is not None
+    assert caches.memory <= caches.budget
+    assert caches.stats['evictions'] == 1
+    # reaching it again returns the same handle, never a second one
+    assert caches.get(ids[0]) is first
+    assert len(opened) == 3
+
+
+def testKeepsHandlesAcrossCheckins():
+    caches, ids, opened = registry(3)
+    handle = caches.get(ids[0])
+    caches.get(ids[2])
+    caches.register(ids[:2])
+    assert caches.get(ids[0]) is handle
+    assert caches.get(ids[2]) is None
+    assert caches.stats['open'] == 1
+
+
+def testMeasuringEvictsDataLoadedAfterGet():
+    loaded = FakeCache(None)
+    loaded.read()
+    one = CacheRegistry.sizeOf(loaded)
+    caches, ids, opened = registry(3, budget=int(one * 2.5))
+    handles = [caches.get(streamId) for streamId in ids]
+    # handed out empty, the data comes later
+    for handle in handles:
+        handle.read()
+    assert caches.memory == 0
+    assert caches.measure() <= caches.budget
+    assert opened[0].cache is None
+    assert caches.stats['evictions'] == 1
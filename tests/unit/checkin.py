@@ -0,0 +1,168 @@
+'''
+warm starts from the last good checkin (config/checkin.yaml), a fresh checkin
+taking over from them, and reconciling what runs with a changed checkin.
+'''
+import os
+import json
+import threading
+from functools import partial
+from satorilib.concepts.structs import StreamId, Stream
+from satorilib.server.api import CheckinDetails
+from satorineuron import config
+from satorineuron.config import config as configuration
+from satorineuron.init.start import StartupDag, SingletonMeta
+from satorineuron.init.routing import RoutingIndex
+from satorineuron.init.caches import CacheRegistry
+from satorineuron.init.datasets import DatasetStore
+from satorineuron.init.harness import ModelHarness
+from satorineuron.init.engine import reconcileModels
+
+
+def streamMap(name: str, reason: str = None) -> dict:
+    return {
+        'source': 's', 'author': 'a', 'stream': name, 'target': 't',
+        **({'reason': streamMap(reason)} if reason else {})}
+
+
+def details(subscriptions: list[dict], publications: list[dict]) -> CheckinDetails:
+    return CheckinDetails(
+        key='key', oracleKey='oracle', idKey='id',
+        subscriptionKeys=[], publicationKeys=[],
+        subscriptions=json.dumps(subscriptions),
+        publications=json.dumps(publications))
+
+
+def node(tmp_path, monkeypatch) -> StartupDag:
+    ''' a node with just what checkins touch, its config in tmp_path '''
+    root = partial(os.path.join, str(tmp_path))
+    os.makedirs(root('config'))
+    monkeypatch.setattr(config, 'get', partial(configuration.get, root=root))
+    monkeypatch.setattr(config, 'put', partial(configuration.put, root=root))
+    start = StartupDag.__new__(StartupDag)
+    start.checkinLock = threading.Lock()
+    start.checkedIn = False
+    start.warmed = False
+    start.relay = None
+    start.engine = None
+    start.relayStreams = None
+    start.subscriptions = []
+    start.publications = []
+    start.routes = RoutingIndex()
+    start.caches = CacheRegistry(factory=lambda streamId: None)
+    start.datasets = DatasetStore()
+    start.harness = ModelHarness(training=None)
+    start.harness.installed = True
+    monkeypatch.setitem(SingletonMeta._instances, StartupDag, start)
+    return start
+
+
+def names(streams: list[Stream]) -> list[str]:
+    return [stream.streamId.stream for stream in streams]
+
+
+def testWarmStartsFromTheSavedCheckin(tmp_path, monkeypatch):
+    start = node(tmp_path, monkeypatch)
+    start.saveCheckin(details([streamMap('x', reason='p')], [streamMap('p')]))
+    saved = configuration.load(str(tmp_path / 'config' / 'checkin.yaml'))
+    # only the streams, never the keys
+    assert set(saved.keys()) == {'subscriptions', 'publications'}
+    assert start.warmStart()
+    assert names(start.subscriptions) == ['x']
+    assert names(start.publications) == ['p']
+    subscriptions, publications = start.warmStreams()
+    assert names(subscriptions) == ['x'] and names(publications) == ['p']
+    assert start.caches.keys() and len(start.caches) == 2
+
+
+def testNoWarmStartWithoutAGoodCheckin(tmp_path, monkeypatch):
+    start = node(tmp_path, monkeypatch)
+    assert not start.warmStart()
+    with open(tmp_path / 'config' / 'checkin.yaml', mode='w') as f:
+        f.write('subscriptions: "[not json"\npublications: "[]"\n')
+    assert not start.warmStart()
+    with open(tmp_path / 'config' / 'checkin.yaml', mode='w') as f:
+        f.write(': : not yaml [')
+    assert not start.warmStart()
+    with open(tmp_path / 'config' / 'checkin.yaml', mode='w') as f:
+        f.write('- just a list\n')
+    assert not start.warmStart()
+    assert start.warmStreams() is None
+    assert start.subscriptions == [] and not start.warmed
+
+
+def testAFreshCheckinReplacesTheWarmStreams(tmp_path, monkeypatch):
+    start = node(tmp_path, monkeypatch)
+    start.saveCheckin(details([streamMap('x', reason='p')], [streamMap('p')]))
+    assert start.warmStart()
+    fresh = details([streamMap('y', reason='q')], [streamMap('q')])
+    with start.checkinLock:
+        start.applyCheckin(fresh)
+        start.checkedIn = True
+    start.saveCheckin(fresh)
+    assert start.warmStreams() is None
+    assert names(start.publications) == ['q']
+    # a later boot warms from the fresh one
+    start.checkedIn = False
+    assert start.warmStart()
+    assert names(start.subscriptions) == ['y']
+
+
+def testRelayRestartsOnlyWhenItsStreamsChange(tmp_path, monkeypatch):
+    start = node(tmp_path, monkeypatch)
+    started = []
+    start.startRelay = lambda: started.append(list(start.publications))
+    start.publications = [Stream.fromMap(streamMap('p'))]
+    start.relayStreams = StartupDag.relayFingerprint(start.publications)
+    start.reconcileRelay()
+    assert started == []
+    start.publications = [Stream.fromMap(streamMap('q'))]
+    start.reconcileRelay()
+    assert len(started) == 1
+
+
+class Model(object):
+
+    def __init__(self, output: StreamId, targets: list[StreamId]):
+        self.output = output
+        self.variable = output
+        self.targets = targets
+        self.trained = 0
+
+    def buildStable(self):
+        self.trained += 1
+        return True
+
+
+class Engine(object):
+
+    def __init__(self, models: set):
+        self.models = models
+
+
+def testReconcileRetiresModelsOfDroppedPublications(tmp_path, monkeypatch):
+    start = node(tmp_path, monkeypatch)
+    x, p = Stream.fromMap(streamMap('x', reason='p')), Stream.fromMap(streamMap('p'))
+    y, q = Stream.fromMap(streamMap('y', reason='q')), Stream.fromMap(streamMap('q'))
+    start.routes.update([x, y], [p, q])
+    kept, dropped = Model(p.streamId, [x.streamId]), Model(q.streamId, [y.streamId])
+    start.harness.wrapAll([kept, dropped])
+    engine = Engine({kept, dropped})
+    start.routes.registerModels(engine.models)
+    start.routes.update([x], [p])
+    assert reconcileModels(engine, publications=[p], routes=start.routes)
+    assert engine.models == {kept}
+    assert start.routes.modelsFor(q.streamId) == []
+    assert dropped.buildStable() is None and dropped.trained == 0
+    assert kept.buildStable() and kept.trained == 1
+
+
+def testReconcileNeedsANewEngineForNewPublications(tmp_path, monkeypatch):
+    start = node(tmp_path, monkeypatch)
+    x, p = Stream.fromMap(streamMap('x', reason='p')), Stream.fromMap(streamMap('p'))
+    q = Stream.fromMap(streamMap('q'))
+    start.routes.update([x], [p])
+    model = Model(p.streamId, [x.streamId])
+    engine = Engine({model})
+    start.routes.update([x], [p, q])
+    assert not reconcileModels(engine, publications=[p, q], routes=start.routes)
+    assert engine.models == {model}
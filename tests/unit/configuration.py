@@ -0,0 +1,120 @@
+'''
+the parsed config cache and config transactions, against yaml files in a
+temporary folder.
+'''
+import os
+import yaml
+from satorineuron.config import config
+
+
+def write(path: str, data: dict):
+    with open(path, mode='w') as f:
+        yaml.dump(data, f)
+
+
+def testParsesOnceUntilTheFileChanges(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    write(path, {'x': 1})
+    first = config.parsed(path)
+    assert first == {'x': 1}
+    assert config.parsed(path) is first
+    write(path, {'x': 22})
+    assert config.parsed(path) == {'x': 22}
+
+
+def testGetReturnsACopy(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    write(path, {'x': {'y': 1}})
+    config.get(path=path)['x']['y'] = 2
+    assert config.value(path=path, key='x') == {'y': 1}
+
+
+def testInvalidateForgetsTheParse(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    write(path, {'x': 1})
+    stamp = config.stamp(path)
+    config.parsed(path)
+    # same size and mtime, only an explicit invalidate notices
+    write(path, {'x': 2})
+    os.utime(path, ns=(stamp[0], stamp[0]))
+    assert config.parsed(path) == {'x': 1}
+    config.invalidate(path)
+    assert config.parsed(path) == {'x': 2}
+
+
+def testMissingFileIsEmpty(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    write(path, {'x': 1})
+    config.parsed(path)
+    os.remove(path)
+    assert config.parsed(path) == {}
+    assert config.value(path=path, key='x', default=3) == 3
+
+
+def testWritesInvalidate(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    config.put(path=path, data={'x': 1})
+    assert config.value(path=path, key='x') == 1
+    config.add(path=path, data={'y': 2})
+    assert config.get(path=path) == {'x': 1, 'y': 2}
+
+
+def testTransactionWritesOnceOnExit(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    with config.transaction():
+        config.add(path=path, data={'x': 1})
+        config.add(path=path, data={'y': 2})
+        # staged, not written
+        assert not os.path.exists(path)
+        assert config.get(path=path) == {'x': 1, 'y': 2}
+    assert config.parsed(path) == {'x': 1, 'y': 2}
+
+
+def testTransactionRollsBack(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    config.put(path=path, data={'x': 1})
+    try:
+        with config.transaction():
+            config.add(path=path, data={'x': 2})
+            raise ValueError()
+    except ValueError:
+        pass
+    assert config.get(path=path) == {'x': 1}
+    assert config.staged() is None
+
+
+def testTransactionRollsBackOnBaseException(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    try:
+        with config.transaction():
+            with config.transaction():
+                config.put(path=path, data={'x': 2})
+            raise KeyboardInterrupt()
+    except KeyboardInterrupt:
+        pass
+    assert not os.path.exists(path)
+    assert config.staged() is None
+    # the next transaction starts clean
+    with config.transaction():
+        config.put(path=path, data={'x': 3})
+    assert config.get(path=path) == {'x': 3}
+
+
+def testNewFilesGetTheUsualMode(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    config.put(path=path, data={'x': 1})
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+
+
+def testWriteIsStagedInATransaction(tmp_path):
+    path = str(tmp_path / 'a.yaml')
+    write(path, {'x': 1})
+    with config.transaction():
+        config.write(path=path, lines=['# kept\n', 'x: 2\n'])
+        assert config.value(path=path, key='x') == 2
+        assert config.read(path=path) == ['# kept\n', 'x: 2\n']
+        assert config.parsed(path) == {'x': 1}
+    with open(path) as f:
+        assert f.read() == '# kept\nx: 2\n'
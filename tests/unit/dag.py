@@ -0,0 +1,130 @@
+'''
+the startup task graph: dependency order, concurrency, timeouts and retries.
+'''
+import time
+import threading
+from satorineuron.init.dag import Task, TaskGraph, TaskStatus
+
+
+def testRunsDependenciesFirst():
+    order = []
+    lock = threading.Lock()
+
+    def record(name: str):
+        def run():
+            with lock:
+                order.append(name)
+        return run
+
+    statuses = TaskGraph([
+        Task('c', record('c'), dependsOn=['a', 'b']),
+        Task('a', record('a')),
+        Task('b', record('b'), dependsOn=['a']),
+        Task('d', record('d'), dependsOn=['c']),
+    ]).run()
+    assert order == ['a', 'b', 'c', 'd']
+    assert set(statuses.values()) == {TaskStatus.succeeded}
+
+
+def testIndependentTasksRunTogether():
+    barrier = threading.Barrier(3, timeout=2)
+    statuses = TaskGraph([
+        Task(name, barrier.wait) for name in ['a', 'b', 'c']]).run()
+    assert set(statuses.values()) == {TaskStatus.succeeded}
+
+
+def testFailureSkipsDependents():
+
+    def fail():
+        raise ValueError('no')
+
+    statuses = TaskGraph([
+        Task('a', fail),
+        Task('b', lambda: None, dependsOn=['a']),
+        Task('c', lambda: None, dependsOn=['b']),
+        Task('d', lambda: None),
+    ]).run()
+    assert statuses == {
+        'a': TaskStatus.failed,
+        'b': TaskStatus.skipped,
+        'c': TaskStatus.skipped,
+        'd': TaskStatus.succeeded}
+
+
+def testTimeoutAbandonsTheTask():
+    began = time.time()
+    statuses = TaskGraph([
+        Task('slow', lambda: time.sleep(2), timeout=0.1),
+        Task('after', lambda: None, dependsOn=['slow']),
+    ]).run()
+    assert time.time() - began < 1
+    assert statuses == {
+        'slow': TaskStatus.timedOut,
+        'after': TaskStatus.skipped}
+
+
+def testRetries():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError()
+
+    statuses = TaskGraph([
+        Task('flaky', flaky, retries=2, retryDelay=0.01)]).run()
+    assert statuses == {'flaky': TaskStatus.succeeded}
+    assert len(attempts) == 3
+
+
+def testNoRetryAfterTimeout():
+    attempts = []
+
+    def slowFailure():
+        attempts.append(1)
+        time.sleep(0.2)
+        raise ConnectionError()
+
+    statuses = TaskGraph([
+        Task('slow', slowFailure, timeout=0.1, retries=5, retryDelay=0.01),
+    ]).run()
+    assert statuses == {'slow': TaskStatus.timedOut}
+    time.sleep(0.5)
+    assert len(attempts) == 1
+
+
+def testRejectsCycles():
+    try:
+        TaskGraph([
+            Task('a', lambda: None, dependsOn=['b']),
+            Task('b', lambda: None, dependsOn=['a'])])
+    except ValueError:
+        return
+    assert False
+
+
+def testRunsTasksOnDaemonThreads():
+    daemons = []
+    TaskGraph([
+        Task('a', lambda: daemons.append(threading.current_thread().daemon)),
+    ]).run()
+    assert daemons == [True]
+
+
+def testLimitsWorkers():
+    running = []
+    most = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running.append(1)
+            most.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    statuses = TaskGraph(
+        [Task(name, work) for name in 'abcd'], maxWorkers=2).run()
+    assert set(statuses.values()) == {TaskStatus.succeeded}
+    assert max(most) == 2
@@ -0,0 +1,67 @@
+'''
+the dataset store: models building their dataset through the memory class it
+hands out share one copy of each merge, remade when its inputs change.
+'''
+import pandas as pd
+from satorineuron.init.datasets import DatasetStore
+
+
+class Memory(object):
+    ''' like satorilib's memory.Memory, static merges over frames '''
+    merges = 0
+
+    @staticmethod
+    def merge(dfs: list[pd.DataFrame], targetColumn: str) -> pd.DataFrame:
+        Memory.merges += 1
+        return pd.concat(dfs, axis=1).ffill()
+
+    @staticmethod
+    def describe(value: int) -> str:
+        return f'value {value}'
+
+
+def history(name: str, rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {name: [float(i) for i in range(rows)]},
+        index=[f't{i}' for i in range(rows)])
+
+
+def testModelsShareTheSameMerge():
+    Memory.merges = 0
+    store = DatasetStore()
+    shared = store.memory(Memory)
+    assert issubclass(shared, Memory)
+    first = shared.merge(dfs=[history('x', 5), history('y', 5)], targetColumn='x')
+    # another model over the same inputs
+    second = shared.merge(dfs=[history('x', 5), history('y', 5)], targetColumn='x')
+    assert Memory.merges == 1
+    assert second.equals(first)
+    assert store.stats['shared'] == 1
+    # changing one model's dataset leaves the other's alone
+    second.loc['t0', 'x'] = 100.0
+    assert first.loc['t0', 'x'] == 0.0
+    assert shared.merge(
+        dfs=[history('x', 5), history('y', 5)], targetColumn='x'
+    ).loc['t0', 'x'] == 0.0
+
+
+def testRemergesWhenTheInputsChange():
+    Memory.merges = 0
+    store = DatasetStore()
+    shared = store.memory(Memory)
+    shared.merge([history('x', 5), history('y', 5)], 'x')
+    assert len(shared.merge([history('x', 6), history('y', 5)], 'x')) == 6
+    # another target is another dataset
+    shared.merge([history('x', 6), history('y', 5)], 'y')
+    assert Memory.merges == 3
+    # only the latest of each is kept
+    assert store.stats['datasets'] == 2
+    store.clear()
+    shared.merge([history('x', 6), history('y', 5)], 'y')
+    assert Memory.merges == 4
+
+
+def testOtherCallsPassThrough():
+    shared = DatasetStore().memory(Memory)
+    assert shared.describe(3) == 'value 3'
+    assert shared.describe.__name__ == 'describe'
@@ -0,0 +1,37 @@
+'''
+worker processes started with spawn import the entry point again as
+__mp_main__, so satori.py must only start the node under its main guard.
+'''
+import os
+import ast
+
+ENTRY = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'satorineuron', 'web', 'satori.py')
+
+
+def calls(node: ast.AST) -> set[str]:
+    return {
+        call.func.id
+        for call in ast.walk(node)
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Name)}
+
+
+def isMainGuard(node: ast.AST) -> bool:
+    return (
+        isinstance(node, ast.If) and
+        isinstance(node.test, ast.Compare) and
+        isinstance(node.test.left, ast.Name) and
+        node.test.left.id == '__name__')
+
+
+def testStartsTheNodeOnlyUnderTheMainGuard():
+    with open(ENTRY) as f:
+        tree = ast.parse(f.read())
+    atImport = [
+        node for node in tree.body
+        if not isinstance(node, (ast.FunctionDef, ast.ClassDef))
+        and not isMainGuard(node)]
+    for node in atImport:
+        assert not {'StartupDag', 'startNode'} & calls(node), node.lineno
+    guards = [node for node in tree.body if isMainGuard(node)]
+    assert any('startNode' in calls(guard) for guard in guards)
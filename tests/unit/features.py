@@ -0,0 +1,72 @@
+'''
+incremental features: computed for the new rows only while the history grows,
+recomputed in full when it changed, and equal to a full recompute either way.
+'''
+import pandas as pd
+from satorineuron.init.features import FeatureStore
+
+
+def history(rows: int, start: int = 0) -> pd.DataFrame:
+    return pd.DataFrame(
+        {'value': [float(i * i) for i in range(start, start + rows)]},
+        index=pd.date_range('2024-01-01', periods=rows, freq='h') +
+        pd.Timedelta(hours=start))
+
+
+def change(df: pd.DataFrame = None, column: tuple = None) -> pd.Series:
+    ''' like the engine's metrics: percent change from the row before '''
+    if df is None:
+        return 'Change'
+    feature = df['value'].pct_change()
+    feature.name = 'Change'
+    return feature
+
+
+class Counting(object):
+
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, df: pd.DataFrame = None, column: tuple = None) -> pd.Series:
+        if df is not None:
+            self.rows += len(df)
+        return change(df, column)
+
+
+def testIncrementalMatchesAFullRecompute():
+    store = FeatureStore()
+    metric = Counting()
+    feature = store.incremental(metric, lookback=1)
+    df = history(100)
+    feature(df=df, column='value')
+    grown = history(120)
+    incremental = feature(df=grown, column='value')
+    # the 20 new rows and the one they look back on
+    assert metric.rows == 100 + 21
+    pd.testing.assert_series_equal(incremental, change(grown))
+    assert store.stats['reusedRows'] == 100
+
+
+def testRecomputesWhenTheHistoryChanged():
+    store = FeatureStore()
+    metric = Counting()
+    feature = store.incremental(metric, lookback=1)
+    feature(df=history(100), column='value')
+    # same first and last rows, a row in the middle was replaced
+    edited = history(120)
+    edited.index = edited.index[:50].append(
+        pd.DatetimeIndex([edited.index[50] + pd.Timedelta(minutes=1)])
+    ).append(edited.index[51:])
+    recomputed = feature(df=edited, column='value')
+    assert metric.rows == 100 + 120
+    pd.testing.assert_series_equal(recomputed, change(edited))
+
+
+def testGrowsByAppendingOnly():
+    store = FeatureStore()
+    feature = store.incremental(change, lookback=1)
+    for rows in range(10, 1000, 10):
+        result = feature(df=history(rows), column='value')
+    pd.testing.assert_series_equal(result, change(history(990)))
+    assert store.stats['computedRows'] < 990 + 2 * 99
+    assert not result.to_numpy().flags.writeable
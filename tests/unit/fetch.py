@@ -0,0 +1,214 @@
+'''
+the relay's http side: which calls are retried, conditional calls, a group
+of streams isn't called again while its last call is in flight, and unchanged
+values are suppressed.
+'''
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from satorilib.concepts.structs import Stream, StreamId
+from satorineuron.relay.fetch import Fetcher, fetcher
+from satorineuron.relay.raw_stream_relay import RawStreamRelayEngine
+
+
+def until(predicate: callable, timeout: float = 2) -> bool:
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class Api(object):
+    '''
+    a local api answering each call with the next status. with an etag it
+    answers 304 to a call that sends it back.
+    '''
+
+    def __init__(self, statuses: list[int] = None, etag: str = None):
+        self.statuses = statuses or []
+        self.etag = etag
+        self.calls: list[str] = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def answer(self):
+                api.calls.append(self.command)
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                status = api.statuses.pop(0) if api.statuses else 200
+                if api.etag is not None and self.headers.get('If-None-Match') == api.etag:
+                    status = 304
+                self.send_response(status)
+                if api.etag is not None:
+                    self.send_header('ETag', api.etag)
+                if status == 304:
+                    self.end_headers()
+                    return
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'42')
+
+            do_GET = answer
+            do_POST = answer
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def uri(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}/'
+
+
+def testRetriesGets():
+    api = Api([503, 503, 200])
+    r = Fetcher(retries=2, backoff=0.01).request(api.uri)
+    assert r.status_code == 200
+    assert api.calls == ['GET', 'GET', 'GET']
+
+
+def testPostsOnce():
+    api = Api([503, 200])
+    r = Fetcher(retries=2, backoff=0.01).request(api.uri, payload='{"a": 1}')
+    assert r.status_code == 503
+    assert api.calls == ['POST']
+
+
+def testSkipsAGroupInFlight():
+    blocked = threading.Event()
+    called = []
+
+    def call(stream: Stream, conditional: bool = False):
+        called.append(stream)
+        blocked.wait()
+        return None
+
+    engine = RawStreamRelayEngine()
+    stream = Stream(
+        streamId=StreamId(source='s', author='a', stream='x', target='t'))
+    original = RawStreamRelayEngine.call
+    RawStreamRelayEngine.call = staticmethod(call)
+    try:
+        engine.submit('group', [stream])
+        engine.submit('group', [stream])
+        assert until(lambda: len(called) == 1)
+        assert engine.stats['skipped'] == 1
+        assert engine.stats['inFlight'] == 1
+        blocked.set()
+        # the hooks ran and the group is free again
+        assert until(lambda: engine.stats['inFlight'] == 0)
+        engine.submit('group', [stream])
+        assert until(lambda: len(called) == 2)
+    finally:
+        blocked.set()
+        RawStreamRelayEngine.call = original
+
+
+class Saved(object):
+
+    def __init__(self, success: bool):
+        self.success = success
+        self.time = None
+        self.hash = None
+
+
+class Engine(RawStreamRelayEngine):
+    ''' saves and relays in memory, failing the saves of topics in failing '''
+
+    def __init__(self, *args, failing: set[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing = failing or set()
+        self.relayed: list[tuple[str, str]] = []
+
+    def save(self, stream: Stream, data: str = None) -> Saved:
+        topic = stream.streamId.topic()
+        if topic in self.failing:
+            return Saved(False)
+        self.latest[topic] = data
+        return Saved(True)
+
+    def relay(self, stream: Stream, data: str = None, **kwargs):
+        self.relayed.append((stream.streamId.stream, data))
+
+
+def streamsOf(uri: str, *names: str) -> list[Stream]:
+    return [
+        Stream(
+            streamId=StreamId(source='s', author='a', stream=name, target='t'),
+            uri=uri, headers=None, payload=None, hook=None)
+        for name in names]
+
+
+def testNotModifiedOnceRemembered():
+    api = Api(etag='"v1"')
+    client = Fetcher()
+    r = client.request(api.uri, conditional=True)
+    assert r.status_code == 200
+    # nothing is remembered until the caller says so
+    assert client.request(api.uri, conditional=True).status_code == 200
+    client.remember(Fetcher.keyOf(api.uri, None, None), r)
+    assert client.request(api.uri, conditional=True).status_code == 304
+    # a call that isn't conditional gets the full response
+    assert client.request(api.uri).status_code == 200
+    assert client.stats[f'127.0.0.1:{api.server.server_address[1]}']['notModified'] == 1
+
+
+def testRemembersOnlyOnceTheGroupWasSaved():
+    api = Api(etag='"v1"')
+    a, b = streamsOf(api.uri, 'a', 'b')
+    engine = Engine(streams=[a, b], failing={b.streamId.topic()})
+    engine.callRelay([a, b])
+    # b wasn't saved, so the next call gets the full response again
+    engine.failing.clear()
+    engine.callRelay([a, b])
+    assert engine.notModified == 0
+    assert engine.relayed == [('a', '42'), ('a', '42'), ('b', '42')]
+    assert engine.callRelay([a, b])
+    assert engine.notModified == 1
+    assert len(engine.relayed) == 3
+    fetcher.validators.clear()
+
+
+def testSuppressesUnchangedValues():
+    api = Api()
+    a, b = streamsOf(api.uri, 'a', 'b')
+    engine = Engine(streams=[a, b], suppressUnchanged={a.streamId.topic()})
+    for _ in range(2):
+        assert engine.callRelay([a, b])
+    assert engine.relayed == [('a', '42'), ('b', '42'), ('b', '42')]
+    assert engine.suppressed == 1
+
+
+def testAStreamAddedToTheGroupGetsTheFullResponse():
+    api = Api(etag='"v1"')
+    a, b = streamsOf(api.uri, 'a', 'b')
+    engine = Engine(streams=[a, b])
+    assert engine.callRelay([a])
+    assert engine.callRelay([a])
+    assert engine.notModified == 1
+    # b's hook never saw the response, so it isn't answered 304
+    assert engine.callRelay([a, b])
+    assert engine.notModified == 1
+    assert ('b', '42') in engine.relayed
+    fetcher.validators.clear()
+
+
+def testAnEditedHookIsAnotherCall():
+    a, = streamsOf('http://localhost/api', 'a')
+    before = RawStreamRelayEngine.validatorKeyOf([a])
+    a.hook = 'def postRequestHook(r):\n    return r.text\n'
+    assert RawStreamRelayEngine.validatorKeyOf([a]) != before
+
+
+def testForgetsEveryCall():
+    api = Api(etag='"v1"')
+    client = Fetcher()
+    client.remember('call', client.request(api.uri, conditional=True, key='call'))
+    assert client.request(api.uri, conditional=True, key='call').status_code == 304
+    client.forget()
+    assert client.request(api.uri, conditional=True, key='call').status_code == 200
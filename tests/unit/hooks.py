@@ -0,0 +1,85 @@
+'''
+compiled relay hooks: compiled once per source, recompiled when edited or
+forgotten, and kept apart from each other.
+'''
+import threading
+from satorineuron.relay.hooks import CompiledHooks
+
+base = {'offset': 1}
+
+
+def hook(value: int) -> str:
+    return f'def postRequestHook(r):\n    return r + offset + {value}\n'
+
+
+def testCompilesOnce():
+    compiled = CompiledHooks()
+    assert compiled.function(hook(1), 'postRequestHook', base)(0) == 2
+    assert compiled.function(hook(1), 'postRequestHook', base)(0) == 2
+    assert compiled.stats['misses'] == 1
+    assert compiled.stats['hits'] == 1
+
+
+def testAnEditedHookIsCompiledAgain():
+    compiled = CompiledHooks()
+    compiled.function(hook(1), 'postRequestHook', base)
+    assert compiled.function(hook(2), 'postRequestHook', base)(0) == 3
+    assert compiled.stats['misses'] == 2
+
+
+def testForgetInvalidates():
+    compiled = CompiledHooks()
+    compiled.function(hook(1), 'postRequestHook', base)
+    compiled.function(hook(2), 'postRequestHook', base)
+    compiled.forget(hook(1))
+    assert compiled.stats['compiled'] == 1
+    compiled.function(hook(1), 'postRequestHook', base)
+    assert compiled.stats['misses'] == 3
+    compiled.forget()
+    assert compiled.stats['compiled'] == 0
+
+
+def testOldestAgesOut():
+    compiled = CompiledHooks(size=2)
+    for value in range(3):
+        compiled.function(hook(value), 'postRequestHook', base)
+    assert compiled.stats['compiled'] == 2
+    compiled.function(hook(0), 'postRequestHook', base)
+    assert compiled.stats['misses'] == 4
+
+
+def testHooksDontShareNamespaces():
+    compiled = CompiledHooks()
+    compiled.function('offset = 100\n', 'postRequestHook', base)
+    assert compiled.function(hook(1), 'postRequestHook', base)(0) == 2
+    assert base == {'offset': 1}
+
+
+def testErrorsAreCachedAndRaised():
+    compiled = CompiledHooks()
+    for _ in range(2):
+        try:
+            compiled.function('def postRequestHook(r:\n', 'postRequestHook', base)
+        except SyntaxError:
+            continue
+        assert False
+    assert compiled.stats['misses'] == 1
+
+
+def testASlowHookDoesntHoldUpTheOthers():
+    compiled = CompiledHooks()
+    running = threading.Event()
+    release = threading.Event()
+    slow = {'running': running, 'release': release}
+    thread = threading.Thread(
+        target=compiled.namespaceOf,
+        args=('running.set()\nrelease.wait(5)\n', slow),
+        daemon=True)
+    thread.start()
+    assert running.wait(5)
+    # compiled while the slow one is still executing
+    assert compiled.function(hook(1), 'postRequestHook', base)(0) == 2
+    assert thread.is_alive()
+    release.set()
+    thread.join(5)
+    assert compiled.stats['compiled'] == 2
@@ -0,0 +1,60 @@
+'''
+the light entry points must not pull in the model stack. run as a script to
+see the slowest imports:
+
+python tests/unit/imports.py satorineuron.cli
+'''
+import sys
+import subprocess
+
+HEAVY = ['satoriengine', 'xgboost', 'sklearn', 'ppscore']
+LAZY = ['satorineuron.init.engine', 'satorineuron.init.start']
+
+
+def importTimes(module: str) -> list[tuple[str, int, int]]:
+    ''' (module, self us, cumulative us) from python -X importtime '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True)
+    assert result.returncode == 0, result.stderr
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selfUs, cumulativeUs, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(selfUs), int(cumulativeUs)))
+    return times
+
+
+def imported(module: str) -> set[str]:
+    return {name for name, _, _ in importTimes(module)}
+
+
+def importsHeavy(module: str) -> list[str]:
+    return sorted(
+        name for name in imported(module)
+        if name.split('.')[0] in HEAVY or name in LAZY)
+
+
+def testPackageImportIsLight():
+    assert importsHeavy('satorineuron') == []
+
+
+def testCliImportIsLight():
+    assert importsHeavy('satorineuron.cli') == []
+
+
+def testImageStartImportIsLight():
+    assert importsHeavy('satorineuron.web.imageStart') == []
+
+
+if __name__ == '__main__':
+    module = sys.argv[1] if len(sys.argv) > 1 else 'satorineuron'
+    times = importTimes(module)
+    total = max(cumulative for _, _, cumulative in times) / 1e6
+    print(f'{module}: {total:.3f}s')
+    for name, selfUs, cumulativeUs in sorted(
+        times, key=lambda x: x[1], reverse=True
+    )[:20]:
+        print(f'{selfUs/1e3:9.1f}ms {cumulativeUs/1e3:9.1f}ms  {name}')
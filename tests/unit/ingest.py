@@ -0,0 +1,92 @@
+'''
+the ingest pipeline from the pubsub socket to the engine: held delivery,
+dropping the oldest when full, and duplicates.
+'''
+import json
+import time
+import threading
+from satorineuron.init.ingest import IngestPipeline, StageTimer
+
+
+def message(data: str) -> str:
+    return json.dumps({'topic': '{}', 'data': data, 'hash': data})
+
+
+def until(predicate: callable, timeout: float = 2) -> bool:
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def testHoldsUntilReleased():
+    delivered = []
+    pipeline = IngestPipeline(
+        deliver=lambda x: delivered.append(x.data), held=True)
+    for data in 'abc':
+        pipeline.submit(message(data))
+    assert until(lambda: pipeline.stats['depth']['parsed'] == 3)
+    assert delivered == []
+    assert pipeline.stats['held']
+    pipeline.release()
+    assert until(lambda: len(delivered) == 3)
+    assert delivered == ['a', 'b', 'c']
+
+
+def testDropsTheOldestWhenFull():
+    delivered = []
+    pipeline = IngestPipeline(
+        deliver=lambda x: delivered.append(x.data),
+        size=2,
+        blockTimeout=0.01,
+        held=True)
+    for data in 'abcde':
+        pipeline.submit(message(data))
+        time.sleep(0.05)
+    pipeline.release()
+    assert until(lambda: pipeline.stats['depth']['parsed'] == 0)
+    time.sleep(0.05)
+    assert delivered[-2:] == ['d', 'e']
+    assert 'a' not in delivered
+    assert pipeline.stats['dropped'] >= 1
+
+
+def testSkipsDuplicatesAndIgnored():
+    delivered = []
+    pipeline = IngestPipeline(deliver=lambda x: delivered.append(x.data))
+    pipeline.submit(message('a'))
+    pipeline.submit(message('a'))
+    pipeline.submit(IngestPipeline.ignored)
+    assert until(lambda: pipeline.stats['duplicates'] == 1)
+    assert until(lambda: delivered == ['a'])
+    assert pipeline.stats['ignored'] == 1
+
+
+def testStageTimerAcrossThreads():
+    timer = StageTimer()
+
+    def add():
+        for _ in range(10000):
+            timer.add(1.0)
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert timer.toDict == {'count': 40000, 'mean': 1.0, 'max': 1.0}
+
+
+def testHoldEndsAfterItsTimeout():
+    delivered = []
+    pipeline = IngestPipeline(deliver=lambda x: delivered.append(x.data))
+    pipeline.hold(timeout=0.5)
+    time.sleep(0.2)
+    pipeline.submit(message('a'))
+    time.sleep(0.1)
+    assert delivered == []
+    # nothing released it, the hold ran out on its own
+    assert until(lambda: delivered == ['a'], timeout=3)
+    assert not pipeline.stats['held']
@@ -0,0 +1,81 @@
+'''
+publishing to each destination: retries scheduled without holding up newer
+messages, and which messages are dropped when full.
+'''
+import time
+import threading
+from satorineuron.init.publish import Destination, Publisher
+
+
+def until(predicate: callable, timeout: float = 2) -> bool:
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def testRetriesWithoutHoldingUpNewMessages():
+    sent = []
+    failures = {'a': 2}
+
+    def send(data: str):
+        if failures.get(data, 0):
+            failures[data] -= 1
+            raise ConnectionError()
+        sent.append(data)
+
+    destination = Destination('d', send=send, retries=5, retryDelay=0.2)
+    destination.put({'data': 'a'})
+    destination.put({'data': 'b'})
+    # b went out while a waited for its retry
+    assert until(lambda: sent == ['b'], timeout=0.15)
+    assert until(lambda: sent == ['b', 'a'])
+    stats = destination.stats
+    assert stats['sent'] == 2
+    assert stats['errors'] == {'ConnectionError': 2}
+    assert stats['dropped'] == 0
+
+
+def testGivesUpAfterItsRetries():
+    def send(data: str):
+        raise ConnectionError()
+
+    destination = Destination('d', send=send, retries=3, retryDelay=0.01)
+    destination.put({'data': 'a'})
+    assert until(lambda: destination.stats['dropped'] == 1)
+    assert destination.stats['errors'] == {'ConnectionError': 3}
+    assert destination.stats['retrying'] == 0
+
+
+def testDropsTheOldestWhenFull():
+    sent = []
+    blocked = threading.Event()
+
+    def send(data: str):
+        blocked.wait()
+        sent.append(data)
+
+    destination = Destination('d', send=send, size=2)
+    destination.put({'data': 'a'})
+    # a is being sent, the queue holds two
+    assert until(lambda: destination.stats['depth'] == 0)
+    for data in 'bcd':
+        destination.put({'data': data})
+    assert destination.stats['dropped'] == 1
+    blocked.set()
+    assert until(lambda: sent == ['a', 'c', 'd'])
+
+
+def testReplacingHandsOverWhatWasntSent():
+    blocked = threading.Event()
+    publisher = Publisher()
+    publisher.set('pubsub a', send=lambda data: blocked.wait())
+    for data in 'abc':
+        publisher.publish(data=data)
+    sent = []
+    publisher.set('pubsub a', send=lambda data: sent.append(data))
+    blocked.set()
+    # a was in the old destination's hands already
+    assert until(lambda: sent == ['b', 'c'])
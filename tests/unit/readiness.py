@@ -0,0 +1,86 @@
+'''
+readiness events, waiting for conditions we can't be notified about, and
+coalescing bursts of work by key.
+'''
+import time
+import threading
+from satorineuron.init.schedule import Readiness, Coalescer
+
+
+def testWaitTimesOut():
+    ready = Readiness()
+    assert not ready.wait('engine', timeout=0.05)
+    ready.set('engine')
+    assert ready.wait('engine', timeout=0.05)
+    assert ready.status['engine'] is not None
+
+
+def testWhenSetsOnceThePredicateHolds():
+    ready = Readiness()
+    holds = threading.Event()
+    threading.Timer(0.05, holds.set).start()
+    assert ready.when('loop', holds.is_set, timeout=2)
+    assert ready.isReady('loop')
+
+
+def testWhenTimesOut():
+    ready = Readiness()
+    began = time.time()
+    assert not ready.when('loop', lambda: False, timeout=0.1)
+    assert time.time() - began < 1
+    assert not ready.isReady('loop')
+
+
+def testWhenReturnsOnceSetElsewhere():
+    ready = Readiness()
+    threading.Timer(0.05, ready.set, args=['loop']).start()
+    began = time.time()
+    # the predicate never holds and the backoff is long, the event wakes it
+    assert ready.when('loop', lambda: False, interval=5, maxInterval=5, timeout=10)
+    assert time.time() - began < 1
+
+
+def testCoalescesBurstsByKey():
+    ran = []
+    coalescer = Coalescer(window=0.05)
+    for _ in range(10):
+        coalescer.request('a', lambda: ran.append('a'))
+        coalescer.request('b', lambda: ran.append('b'))
+    time.sleep(0.3)
+    assert sorted(ran) == ['a', 'b']
+    assert coalescer.stats['saved'] == 18
+
+
+def testSlowKeyDoesNotHoldUpOthers():
+    release = threading.Event()
+    ran = []
+    coalescer = Coalescer(window=0.01, workers=2)
+    coalescer.request('slow', release.wait)
+    time.sleep(0.05)
+    coalescer.request('fast', lambda: ran.append('fast'))
+    time.sleep(0.1)
+    assert ran == ['fast']
+    release.set()
+
+
+def testNeverRunsAKeyTwiceAtOnce():
+    active = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def task():
+        with lock:
+            active.append(1)
+            if len(active) > 1:
+                overlaps.append(1)
+        time.sleep(0.1)
+        with lock:
+            active.pop()
+
+    coalescer = Coalescer(window=0.01, workers=4)
+    coalescer.request('a', task)
+    time.sleep(0.05)
+    coalescer.request('a', task)
+    time.sleep(0.4)
+    assert overlaps == []
+    assert coalescer.stats['ran'] == 2
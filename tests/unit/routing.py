@@ -0,0 +1,71 @@
+'''
+the routing index from streams to the subscriptions and models that depend on
+them.
+'''
+from satorilib.concepts.structs import StreamId, Stream
+from satorineuron.init.routing import RoutingIndex
+
+
+def streamId(name: str) -> StreamId:
+    return StreamId(source='s', author='a', stream=name, target='t')
+
+
+class Model(object):
+
+    def __init__(self, variable: StreamId, targets: list[StreamId]):
+        self.variable = variable
+        self.targets = targets
+
+
+def testSubscriptionsByReason():
+    publication = Stream(streamId=streamId('p'), predicting=streamId('x'))
+    other = Stream(streamId=streamId('q'), predicting=streamId('y'))
+    x = Stream(streamId=streamId('x'), reason=streamId('p'))
+    y = Stream(streamId=streamId('y'), reason=streamId('q'))
+    free = Stream(streamId=streamId('z'))
+    routes = RoutingIndex([x, y, free], [publication, other])
+    assert routes.subscriptionsFor(publication) == [x]
+    assert routes.subscriptionsFor(other) == [y]
+    assert routes.carries(streamId('z'))
+    assert routes.carries(StreamId(source='s', author='a', stream='p', target='t'))
+    assert not routes.carries(streamId('nope'))
+
+
+def testUpdateReplacesTheStreams():
+    publication = Stream(streamId=streamId('p'))
+    x = Stream(streamId=streamId('x'), reason=streamId('p'))
+    routes = RoutingIndex([x], [publication])
+    routes.update([], [publication])
+    assert routes.subscriptionsFor(publication) == []
+    assert not routes.carries(streamId('x'))
+
+
+def testModelsForTheirVariableAndTargets():
+    a = Model(variable=streamId('x'), targets=[streamId('y')])
+    b = Model(variable=streamId('y'), targets=[streamId('y'), streamId('z')])
+    routes = RoutingIndex()
+    routes.registerModels([a, b])
+    assert routes.modelsFor(streamId('x')) == [a]
+    assert routes.modelsFor(streamId('y')) == [a, b]
+    assert routes.modelsFor(streamId('z')) == [b]
+    assert routes.modelsFor(streamId('nope')) == []
+    routes.registerModels([b])
+    assert routes.modelsFor(streamId('x')) == []
+
+
+def testUpdateOnlyTouchesWhatChanged():
+    p, q = Stream(streamId=streamId('p')), Stream(streamId=streamId('q'))
+    x = Stream(streamId=streamId('x'), reason=streamId('p'))
+    y = Stream(streamId=streamId('y'), reason=streamId('p'))
+    routes = RoutingIndex([x, y], [p, q])
+    # y is redefined for another publication, x stays as it was
+    moved = Stream(streamId=streamId('y'), reason=streamId('q'))
+    routes.update([x, moved], [p, q])
+    assert routes.subscriptionsFor(p) == [x]
+    assert routes.subscriptionsFor(q) == [moved]
+    assert routes.subscriptions[('s', 'a', 'x', 't')] is x
+    routes.update([moved], [q])
+    assert routes.subscriptionsFor(p) == []
+    assert not routes.carries(streamId('x'))
+    assert not routes.carries(streamId('p'))
+    assert routes.carries(streamId('y'))
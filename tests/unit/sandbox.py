@@ -0,0 +1,60 @@
+'''
+the relay hook sandbox: hooks run in worker processes, one that runs over its
+time limit is killed with its worker, which is replaced.
+'''
+import time
+import requests
+from satorineuron.relay.sandbox import HookSandbox, HookFailed
+
+
+def response(text: str) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r._content = text.encode()
+    r.encoding = 'utf-8'
+    return r
+
+
+def testRunsHooks():
+    sandbox = HookSandbox(workers=1)
+    source = 'def postRequestHook(r):\n    return r.text + "!"\n'
+    assert sandbox.hook(source, response('42')) == '42!'
+    assert sandbox.stats['idle'] == 1
+
+
+def testKillsAHookOverItsTimeLimit():
+    sandbox = HookSandbox(workers=1, timeLimit=1)
+    # the worker starts up within its first call
+    sandbox.hook('def postRequestHook(r):\n    return 1\n', response(''))
+    stuck = sandbox.idle.get()
+    sandbox.idle.put(stuck)
+    began = time.time()
+    try:
+        sandbox.hook(
+            'def postRequestHook(r):\n    while True:\n        pass\n',
+            response(''))
+        assert False
+    except HookFailed as e:
+        assert 'time limit' in str(e)
+    assert time.time() - began < 3
+    stuck.process.join(timeout=2)
+    assert not stuck.process.is_alive()
+    assert sandbox.stats['killed'] == 1
+    assert sandbox.stats['failures'] == {'hook': 1}
+    # a new worker takes its place
+    assert sandbox.hook('def postRequestHook(r):\n    return 2\n', response('')) == 2
+    assert sandbox.stats['workers'] == 1
+
+
+def testLimitsWhatHooksAllocate():
+    # less than the worker's imports take, the limit is on top of them
+    sandbox = HookSandbox(workers=1, memoryLimit=64 * 1024 * 1024)
+    assert sandbox.hook('def postRequestHook(r):\n    return 1\n', response('')) == 1
+    try:
+        sandbox.hook(
+            'def postRequestHook(r):\n    return len(bytearray(256 * 1024 * 1024))\n',
+            response(''))
+        assert False
+    except HookFailed as e:
+        assert 'MemoryError' in str(e)
+    assert sandbox.hook('def postRequestHook(r):\n    return 2\n', response('')) == 2
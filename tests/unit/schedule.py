@@ -0,0 +1,106 @@
+'''
+the relay schedule driven by a simulated clock, so hours of ticks and overruns
+run instantly and deterministically.
+'''
+import random
+from satorineuron.relay.schedule import RelaySchedule, nextDue
+
+
+class SimulatedClock(object):
+    ''' a clock that only moves when told to '''
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def run(
+    schedule: RelaySchedule,
+    clock: SimulatedClock,
+    until: float,
+    overrun: callable = None,
+) -> dict[str, list[float]]:
+    ''' sleeps as the relay loop would, returns when each key fired '''
+    fired: dict[str, list[float]] = {}
+    while clock.now < until:
+        for key in schedule.due():
+            fired.setdefault(key, []).append(clock.now)
+        wait = schedule.wait()
+        if wait is None:
+            break
+        clock.advance(wait + (overrun() if overrun else 0))
+    return fired
+
+
+def testNextDue():
+    assert nextDue(0, 60) == 0
+    assert nextDue(1, 60) == 60
+    assert nextDue(61, 60, offset=10) == 110
+    assert (nextDue(12345.5, 300, offset=7) + 7) % 300 == 0
+
+
+def testFiresEveryTickOnTime():
+    clock = SimulatedClock(1000)
+    schedule = RelaySchedule(clock=clock)
+    schedule.add('a', cadence=60)
+    schedule.add('b', cadence=90, offset=30)
+    fired = run(schedule, clock, until=1000 + 3600)
+    assert all((t % 60) == 0 for t in fired['a'])
+    assert all(((t + 30) % 90) == 0 for t in fired['b'])
+    assert len(fired['a']) == 60
+    assert len(fired['b']) == 40
+    assert schedule.stats['late'] == 0
+    assert schedule.stats['missed'] == 0
+
+
+def testOverrunsFireLateInsteadOfSkipping():
+    clock = SimulatedClock(0)
+    schedule = RelaySchedule(clock=clock)
+    schedule.add('a', cadence=60)
+    # every wakeup overruns by a few seconds
+    fired = run(schedule, clock, until=3600, overrun=lambda: 3)
+    assert len(fired['a']) == 60
+    assert schedule.stats['late'] == 59
+    assert schedule.stats['missed'] == 0
+
+
+def testLongStallCountsMissedTicks():
+    clock = SimulatedClock(0)
+    schedule = RelaySchedule(clock=clock)
+    schedule.add('a', cadence=60)
+    assert schedule.due() == ['a']
+    clock.advance(60 * 5 + 1)
+    assert schedule.due() == ['a']
+    assert schedule.stats['missed'] == 4
+    # back on the cadence afterward
+    assert schedule.wait() == 59
+
+
+def testRemoveAndReschedule():
+    clock = SimulatedClock(0)
+    schedule = RelaySchedule(clock=clock)
+    schedule.add('a', cadence=60)
+    schedule.add('b', cadence=60)
+    schedule.remove('b')
+    schedule.add('a', cadence=120)
+    clock.advance(240)
+    assert schedule.due() == ['a']
+    assert len(schedule) == 1
+
+
+def testThousandsOfStreams():
+    clock = SimulatedClock(0)
+    schedule = RelaySchedule(clock=clock)
+    cadences = {}
+    for i in range(5000):
+        cadences[str(i)] = random.choice([60, 120, 300, 600, 3600])
+        schedule.add(str(i), cadence=cadences[str(i)], offset=i % 60)
+    fired = run(schedule, clock, until=3600)
+    for key, times in fired.items():
+        assert len(times) == 3600 // cadences[key]
+    assert schedule.stats['late'] == 0
@@ -0,0 +1,103 @@
+'''
+the hyperparameter search gate in front of the engine's explore steps: the
+budget, plateaus, slots and the bandit.
+'''
+import time
+import threading
+from satorilib.concepts.structs import StreamId
+from satorineuron.init.search import HyperparameterSearch
+from satorineuron.init.harness import ModelHarness
+
+
+def explore(search: HyperparameterSearch, key: str, score: float, seconds: float = 1.0):
+    assert search.acquire(key, timeout=1)
+    search.release(key, score=score, seconds=seconds)
+
+
+def testStopsOnAPlateau():
+    search = HyperparameterSearch(patience=2)
+    explore(search, 'a', score=0.5)
+    explore(search, 'a', score=0.5)
+    explore(search, 'a', score=0.5)
+    assert not search.acquire('a', timeout=0.05)
+    assert search.stats['streams']['a']['plateaued']
+    search.resetBudget('a')
+    assert search.acquire('a', timeout=0.05)
+
+
+def testStopsWhenTheBudgetIsSpent():
+    search = HyperparameterSearch(budget=10)
+    explore(search, 'a', score=0.1, seconds=6)
+    explore(search, 'a', score=0.2, seconds=6)
+    assert not search.acquire('a', timeout=0.05)
+
+
+def testExploresAgainAfterResting():
+    search = HyperparameterSearch(budget=1, rest=0.1)
+    explore(search, 'a', score=0.1, seconds=2)
+    assert not search.acquire('a', timeout=0.05)
+    time.sleep(0.15)
+    assert search.acquire('a', timeout=0.05)
+
+
+def testOneSlot():
+    search = HyperparameterSearch(slots=1)
+    assert search.acquire('a', timeout=1)
+    assert not search.acquire('b', timeout=0.05)
+    admitted = []
+    waiter = threading.Thread(
+        target=lambda: admitted.append(search.acquire('b', timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    search.release('a', score=0.1, seconds=1)
+    waiter.join()
+    assert admitted == [True]
+
+
+def testPrefersStreamsNeverExplored():
+    search = HyperparameterSearch()
+    explore(search, 'a', score=0.1)
+    assert search.choose({'a', 'b'}) == 'b'
+
+
+class Model(object):
+
+    def __init__(self):
+        self.output = StreamId(source='s', author='a', stream='p', target='t')
+        self.stableScore = 0.5
+        self.explored = 0
+
+    def produceTestFit(self):
+        self.explored += 1
+        return True
+
+
+def testHarnessSkipsExploringPlateauedStreams():
+    search = HyperparameterSearch(patience=1)
+    harness = ModelHarness(training=None, search=search, gateWait=0.05)
+    harness.installed = True
+    model = Model()
+    harness.wrap(model)
+    assert model.produceTestFit()
+    assert model.produceTestFit()
+    # the score never moved, the stream plateaued
+    assert model.produceTestFit() is None
+    assert model.explored == 2
+    assert harness.stats['exploresSkipped'] == 1
+
+
+def testChargesCpuTimeNotWaiting():
+    search = HyperparameterSearch()
+    harness = ModelHarness(training=None, search=search, gateWait=0.05)
+    harness.installed = True
+    model = Model()
+
+    def produceTestFit():
+        # waiting on a busy training pool, say
+        time.sleep(0.3)
+        return True
+
+    model.produceTestFit = produceTestFit
+    harness.wrap(model)
+    assert model.produceTestFit()
+    assert search.stats['streams'][model.output.topic()]['seconds'] < 0.1
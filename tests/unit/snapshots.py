@@ -0,0 +1,142 @@
+'''
+model snapshots: saved once per train step, restored lazily by the harness on
+a model's first step, and only while the data it trained on still holds.
+'''
+import pandas as pd
+from satorilib.concepts.structs import StreamId
+from satorineuron.init.snapshots import ModelSnapshots
+from satorineuron.init.harness import ModelHarness
+
+
+def streamId(name: str) -> StreamId:
+    return StreamId(source='s', author='a', stream=name, target='t')
+
+
+def history(rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {'value': range(rows), 'hash': [f'h{i}' for i in range(rows)]},
+        index=[f't{i}' for i in range(rows)])
+
+
+class Model(object):
+
+    def __init__(self):
+        self.output = streamId('p')
+        self.variable = streamId('x')
+        self.targets = [streamId('y')]
+        self.stable = None
+        self.stableScore = None
+        self.builds = 0
+
+    def buildStable(self):
+        self.builds += 1
+        self.stable = {'trees': self.builds}
+        return True
+
+
+class Histories(object):
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.reads = []
+
+    def __call__(self, streamId: StreamId) -> pd.DataFrame:
+        self.reads.append(streamId.stream)
+        return history(self.rows)
+
+
+def build(tmp_path, histories: Histories) -> tuple[ModelHarness, ModelSnapshots]:
+    snapshots = ModelSnapshots(path=str(tmp_path), histories=histories)
+    harness = ModelHarness(training=None, snapshots=snapshots)
+    harness.installed = True
+    return harness, snapshots
+
+
+def testSavesOncePerTrainStep(tmp_path):
+    histories = Histories(rows=10)
+    harness, snapshots = build(tmp_path, histories)
+    model = Model()
+    assert not snapshots.save(model)
+    harness.wrap(model)
+    model.buildStable()
+    assert snapshots.save(model)
+    assert not snapshots.save(model)
+    model.buildStable()
+    assert snapshots.save(model)
+
+
+def testRestoresLazilyOnTheFirstStep(tmp_path):
+    histories = Histories(rows=10)
+    first, snapshots = build(tmp_path, histories)
+    model = Model()
+    first.wrap(model)
+    model.buildStable()
+    snapshots.save(model)
+    # the data kept growing after the snapshot was taken
+    histories = Histories(rows=12)
+    second, _ = build(tmp_path, histories)
+    restarted = Model()
+    second.wrap(restarted)
+    assert histories.reads == []
+    assert restarted.buildStable()
+    # restored instead of trained, only its own streams were read
+    assert restarted.builds == 0
+    assert restarted.stable == {'trees': 1}
+    assert sorted(set(histories.reads)) == ['x', 'y']
+    assert second.stats['restored'] == 1
+    restarted.buildStable()
+    assert restarted.builds == 1
+
+
+def testSkipsSnapshotsOfOtherData(tmp_path):
+    first, snapshots = build(tmp_path, Histories(rows=10))
+    model = Model()
+    first.wrap(model)
+    model.buildStable()
+    snapshots.save(model)
+    # fewer rows than it trained on, the history was replaced
+    second, _ = build(tmp_path, Histories(rows=5))
+    restarted = Model()
+    second.wrap(restarted)
+    restarted.buildStable()
+    assert restarted.builds == 1
+    assert second.stats['restored'] == 0
+
+
+def testSkipsABodyTornFromItsHeader(tmp_path):
+    first, snapshots = build(tmp_path, Histories(rows=10))
+    model = Model()
+    first.wrap(model)
+    model.buildStable()
+    snapshots.save(model)
+    header = f'{snapshots.filename(model.output)}.json'
+    with open(header) as f:
+        old = f.read()
+    model.buildStable()
+    snapshots.save(model)
+    # crashed after the body was written, before its header
+    with open(header, 'w') as f:
+        f.write(old)
+    second, _ = build(tmp_path, Histories(rows=10))
+    restarted = Model()
+    second.wrap(restarted)
+    restarted.buildStable()
+    assert restarted.builds == 1
+    assert second.stats['restored'] == 0
+
+
+def testFingerprintsFromLoadedHistories(tmp_path):
+    histories = Histories(rows=10)
+    loaded = {}
+    snapshots = ModelSnapshots(
+        path=str(tmp_path),
+        histories=histories,
+        loaded=lambda streamId: loaded.get(streamId.stream))
+    model = Model()
+    assert snapshots.fingerprint(model)['s.a.x.t']['rows'] == 10
+    assert sorted(histories.reads) == ['x', 'y']
+    # unloaded since, the last fingerprint stands rather than a reread
+    assert snapshots.fingerprint(model)['s.a.x.t']['rows'] == 10
+    loaded['x'] = history(11)
+    assert snapshots.fingerprint(model)['s.a.x.t']['rows'] == 11
+    assert sorted(histories.reads) == ['x', 'y']
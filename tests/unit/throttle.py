@@ -0,0 +1,54 @@
+'''
+the governor gating the engine's train and explore steps through the model
+harness.
+'''
+from satorilib.concepts.structs import StreamId
+from satorineuron.init.throttle import Governor, EngineMode
+from satorineuron.init.harness import ModelHarness
+
+
+class Model(object):
+
+    def __init__(self):
+        self.output = StreamId(source='s', author='a', stream='p', target='t')
+        self.trained = 0
+        self.explored = 0
+
+    def buildStable(self):
+        self.trained += 1
+        return True
+
+    def produceTestFit(self):
+        self.explored += 1
+        return True
+
+
+def harnessed(governor: Governor) -> tuple[ModelHarness, Model]:
+    harness = ModelHarness(training=None, governor=governor, gateWait=0.05)
+    harness.installed = True
+    model = Model()
+    harness.wrap(model)
+    return harness, model
+
+
+def testPredictOnlyStopsTraining():
+    governor = Governor()
+    governor.setMode(EngineMode.predictOnly)
+    harness, model = harnessed(governor)
+    assert model.buildStable() is None
+    assert model.produceTestFit() is None
+    assert (model.trained, model.explored) == (0, 0)
+    assert harness.stats['trainsSkipped'] == 1
+    assert harness.stats['exploresSkipped'] == 1
+    governor.setMode(EngineMode.running)
+    assert model.buildStable()
+    assert model.produceTestFit()
+    assert (model.trained, model.explored) == (1, 1)
+
+
+def testPausedStepsWaitBounded():
+    governor = Governor()
+    governor.setMode(EngineMode.paused)
+    harness, model = harnessed(governor)
+    assert model.buildStable() is None
+    assert model.trained == 0
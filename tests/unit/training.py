@@ -0,0 +1,105 @@
+'''
+fits off the neuron process: shared frames, the training pool, and the model
+harness sending the engine's xgboost fits to it.
+'''
+import os
+import numpy as np
+import pandas as pd
+from satorilib.concepts.structs import StreamId
+from satorineuron.init.training import (
+    TrainingScheduler, SharedFrame, InlineFrame)
+from satorineuron.init.harness import ModelHarness
+
+
+def testSharesNumericFrames():
+    df = pd.DataFrame(
+        {'a': [1, 2, 3], 'b': [0.5, 1.5, 2.5]},
+        index=pd.Index(['x', 'y', 'z']))
+    frame = SharedFrame.share(df)
+    try:
+        assert isinstance(frame, SharedFrame)
+        view = frame.attach()
+        assert view.equals(df.astype(float))
+        assert not view.to_numpy().flags.writeable
+        frame.detach()
+    finally:
+        frame.release()
+
+
+def testSendsOtherFramesWhole():
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    frame = SharedFrame.share(df)
+    assert isinstance(frame, InlineFrame)
+    assert frame.attach() is df
+
+
+def testRunsFitsInThePool():
+    training = TrainingScheduler(processes=1)
+    df = pd.DataFrame({'a': range(10)})
+    assert training.submit(key='a', function=len, df=df).result(timeout=60) == 10
+    assert training.stats['completed'] == 1
+
+
+class Model(object):
+    ''' a ModelManager whose stable step fits xgboost '''
+
+    def __init__(self):
+        from xgboost import XGBRegressor
+        self.output = StreamId(source='s', author='a', stream='p', target='t')
+        self.stable = XGBRegressor(n_estimators=5)
+        self.x = pd.DataFrame({'a': np.arange(50.0), 'b': np.arange(50.0) % 7})
+        self.y = self.x['a'] * 2
+
+    def buildStable(self):
+        self.stable.fit(self.x, self.y)
+        return True
+
+    def fitOutsideAStep(self):
+        self.stable.fit(self.x, self.y)
+
+
+def testHarnessOffloadsFitsMadeInAStep():
+    training = TrainingScheduler(processes=1)
+    harness = ModelHarness(training=training)
+    model = Model()
+    harness.wrap(model)
+    assert model.buildStable()
+    assert harness.stats['offloaded'] == 1
+    assert training.stats['completed'] == 1
+    # the engine's own estimator holds the fit
+    assert len(model.stable.predict(model.x)) == 50
+    model.fitOutsideAStep()
+    assert harness.stats['offloaded'] == 1
+    assert training.stats['completed'] == 1
+
+
+def die(df: pd.DataFrame):
+    os._exit(1)
+
+
+def testReplacesAPoolThatBrokeMidFit():
+    training = TrainingScheduler(processes=1)
+    df = pd.DataFrame({'a': range(10)})
+    try:
+        training.submit(key='a', function=die, df=df).result(timeout=60)
+        assert False
+    except Exception as e:
+        assert type(e).__name__ == 'BrokenProcessPool'
+    assert training.submit(key='a', function=len, df=df).result(timeout=60) == 10
+    assert training.stats['failed'] == 1
+
+
+def testShutdownPutsTheFitsBack():
+    from xgboost import XGBModel
+    original = XGBModel.__dict__['fit']
+    training = TrainingScheduler(processes=1)
+    harness = ModelHarness(training=training)
+    harness.install()
+    assert XGBModel.__dict__['fit'] is not original
+    harness.shutdown()
+    assert XGBModel.__dict__['fit'] is original
+    try:
+        training.submit(key='a', function=len, df=pd.DataFrame({'a': [1]}))
+        assert False
+    except RuntimeError:
+        pass
@@ -0,0 +1,103 @@
+'''
+incremental validation of hash chains: checkpoints resume where the last
+verified pass ended and are written once per pass.
+'''
+import pandas as pd
+from satorilib.api.hash import hashRow
+from satorineuron.init.verify import (
+    Checkpoints, CacheVerifier, ParallelVerifier, firstDivergence)
+
+
+def chain(rows: int) -> pd.DataFrame:
+    index = [f'2024-01-01 00:00:{i:02d}' for i in range(rows)]
+    values = [str(i) for i in range(rows)]
+    hashes = []
+    prior = ''
+    for ts, value in zip(index, values):
+        prior = hashRow(priorRowHash=prior, ts=ts, value=value)
+        hashes.append(prior)
+    return pd.DataFrame({'value': values, 'hash': hashes}, index=index)
+
+
+class Id(object):
+
+    def __init__(self, topic: str):
+        self.name = topic
+
+    def topic(self) -> str:
+        return self.name
+
+
+class FakeCache(object):
+
+    def __init__(self, topic: str, df: pd.DataFrame):
+        self.id = Id(topic)
+        self.df = df
+
+    def read(self) -> pd.DataFrame:
+        return self.df
+
+    def write(self, df: pd.DataFrame):
+        self.df = df
+
+
+def testResumesAtTheCheckpoint(tmp_path):
+    checkpoints = Checkpoints(path=str(tmp_path / 'verified.yaml'))
+    df = chain(10)
+    checkpoints.set('a', df.iloc[:6])
+    assert Checkpoints.resumesAt(checkpoints.get('a'), df) == 6
+    # a reloaded checkpoint resumes at the same row
+    reloaded = Checkpoints(path=str(tmp_path / 'verified.yaml'))
+    assert Checkpoints.resumesAt(reloaded.get('a'), df) == 6
+
+
+def testHistoryChangedUnderTheCheckpoint(tmp_path):
+    checkpoints = Checkpoints(path=str(tmp_path / 'verified.yaml'))
+    checkpoints.set('a', chain(6))
+    merged = chain(10)
+    merged.index = [f'2023-{ts}' for ts in merged.index]
+    assert Checkpoints.resumesAt(checkpoints.get('a'), merged) == 0
+    assert Checkpoints.resumesAt(None, merged) == 0
+
+
+def testWritesOncePerPass(tmp_path):
+    checkpoints = Checkpoints(path=str(tmp_path / 'verified.yaml'))
+    writes = []
+    save = checkpoints.save
+    checkpoints.save = lambda: writes.append(1) or save()
+    verifier = CacheVerifier(
+        checkpoints=checkpoints,
+        parallel=ParallelVerifier(processes=1))
+    caches = [FakeCache(topic, chain(10)) for topic in 'abc']
+    assert verifier.verifyAll(caches)
+    assert len(writes) == 1
+    for topic in 'abc':
+        assert checkpoints.get(topic)['rows'] == 10
+
+
+def testRepairsFromTheDivergentRow(tmp_path):
+    checkpoints = Checkpoints(path=str(tmp_path / 'verified.yaml'))
+    verifier = CacheVerifier(
+        checkpoints=checkpoints,
+        parallel=ParallelVerifier(processes=1))
+    df = chain(10)
+    checkpoints.set('a', df.iloc[:4])
+    broken = df.copy()
+    broken.loc[broken.index[7], 'hash'] = 'bad'
+    cache = FakeCache('a', broken)
+    assert not verifier.verifyAll([cache])
+    assert firstDivergence(cache.df) is None
+    assert list(cache.df['hash'].values[:7]) == list(df['hash'].values[:7])
+    assert checkpoints.get('a')['rows'] == 10
+
+
+def testSegmentsInAPoolMatchOneProcess():
+    intact, tampered = chain(50), chain(50)
+    tampered.iloc[23, tampered.columns.get_loc('value')] = 'x'
+    frames = {'intact': (intact, 0), 'tampered': (tampered, 0), 'resumed': (tampered, 30)}
+    pooled = ParallelVerifier(processes=2, segmentRows=7, minimumRows=0)
+    inline = ParallelVerifier(processes=1, segmentRows=7)
+    assert pooled.verify(frames) == inline.verify(frames) == {
+        'intact': None, 'tampered': 23, 'resumed': None}
+    # the segments chain across their boundaries, the row before 23 is fine
+    assert firstDivergence(tampered) == 23